@@ -1,2 +1,5 @@
 from app.common.dao.user import UserDAO
-from app.common.dao.token import TokenBlocklistDAO
\ No newline at end of file
+from app.common.dao.token import TokenBlocklistDAO
+from app.common.dao.permission import PermissionDAO
+from app.common.dao.sensor import SensorFrameDAO
+from app.common.dao.throttle import LoginThrottleDAO
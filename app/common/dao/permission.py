@@ -0,0 +1,46 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.common.entity import RoleModel, UserRole, RolePermission, Permission
+
+
+class PermissionDAO:
+    @staticmethod
+    async def get_role_permissions(db: AsyncSession):
+        """
+        查询所有角色及其权限名称。
+        :param db: 数据库会话
+        :return: (role_name, perm_name) 列表, 没有任何权限的角色 perm_name 为 None
+        """
+        result = await db.execute(
+            select(RoleModel.role_name, Permission.perm_name)
+            .outerjoin(RolePermission, RolePermission.role_id == RoleModel.role_id)
+            .outerjoin(Permission, Permission.perm_id == RolePermission.perm_id)
+        )
+        return result.all()
+
+    @staticmethod
+    async def get_role_names_by_user_id(db: AsyncSession, user_id: str):
+        result = await db.execute(
+            select(RoleModel.role_name).join(UserRole).filter(UserRole.user_id == user_id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_fingerprint(db: AsyncSession):
+        """
+        查询权限相关表的变更指纹(各表行数与最近更新时间), 用于判断是否需要重建权限匹配器。
+        :param db: 数据库会话
+        :return: (角色权限指纹, 用户角色指纹)
+        """
+        def summary(*models):
+            columns = []
+            for model in models:
+                columns.append(select(func.count()).select_from(model).scalar_subquery())
+                columns.append(select(func.max(model.updated_at)).scalar_subquery())
+            return columns
+
+        role_columns = summary(RoleModel, Permission, RolePermission)
+        user_columns = summary(UserRole)
+        row = (await db.execute(select(*role_columns, *user_columns))).one()
+        return tuple(row[:len(role_columns)]), tuple(row[len(role_columns):])
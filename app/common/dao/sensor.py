@@ -0,0 +1,22 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.entity import SensorFrameModel
+
+
+class SensorFrameDAO:
+    @staticmethod
+    async def bulk_insert(db: AsyncSession, frames: list[dict]):
+        """
+        多行插入一批传感器数据帧, 在一个事务中提交。
+        :param db: 数据库会话
+        :param frames: 列字典列表
+        """
+        if not frames:
+            return
+        try:
+            await db.execute(insert(SensorFrameModel), frames)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.entity import LoginThrottleModel
+from app.core.throttle import FailureCounter
+
+
+class LoginThrottleDAO:
+    @staticmethod
+    async def record_failures(db: AsyncSession, keys: list[tuple[str, int]], window: float, backoff_base: float,
+                              backoff_max: float):
+        """
+        在一个事务中为多个限流键记录一次登录失败, 行锁保证多个 worker 并发记录时计数准确。
+        :param db: 数据库会话
+        :param keys: (限流键, 封禁阈值) 列表
+        :param window: 滑动窗口长度(秒)
+        :param backoff_base: 首次封禁时间(秒)
+        :param backoff_max: 最长封禁时间(秒)
+        :return: 限流键 -> 封禁截止的 Unix 时间戳(未封禁为 0)
+        """
+        for attempt in range(2):
+            try:
+                result = {}
+                now = datetime.now()
+                rows = await db.execute(
+                    select(LoginThrottleModel)
+                    .where(LoginThrottleModel.throttle_key.in_([key for key, _ in keys]))
+                    .with_for_update()
+                )
+                existing = {row.throttle_key: row for row in rows.scalars()}
+                for key, threshold in keys:
+                    row = existing.get(key)
+                    if row is None:
+                        row = LoginThrottleModel(throttle_key=key)
+                        db.add(row)
+                    counter = FailureCounter(
+                        row.window_index or 0, row.previous_failures or 0, row.current_failures or 0,
+                        row.blocked_until.timestamp() if row.blocked_until else 0.0,
+                    )
+                    counter.add_failure(now.timestamp(), window, threshold, backoff_base, backoff_max)
+                    row.window_index = counter.window_index
+                    row.previous_failures = counter.previous
+                    row.current_failures = counter.current
+                    row.blocked_until = datetime.fromtimestamp(counter.blocked_until) if counter.blocked_until else None
+                    result[key] = counter.blocked_until
+                await db.commit()
+                return result
+            except IntegrityError:
+                # 另一个 worker 同时插入了同一个键, 重试时即可锁定该行
+                await db.rollback()
+                if attempt:
+                    raise
+            except Exception as e:
+                await db.rollback()
+                raise e
+
+    @staticmethod
+    async def get_blocked(db: AsyncSession):
+        """
+        查询仍在封禁中的限流键。
+        :return: (throttle_key, blocked_until) 列表
+        """
+        result = await db.execute(
+            select(LoginThrottleModel.throttle_key, LoginThrottleModel.blocked_until)
+            .where(LoginThrottleModel.blocked_until > datetime.now())
+        )
+        return result.all()
+
+    @staticmethod
+    async def clear(db: AsyncSession, key: str):
+        """清除限流键的失败计数(登录成功时调用)"""
+        try:
+            await db.execute(delete(LoginThrottleModel).where(LoginThrottleModel.throttle_key == key))
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def remove_stale(db: AsyncSession, window: float):
+        """
+        删除不再影响限流的记录: 封禁已结束, 且最近两个窗口内没有失败。
+        :return: 删除的行数
+        """
+        now = datetime.now()
+        try:
+            result = await db.execute(
+                delete(LoginThrottleModel)
+                .where(LoginThrottleModel.updated_at < now - timedelta(seconds=2 * window))
+                .where((LoginThrottleModel.blocked_until.is_(None)) | (LoginThrottleModel.blocked_until < now))
+            )
+            await db.commit()
+            return result.rowcount
+        except Exception as e:
+            await db.rollback()
+            raise e
@@ -1,9 +1,11 @@
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, text, insert
 
 from app.common.entity import TokenBlocklist
+from app.core.revocation import revoked_token_index
 
 
 class TokenBlocklistDAO:
@@ -21,27 +23,130 @@ class TokenBlocklistDAO:
             db.add(token)
             await db.commit()
             await db.refresh(token)
+            revoked_token_index.add(jti, expires_at)
             return token
         except Exception as e:
             await db.rollback()
             raise e
 
+    @staticmethod
+    async def add_many_to_blocklist(db: AsyncSession, tokens: list[dict]):
+        """
+        用一条多行 INSERT 撤销多个令牌并提交, 已在黑名单中的令牌被忽略。
+        :param db: 数据库会话
+        :param tokens: 撤销记录, 包含 jti、user_id、token_type、expires_at、revoked_reason
+        :return: 新写入的记录数, 小于 tokens 的长度说明部分令牌已被撤销(如刷新令牌被并发使用)
+        """
+        if not tokens:
+            return 0
+        try:
+            stmt = (
+                insert(TokenBlocklist)
+                .values(tokens)
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            result = await db.execute(stmt)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
+        for token in tokens:
+            revoked_token_index.add(token["jti"], token["expires_at"])
+        return result.rowcount
+
     @staticmethod
     async def is_token_revoked(db: AsyncSession, jti: str):
         token = await db.get(TokenBlocklist, jti)
         return token is not None
 
     @staticmethod
-    async def remove_expired_tokens(db: AsyncSession):
+    async def get_revoked_tokens(db: AsyncSession, created_since: datetime = None):
         """
-        删除所有已过期的令牌。
+        查询尚未过期的撤销记录。
         :param db: 数据库会话
+        :param created_since: 仅返回该时间之后创建的记录, 为 None 时返回全部
+        :return: (jti, expires_at, created_at) 列表
         """
-        try:
-            now = datetime.now()
-            stmt = delete(TokenBlocklist).where(TokenBlocklist.expires_at < now)
-            await db.execute(stmt)
-            await db.commit()
-        except Exception as e:
-            await db.rollback()
-            raise e
\ No newline at end of file
+        stmt = (
+            select(TokenBlocklist.jti, TokenBlocklist.expires_at, TokenBlocklist.created_at)
+            .where(TokenBlocklist.expires_at >= datetime.now())
+        )
+        if created_since is not None:
+            stmt = stmt.where(TokenBlocklist.created_at >= created_since)
+        result = await db.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    async def remove_expired_tokens(db: AsyncSession, batch_size: int = 5000, pause: float = 0.1):
+        """
+        分批删除所有已过期的令牌, 每批单独提交, 避免长时间持有锁。
+        :param db: 数据库会话
+        :param batch_size: 每批删除的最大行数
+        :param pause: 两批之间的等待时间(秒)
+        :return: 删除的总行数
+        """
+        now = datetime.now()
+        removed = 0
+        while True:
+            try:
+                result = await db.execute(
+                    select(TokenBlocklist.jti).where(TokenBlocklist.expires_at < now).limit(batch_size)
+                )
+                jtis = result.scalars().all()
+                if not jtis:
+                    break
+                await db.execute(delete(TokenBlocklist).where(TokenBlocklist.jti.in_(jtis)))
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                raise e
+            removed += len(jtis)
+            if len(jtis) < batch_size:
+                break
+            await asyncio.sleep(pause)
+        return removed
+
+    @staticmethod
+    async def get_partitions(db: AsyncSession):
+        """
+        查询 token_blocklist 的分区信息(仅在按 expires_at 分区后使用)。
+        :return: (分区名, 分区上界的 UNIX 时间戳; MAXVALUE 分区为 None) 列表
+        """
+        result = await db.execute(
+            text(
+                "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+                "ORDER BY PARTITION_ORDINAL_POSITION"
+            ),
+            {"table": TokenBlocklist.__tablename__}
+        )
+        return [
+            (name, None if description == "MAXVALUE" else int(description))
+            for name, description in result.all()
+        ]
+
+    @staticmethod
+    async def drop_partitions(db: AsyncSession, partition_names: list[str]):
+        """删除指定分区, 分区内的令牌必须已全部过期"""
+        if partition_names:
+            await db.execute(text(
+                f"ALTER TABLE {TokenBlocklist.__tablename__} DROP PARTITION {', '.join(partition_names)}"
+            ))
+
+    @staticmethod
+    async def add_partitions(db: AsyncSession, upper_bounds: list[datetime]):
+        """
+        从 MAXVALUE 分区中拆分出新的按天分区。
+        :param upper_bounds: 新分区的上界(不含), 按时间升序排列
+        """
+        if not upper_bounds:
+            return
+        definitions = [
+            f"PARTITION p{(bound - timedelta(days=1)):%Y%m%d} VALUES LESS THAN ({int(bound.timestamp())})"
+            for bound in upper_bounds
+        ]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        await db.execute(text(
+            f"ALTER TABLE {TokenBlocklist.__tablename__} REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})"
+        ))
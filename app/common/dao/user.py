@@ -1,17 +1,39 @@
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, delete, case, insert
 
-from app.common.entity import UserModel, RoleModel, UserRole
-from app.common.schemas import UserCreate
-from app.core.security import get_password_hash
+from app.common.entity import UserModel, RoleModel, UserRole, RolePermission, Permission
+from app.common.schemas import UserCreate, Principal, UserResponse
+from app.core.hasher import password_hasher
+
+# 用户目录只查询 UserResponse 中的列, 不加载密码哈希等其他列
+_DIRECTORY_COLUMNS = tuple(getattr(UserModel, name) for name in UserResponse.model_fields)
+
+
+def _student_directory(college: str = None, major: str = None, grade: int = None, stu_type: str = None):
+    """按筛选条件查询学生的语句, 按 user_id 排序"""
+    stmt = (
+        select(*_DIRECTORY_COLUMNS)
+        .join(UserRole, UserRole.user_id == UserModel.user_id)
+        .join(RoleModel, RoleModel.role_id == UserRole.role_id)
+        .where(RoleModel.role_name == "STUDENT", UserModel.status == "ENABLED")
+    )
+    if college is not None:
+        stmt = stmt.where(UserModel.college == college)
+    if major is not None:
+        stmt = stmt.where(UserModel.major == major)
+    if grade is not None:
+        stmt = stmt.where(UserModel.grade == grade)
+    if stu_type is not None:
+        stmt = stmt.where(UserModel.stu_type == stu_type)
+    return stmt.order_by(UserModel.user_id)
 
 
 class UserDAO:
     @staticmethod
     async def create_user(db: AsyncSession, user_data: UserCreate, role_id: int, create_by: str = "sys_service"):
         try:
-            hashed_password = get_password_hash(user_data.password)
+            hashed_password = await password_hasher.hash(user_data.password)
             new_user = UserModel(
                 **user_data.model_dump(exclude={"password"}), hashed_password=hashed_password,
                 created_by=create_by, updated_by=create_by
@@ -27,6 +49,42 @@ class UserDAO:
             await db.rollback()
             raise e
 
+    @staticmethod
+    async def bulk_create_users(db: AsyncSession, users: list[dict], role_id: int, create_by: str = "sys_service"):
+        """
+        使用多行 INSERT 批量创建用户及其角色关系, 不回读插入的数据。
+        :param db: 数据库会话
+        :param users: 用户字段字典列表, 需包含 hashed_password
+        :param role_id: 角色 ID
+        :param create_by: 创建者
+        """
+        if not users:
+            return
+        try:
+            await db.execute(
+                insert(UserModel),
+                [{**user, "created_by": create_by, "updated_by": create_by} for user in users]
+            )
+            await db.execute(
+                insert(UserRole),
+                [
+                    {"user_id": user["user_id"], "role_id": role_id, "created_by": create_by, "updated_by": create_by}
+                    for user in users
+                ]
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def get_existing_user_ids(db: AsyncSession, user_ids):
+        """查询给定 user_id 中已存在的部分"""
+        if not user_ids:
+            return set()
+        result = await db.execute(select(UserModel.user_id).where(UserModel.user_id.in_(user_ids)))
+        return set(result.scalars().all())
+
     @staticmethod
     async def update_login_info(db: AsyncSession, user_id: str, last_login_ip: str, last_login_at: datetime):
         try:
@@ -42,10 +100,236 @@ class UserDAO:
             await db.rollback()
             raise e
 
+    @staticmethod
+    async def bulk_update_login_info(db: AsyncSession, login_info: dict[str, tuple[str, datetime]]):
+        """
+        用一条 UPDATE 语句批量更新多个用户的最后登录信息。
+        :param db: 数据库会话
+        :param login_info: user_id -> (last_login_ip, last_login_at)
+        """
+        if not login_info:
+            return
+        try:
+            stmt = (
+                update(UserModel)
+                .where(UserModel.user_id.in_(login_info.keys()))
+                .values(
+                    last_login_ip=case(
+                        {user_id: ip for user_id, (ip, _) in login_info.items()}, value=UserModel.user_id
+                    ),
+                    last_login_at=case(
+                        {user_id: at for user_id, (_, at) in login_info.items()}, value=UserModel.user_id
+                    ),
+                    updated_by="sys_service",
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(stmt)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def update_status(db: AsyncSession, user_id: str, status: str, update_by: str = "sys_service"):
+        """修改用户状态, 同时递增令牌版本使此前签发的令牌失效, 返回新的令牌版本"""
+        try:
+            stmt = (
+                update(UserModel)
+                .where(UserModel.user_id == user_id)
+                .values(status=status, token_version=UserModel.token_version + 1, updated_by=update_by)
+            )
+            await db.execute(stmt)
+            version = await UserDAO.get_token_version(db, user_id)
+            await db.commit()
+            return version
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def update_password(db: AsyncSession, user_id: str, password: str, update_by: str = "sys_service"):
+        """修改用户密码, 同时递增令牌版本使此前签发的令牌失效, 返回新的令牌版本"""
+        try:
+            hashed_password = await password_hasher.hash(password)
+            stmt = (
+                update(UserModel)
+                .where(UserModel.user_id == user_id)
+                .values(hashed_password=hashed_password, token_version=UserModel.token_version + 1,
+                        updated_by=update_by)
+            )
+            await db.execute(stmt)
+            version = await UserDAO.get_token_version(db, user_id)
+            await db.commit()
+            return version
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def update_role(db: AsyncSession, user_id: str, role_id: int, update_by: str = "sys_service"):
+        """将用户的角色替换为指定角色, 同时递增令牌版本使携带旧角色的令牌失效, 返回新的令牌版本"""
+        try:
+            await db.execute(delete(UserRole).where(UserRole.user_id == user_id))
+            db.add(UserRole(user_id=user_id, role_id=role_id, created_by=update_by, updated_by=update_by))
+            await db.execute(
+                update(UserModel)
+                .where(UserModel.user_id == user_id)
+                .values(token_version=UserModel.token_version + 1, updated_by=update_by)
+            )
+            version = await UserDAO.get_token_version(db, user_id)
+            await db.commit()
+            return version
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def bump_token_version(db: AsyncSession, user_id: str, update_by: str = "sys_service"):
+        """
+        递增用户的令牌版本, 使此前签发的所有令牌失效。
+        :param db: 数据库会话
+        :param user_id: 用户 ID
+        :param update_by: 更新者
+        :return: 新的令牌版本, 用户不存在时返回 None
+        """
+        try:
+            await db.execute(
+                update(UserModel)
+                .where(UserModel.user_id == user_id)
+                .values(token_version=UserModel.token_version + 1, updated_by=update_by)
+            )
+            version = await UserDAO.get_token_version(db, user_id)
+            await db.commit()
+            return version
+        except Exception as e:
+            await db.rollback()
+            raise e
+
+    @staticmethod
+    async def get_token_version(db: AsyncSession, user_id: str):
+        result = await db.execute(select(UserModel.token_version).where(UserModel.user_id == user_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_token_versions(db: AsyncSession, updated_since: datetime = None):
+        """
+        获取令牌版本不为 0 的用户。
+        :param db: 数据库会话
+        :param updated_since: 仅返回该时间之后更新的用户, None 表示全部
+        :return: (user_id, token_version, updated_at) 列表
+        """
+        stmt = select(UserModel.user_id, UserModel.token_version, UserModel.updated_at).where(
+            UserModel.token_version > 0
+        )
+        if updated_since is not None:
+            stmt = stmt.where(UserModel.updated_at >= updated_since)
+        result = await db.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    async def get_student_ids(db: AsyncSession, college: str = None, major: str = None, grade: int = None,
+                              limit: int = 1000):
+        """
+        按学院、专业、年级筛选学生(即一个班级)。
+        :param db: 数据库会话
+        :param college: 学院
+        :param major: 专业
+        :param grade: 年级
+        :param limit: 最多返回的学生数
+        :return: 用户 ID 列表
+        """
+        stmt = (
+            select(UserModel.user_id)
+            .join(UserRole, UserRole.user_id == UserModel.user_id)
+            .join(RoleModel, RoleModel.role_id == UserRole.role_id)
+            .where(RoleModel.role_name == "STUDENT", UserModel.status == "ENABLED")
+        )
+        if college is not None:
+            stmt = stmt.where(UserModel.college == college)
+        if major is not None:
+            stmt = stmt.where(UserModel.major == major)
+        if grade is not None:
+            stmt = stmt.where(UserModel.grade == grade)
+        result = await db.execute(stmt.order_by(UserModel.user_id).limit(limit))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def list_students(db: AsyncSession, college: str = None, major: str = None, grade: int = None,
+                            stu_type: str = None, after: str = None, limit: int = 50):
+        """
+        分页查询学生目录。
+        按 user_id 翻页(WHERE user_id > after), 每页的查询代价与页码无关。
+        :param db: 数据库会话
+        :param college: 学院
+        :param major: 专业
+        :param grade: 年级
+        :param stu_type: 学生类型
+        :param after: 上一页最后一个 user_id, None 表示第一页
+        :param limit: 返回的最大条数
+        :return: 行映射列表, 键为 UserResponse 的字段
+        """
+        stmt = _student_directory(college, major, grade, stu_type)
+        if after is not None:
+            stmt = stmt.where(UserModel.user_id > after)
+        result = await db.execute(stmt.limit(limit))
+        return result.mappings().all()
+
+    @staticmethod
+    async def stream_students(db: AsyncSession, college: str = None, major: str = None, grade: int = None,
+                              stu_type: str = None, batch_size: int = 1000):
+        """
+        使用服务端游标逐批读取学生目录, 内存占用与结果总数无关。
+        :param db: 数据库会话
+        :param college: 学院
+        :param major: 专业
+        :param grade: 年级
+        :param stu_type: 学生类型
+        :param batch_size: 每批读取的行数
+        :return: 异步生成行映射列表
+        """
+        stmt = _student_directory(college, major, grade, stu_type).execution_options(yield_per=batch_size)
+        result = await db.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield partition
+
     @staticmethod
     async def get_user_by_user_id(db: AsyncSession, user_id: str):
         return await db.get(UserModel, user_id)
 
+    @staticmethod
+    async def get_principal(db: AsyncSession, user_id: str):
+        """
+        一次查询加载用户及其角色、权限名称。
+        :param db: 数据库会话
+        :param user_id: 用户 ID
+        :return: Principal 或 None
+        """
+        result = await db.execute(
+            select(
+                UserModel.user_id, UserModel.name, UserModel.status, UserModel.hashed_password,
+                UserModel.token_version, RoleModel.role_name, Permission.perm_name
+            )
+            .outerjoin(UserRole, UserRole.user_id == UserModel.user_id)
+            .outerjoin(RoleModel, RoleModel.role_id == UserRole.role_id)
+            .outerjoin(RolePermission, RolePermission.role_id == RoleModel.role_id)
+            .outerjoin(Permission, Permission.perm_id == RolePermission.perm_id)
+            .where(UserModel.user_id == user_id)
+        )
+        rows = result.all()
+        if not rows:
+            return None
+        first = rows[0]
+        return Principal(
+            user_id=first.user_id,
+            name=first.name,
+            status=first.status,
+            roles=frozenset(row.role_name for row in rows if row.role_name is not None),
+            permissions=frozenset(row.perm_name for row in rows if row.perm_name is not None),
+            token_version=first.token_version,
+            hashed_password=first.hashed_password,
+        )
+
     @staticmethod
     async def get_role_by_role_name(db: AsyncSession, role_name: str):
         result = await db.execute(
@@ -1,2 +1,4 @@
 from app.common.entity.token import TokenBlocklist
-from app.common.entity.user import UserModel, RoleModel, UserRole
\ No newline at end of file
+from app.common.entity.user import UserModel, RoleModel, UserRole, RolePermission, Permission
+from app.common.entity.sensor import SensorFrameModel
+from app.common.entity.throttle import LoginThrottleModel
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Integer, Float, BigInteger, DateTime, LargeBinary, Index
+from sqlalchemy.dialects.mysql import DATETIME, MEDIUMBLOB
+
+from app.core.database import Base
+
+
+class SensorFrameModel(Base):
+    """传感器数据帧表"""
+    __tablename__ = 'sensor_frames'
+    __table_args__ = (
+        Index('idx_sensor_frames_user_modality_time', 'user_id', 'modality', 'captured_at'),
+    )
+
+    frame_id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True,
+                      comment="帧ID")
+    user_id = Column(String(20), nullable=False, comment="学习者ID")
+    modality = Column(String(16), nullable=False, comment="模态")
+    seq = Column(BigInteger, comment="设备端序号")
+    captured_at = Column(DateTime().with_variant(DATETIME(fsp=6), 'mysql'), nullable=False, comment="首个采样点的采集时间")
+    sample_rate = Column(Float, nullable=False, comment="采样率(Hz)")
+    sample_count = Column(Integer, nullable=False, comment="采样点数")
+    channel_count = Column(Integer, nullable=False, comment="通道数")
+    payload = Column(LargeBinary().with_variant(MEDIUMBLOB, 'mysql'), nullable=False, comment="原始 msgpack 消息")
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime
+
+from app.core.database import Base
+
+
+class LoginThrottleModel(Base):
+    """登录失败计数表, 共享模式下各 worker 通过该表同步登录限流状态"""
+    __tablename__ = 'login_throttle'
+
+    throttle_key = Column(String(64), primary_key=True, comment="限流键(ip:<IP> 或 user:<账号>)")
+    window_index = Column(BigInteger, nullable=False, default=0, comment="当前计数窗口的序号")
+    previous_failures = Column(Integer, nullable=False, default=0, comment="上一个窗口的失败次数")
+    current_failures = Column(Integer, nullable=False, default=0, comment="当前窗口的失败次数")
+    blocked_until = Column(DateTime, nullable=True, index=True, comment="封禁截止时间")
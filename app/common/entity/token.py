@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, DateTime, UUID, Enum, ForeignKey, TypeDecorator
+from sqlalchemy import Column, String, DateTime, UUID, Enum, ForeignKey, TypeDecorator, Index
 from sqlalchemy.dialects.mysql import BINARY
 
 from app.core.database import Base
@@ -25,6 +25,9 @@ class BinaryUUIDType(TypeDecorator):
 
 class TokenBlocklist(Base):
     __tablename__ = "token_blocklist"
+    __table_args__ = (
+        Index('idx_token_blocklist_created_at', 'created_at'),  # 各 worker 按创建时间增量同步撤销记录
+    )
     jti = Column(BinaryUUIDType, primary_key=True, index=True)  # 唯一标识
     user_id = Column(String(20), ForeignKey("users.user_id", ondelete='CASCADE', onupdate='CASCADE'))  # 用户ID
     token_type = Column(Enum("access", "refresh", name="token_type_enum"), nullable=False)  # 令牌类型
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, Date, TIMESTAMP, ForeignKey, Integer
+from sqlalchemy import Column, String, Enum, Date, TIMESTAMP, ForeignKey, Integer, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -28,6 +28,11 @@ class RolePermission(Base):
 class UserModel(Base):
     """用户表"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # 用户目录按班级或年级筛选, 以 user_id 结尾便于按 user_id 翻页
+        Index('idx_users_class', 'college', 'major', 'grade', 'user_id'),
+        Index('idx_users_grade_type', 'grade', 'stu_type', 'user_id'),
+    )
 
     user_id = Column(String(20), primary_key=True, comment="用户ID")
     hashed_password = Column(String(128), nullable=False, comment="Hash密码")
@@ -44,6 +49,7 @@ class UserModel(Base):
 
     last_login_at = Column(TIMESTAMP, comment="最后登录时间")
     last_login_ip = Column(String(45), comment="最后登录IP")
+    token_version = Column(Integer, default=0, nullable=False, comment="令牌版本, 递增后此前签发的令牌全部失效")
 
     created_by = Column(String(20), nullable=False, comment="创建者")
     updated_by = Column(String(20), nullable=False, comment="更新者")
@@ -1,2 +1,7 @@
-from app.common.schemas.token import TokenResponse, TokenRefreshRequest
-from app.common.schemas.user import UserCreate, UserResponse, UserInDB
\ No newline at end of file
+from app.common.schemas.token import TokenResponse, TokenRefreshRequest, IntrospectionRequest, IntrospectionResult, \
+    IntrospectionResponse
+from app.common.schemas.user import UserCreate, UserResponse, UserPage, UserInDB, UserStatusUpdate, PasswordChange, \
+    RoleChange
+from app.common.schemas.principal import Principal
+from app.common.schemas.sensor import SensorFrame, SENSOR_FRAME_SCHEMAS
+from app.common.schemas.stream import StreamCallback
@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    已认证用户的精简表示。
+    由 UserDAO.get_principal 一次查询加载, 不持有 ORM 实例, 可在路由与 RabbitMQ 认证后端之间共享。
+    也可由访问令牌中的声明直接构造(见 auth.services.get_current_user), 此时不包含权限与密码哈希。
+    """
+    user_id: str
+    name: str
+    status: str
+    roles: frozenset[str] = frozenset()
+    permissions: frozenset[str] = frozenset()
+    token_version: int = 0
+    hashed_password: str = field(default="", repr=False)
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.status == "ENABLED"
+
+    @property
+    def is_admin(self) -> bool:
+        return any("ADMIN" in role for role in self.roles)
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
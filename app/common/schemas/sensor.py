@@ -0,0 +1,67 @@
+from typing import ClassVar, Optional
+
+from pydantic import BaseModel, Field, FiniteFloat, model_validator
+
+
+class SensorFrame(BaseModel):
+    """
+    设备上报的一帧传感器数据(msgpack 编码)。
+    学习者 ID 与模态由 routing key ``sensor.<user_id>.<modality>`` 给出, 不在消息体中重复。
+    """
+    CHANNELS: ClassVar[tuple[int, int]] = (1, 64)  # 允许的通道数范围
+    MAX_SAMPLES: ClassVar[int] = 4096  # 单帧最多采样点数
+    MAX_TIMESTAMP: ClassVar[float] = 4102444800.0  # 2100-01-01, 更大的值无法转换为 datetime 或不是合法时间
+
+    timestamp: float = Field(gt=0, lt=MAX_TIMESTAMP)  # 首个采样点的 Unix 时间戳(秒)
+    sample_rate: float = Field(gt=0, le=10000)  # 采样率(Hz)
+    seq: Optional[int] = Field(default=None, ge=0, le=2 ** 63 - 1)  # 设备端递增序号, 用于检测丢帧, 不超过 BIGINT 范围
+    # 采样点 x 通道; NaN/inf 会使状态引擎中增量维护的窗口和永久失效, 校验时拒绝
+    data: list[list[FiniteFloat]]
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        if not 0 < len(self.data) <= self.MAX_SAMPLES:
+            raise ValueError(f"sample count must be between 1 and {self.MAX_SAMPLES}")
+        channels = len(self.data[0])
+        low, high = self.CHANNELS
+        if not low <= channels <= high:
+            raise ValueError(f"channel count must be between {low} and {high}")
+        if any(len(sample) != channels for sample in self.data):
+            raise ValueError("all samples must have the same number of channels")
+        return self
+
+
+class EEGFrame(SensorFrame):
+    """脑电, 每通道一个电极"""
+    CHANNELS = (1, 64)
+
+
+class HeartRateFrame(SensorFrame):
+    """心率(bpm)"""
+    CHANNELS = (1, 1)
+    MAX_SAMPLES = 256
+
+
+class EDAFrame(SensorFrame):
+    """皮肤电活动(μS)"""
+    CHANNELS = (1, 1)
+
+
+class EyeFrame(SensorFrame):
+    """眼动: 注视点 x、y(归一化坐标), 可选瞳孔直径"""
+    CHANNELS = (2, 3)
+
+
+class IMUFrame(SensorFrame):
+    """惯性测量: 加速度 xyz、角速度 xyz, 可选磁力计 xyz"""
+    CHANNELS = (6, 9)
+
+
+# routing key 中的模态名 -> 校验模型
+SENSOR_FRAME_SCHEMAS: dict[str, type[SensorFrame]] = {
+    "eeg": EEGFrame,
+    "hr": HeartRateFrame,
+    "eda": EDAFrame,
+    "eye": EyeFrame,
+    "imu": IMUFrame,
+}
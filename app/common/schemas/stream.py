@@ -0,0 +1,15 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class StreamCallback(BaseModel):
+    """流媒体服务器(SRS)HTTP 回调的请求体, 只列出授权需要的字段"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    action: str = ""  # on_connect / on_publish / on_play
+    client_id: str = ""  # 流媒体服务器分配的客户端 ID
+    ip: str = ""  # 客户端 IP
+    vhost: str = ""
+    app: str = ""  # 应用名, 如 live
+    stream: str = ""  # 流名, on_connect 时为空
+    param: str = ""  # 推流/播放地址中的查询参数, 如 ?token=...
+    tc_url: str = Field("", alias="tcUrl")  # 连接地址, on_connect 时查询参数可能只出现在这里
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class TokenResponse(BaseModel):
@@ -9,3 +9,19 @@ class TokenResponse(BaseModel):
 
 class TokenRefreshRequest(BaseModel):
     refresh_token: str
+
+
+class IntrospectionRequest(BaseModel):
+    tokens: list[str] = Field(min_length=1, max_length=100)  # 待校验的访问令牌
+
+
+class IntrospectionResult(BaseModel):
+    active: bool  # 令牌是否有效
+    sub: str | None = None  # 用户 ID
+    roles: list[str] | None = None  # 用户角色
+    exp: int | None = None  # 过期时间(Unix 时间戳)
+
+
+class IntrospectionResponse(BaseModel):
+    results: list[IntrospectionResult]  # 与请求中的 tokens 一一对应
+    max_age: int  # 结果可缓存的秒数
@@ -40,6 +40,24 @@ class UserResponse(UserBase):
     last_login_ip: Optional[str] = None
 
 
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: Optional[str] = None  # 下一页的游标(本页最后一个 user_id), 没有下一页时为 None
+
+
+class UserStatusUpdate(BaseModel):
+    status: StatusEnum
+
+
+class PasswordChange(BaseModel):
+    new_password: str
+    old_password: Optional[str] = None  # 修改自己的密码时必填, 管理员重置他人密码时不需要
+
+
+class RoleChange(BaseModel):
+    role_id: int
+
+
 class UserInDB(UserBase):
     hashed_password: str
     status: StatusEnum = StatusEnum.Enabled
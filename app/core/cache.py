@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.revocation import token_version_index
+
+
+class DecisionCache:
+    """
+    认证/授权结果缓存。
+    缓存键为凭据及所访问资源的 HMAC 摘要, 密钥在进程启动时随机生成, 不保存任何明文凭据。
+    条目在各自的 TTL 到期或所属用户状态/密码/角色变更时失效:
+    本进程的变更直接调用 invalidate_user; 其他 worker 的变更会递增用户的令牌版本, 条目记录写入时的版本,
+    查询时与同步的令牌版本索引比较, 版本落后或索引不可用时视为未命中。
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 10000, versions=token_version_index):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.versions = versions
+        self._secret = secrets.token_bytes(32)
+        # key -> (user_id, 结果, 过期时间, 令牌版本)
+        self._entries: OrderedDict[bytes, tuple[str | None, str, float, int | None]] = OrderedDict()
+        self._user_keys: dict[str, set[bytes]] = {}  # user_id -> 该用户的所有缓存键
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts: str) -> bytes:
+        message = b"\x00".join(part.encode("utf-8") for part in parts)
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def lookup(self, key: bytes) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[2] < time.monotonic() or not self._is_current(entry[0], entry[3]):
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def _is_current(self, user_id: str | None, version: int | None) -> bool:
+        if version is None:
+            return True
+        current = self.versions.get(user_id)
+        return current is not None and current <= version
+
+    def store(self, key: bytes, user_id: str | None, decision: str, ttl: float | None = None,
+              version: int | None = None):
+        """
+        :param key: 由 key() 计算的缓存键
+        :param user_id: 结果所属的用户, 为 None 时(如无效凭据)只能等待过期
+        :param decision: 缓存的结果
+        :param ttl: 本条目的缓存时间(秒), 默认为 self.ttl, 不超过 self.ttl
+        :param version: 得出结果时用户的令牌版本(应在校验之前读取), 用户的版本递增后条目失效
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or not self._is_current(user_id, version):
+            return
+        if key in self._entries:
+            self._remove(key)
+        while len(self._entries) >= self.max_size:
+            self._remove(next(iter(self._entries)))
+        self._entries[key] = (user_id, decision, time.monotonic() + ttl, version)
+        if user_id is not None:
+            self._user_keys.setdefault(user_id, set()).add(key)
+
+    def invalidate_user(self, user_id: str):
+        """使指定用户的所有缓存条目失效(用户被禁用、修改密码或角色变更时调用)"""
+        for key in self._user_keys.pop(user_id, ()):
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._user_keys.clear()
+
+    def _remove(self, key: bytes):
+        user_id = self._entries.pop(key)[0]
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+
+class CredentialCache(DecisionCache):
+    """
+    已验证凭据缓存。
+    缓存键为 (用户名, 密码) 的 HMAC 摘要, 仅缓存验证成功的结果。
+    """
+
+    def get(self, username: str, password: str) -> str | None:
+        return self.lookup(self.key(username, password))
+
+    def put(self, username: str, password: str, decision: str, version: int):
+        self.store(self.key(username, password), username, decision, version=version)
+
+
+# RabbitMQ HTTP 认证后端的凭据缓存
+broker_credential_cache = CredentialCache(
+    ttl=settings.RABBITMQ_AUTH_CACHE_TTL,
+    max_size=settings.RABBITMQ_AUTH_CACHE_SIZE,
+)
+
+# 流媒体服务器推流/播放回调的授权结果缓存, 键为 (访问令牌, 回调动作, 流地址)
+stream_decision_cache = DecisionCache(
+    ttl=settings.STREAM_AUTH_CACHE_TTL,
+    max_size=settings.STREAM_AUTH_CACHE_SIZE,
+)
@@ -1 +1,2 @@
-from app.core.database.base import Base, get_db
\ No newline at end of file
+from app.core.database.base import Base, get_db, engine, AsyncSessionLocal, warm_up_pool
+from app.core.database.replica import get_read_db
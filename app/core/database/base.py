@@ -1,19 +1,74 @@
+import asyncio
+import logging
+import time
 from datetime import datetime
 from typing import Callable
 
-from sqlalchemy import Column, TIMESTAMP
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import Column, TIMESTAMP, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import registry, Gauge, db_pool_wait, db_pool_timeouts
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """记录连接获取等待时间的连接池"""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_timeouts.inc()
+            raise
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started_at)
+
+
+def pool_options() -> dict:
+    """
+    每个 worker 进程的连接池参数。
+    设置了 DB_MAX_CONNECTIONS 时, 连接总数按 worker 数平分, 保证所有 worker 的连接池(含溢出)同时用满也不超过该值。
+    """
+    pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_MAX_CONNECTIONS > 0:
+        per_worker = max(1, settings.DB_MAX_CONNECTIONS // max(1, settings.WORKERS))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return {
+        "poolclass": InstrumentedAsyncQueuePool,  # 记录等待时间的连接池
+        "pool_size": pool_size,  # 连接池大小
+        "max_overflow": max_overflow,  # 连接池溢出大小
+        "pool_timeout": settings.DB_POOL_TIMEOUT,  # 获取连接的超时时间
+        "pool_recycle": settings.DB_POOL_RECYCLE,  # 连接回收时间
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # 连接池预先ping
+    }
+
+
+def pool_stats(async_engine: AsyncEngine) -> dict:
+    """连接池的当前状态"""
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
 
 # 初始化数据库引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,  # 数据库连接字符串
-    pool_size=20,  # 连接池大小
-    max_overflow=30,  # 连接池溢出大小
-    pool_pre_ping=True  # 连接池预先ping
-)
+engine = create_async_engine(settings.DATABASE_URL, **pool_options())
+
+# 连接池状态指标, 在采集时读取
+registry.register(Gauge("db_pool_size", "Configured connection pool size", lambda: engine.pool.size()))
+registry.register(Gauge("db_pool_checked_out", "Connections currently checked out", lambda: engine.pool.checkedout()))
+registry.register(Gauge("db_pool_overflow", "Connections opened beyond pool_size", lambda: engine.pool.overflow()))
 
 
 class TimestampMixin:
@@ -44,3 +99,32 @@ AsyncSessionLocal: Callable[..., AsyncSession] = sessionmaker(
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def warm_up_pool(async_engine: AsyncEngine, connections: int) -> int:
+    """
+    预先打开连接池中的连接, 避免部署后的首批请求逐个建立连接。
+    :param async_engine: 数据库引擎
+    :param connections: 打开的连接数, 不超过连接池大小(超出部分是溢出连接, 归还时即被关闭)
+    :return: 成功打开的连接数
+    """
+    connections = min(connections, async_engine.pool.size())
+
+    async def connect():
+        conn = await async_engine.connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    # 同时持有所有连接, 否则归还的连接会被下一次获取复用
+    results = await asyncio.gather(*(connect() for _ in range(connections)), return_exceptions=True)
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        await conn.close()
+    if len(opened) < connections:
+        logger.warning("Opened %d of %d database connections: %s", len(opened), connections,
+                       next(e for e in results if isinstance(e, BaseException)))
+    return len(opened)
@@ -0,0 +1,26 @@
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+
+from app.core.database.base import engine
+
+
+@asynccontextmanager
+async def advisory_lock(name: str):
+    """
+    基于 MySQL GET_LOCK 的跨进程互斥锁, 用于在多个 worker 中选出唯一执行者。
+    锁与数据库连接绑定, 连接断开时自动释放; 非 MySQL 数据库(如本地测试使用的 SQLite)始终视为获得锁。
+    :param name: 锁名称
+    :return: 是否获得锁
+    """
+    if engine.dialect.name != "mysql":
+        yield True
+        return
+
+    async with engine.connect() as conn:
+        acquired = (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name})).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
@@ -0,0 +1,245 @@
+import contextvars
+import logging
+import time
+from typing import Callable
+
+from jose import jwt, JWTError
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database.base import AsyncSessionLocal, pool_options, pool_stats, warm_up_pool
+from app.core.metrics import registry, Gauge, db_read_sessions
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的客户端标识(访问令牌的 sub 或客户端地址), 用于读己之写
+_client_key: contextvars.ContextVar[str | None] = contextvars.ContextVar("db_client_key", default=None)
+
+_primary_reads = db_read_sessions.labels("primary")
+_pinned_reads = db_read_sessions.labels("pinned")
+_replica_reads = db_read_sessions.labels("replica")
+
+
+class Replica:
+    """一个只读副本及其健康状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_async_engine(url, **pool_options())
+        self.session_factory: Callable[..., AsyncSession] = sessionmaker(
+            bind=self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=True
+        )
+        self.healthy = True
+        self.lag: float | None = None  # 复制延迟(秒), 无权限查询时为 None
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    async def check(self, max_lag: float):
+        """检查副本是否可用: 能够连接, 且复制延迟不超过 max_lag"""
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                self.lag = await self._replication_lag(conn)
+            healthy = self.lag is None or self.lag <= max_lag
+        except (DBAPIError, OSError) as e:
+            logger.debug("Replica %s check failed: %s", self.name, e)
+            healthy = False
+        if healthy != self.healthy:
+            logger.warning("Replica %s is now %s (lag=%s)", self.name, "healthy" if healthy else "unhealthy", self.lag)
+        self.healthy = healthy
+
+    async def _replication_lag(self, conn) -> float | None:
+        if self.engine.dialect.name != "mysql":
+            return None
+        try:
+            row = (await conn.execute(text("SHOW REPLICA STATUS"))).mappings().first()
+        except DBAPIError:
+            # 缺少 REPLICATION CLIENT 权限或 MySQL 版本过低, 只检查连通性
+            return None
+        if row is None:
+            return None
+        lag = row.get("Seconds_Behind_Source")
+        # 复制线程停止时延迟为 NULL, 视为无限大
+        return float(lag) if lag is not None else float("inf")
+
+
+class WritePins:
+    """
+    读己之写: 客户端提交写事务后的一段时间内, 其读请求固定路由到主库。
+    """
+
+    def __init__(self, window: float, max_entries: int = 100_000):
+        self.window = window
+        self.max_entries = max_entries
+        self._pins: dict[str, float] = {}
+
+    def pin(self, key: str):
+        now = time.monotonic()
+        if len(self._pins) >= self.max_entries:
+            self._pins = {k: until for k, until in self._pins.items() if until > now}
+        self._pins[key] = now + self.window
+
+    def is_pinned(self, key: str | None) -> bool:
+        if key is None:
+            return False
+        until = self._pins.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._pins.pop(key, None)
+            return False
+        return True
+
+
+class ReadRouter:
+    """
+    读写分离路由。
+    写请求和读己之写窗口内的读请求使用主库, 其余读请求使用负载最低的健康副本, 没有可用副本时回退到主库。
+    """
+
+    def __init__(self, urls: list[str], pin_window: float, max_lag: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.pins = WritePins(pin_window)
+        self.max_lag = max_lag
+
+    def choose(self) -> Replica | None:
+        """选择当前连接数最少的健康副本"""
+        best = None
+        for replica in self.replicas:
+            if replica.healthy and (best is None or replica.engine.pool.checkedout() < best.engine.pool.checkedout()):
+                best = replica
+        return best
+
+    async def check_replicas(self):
+        for replica in self.replicas:
+            await replica.check(self.max_lag)
+
+    async def warm_up(self, connections: int):
+        """预先打开各健康副本的连接"""
+        for replica in self.replicas:
+            if replica.healthy:
+                await warm_up_pool(replica.engine, connections)
+
+    def stats(self) -> list[dict]:
+        return [
+            {"url": replica.name, "healthy": replica.healthy, "lag": replica.lag, "pool": pool_stats(replica.engine)}
+            for replica in self.replicas
+        ]
+
+    def healthy_count(self) -> int:
+        return sum(replica.healthy for replica in self.replicas)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+read_router = ReadRouter(
+    settings.DATABASE_REPLICA_URIS,
+    settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, _flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_after_commit(session):
+    if session.info.pop("wrote", False):
+        key = _client_key.get()
+        if key is not None:
+            read_router.pins.pin(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session):
+    session.info.pop("wrote", None)
+
+
+async def get_read_db():
+    """
+    只读会话依赖。
+    配置了副本时将读请求分流到副本, 当前客户端刚提交过写事务时仍使用主库以读到自己的写入。
+    """
+    replica = None
+    if read_router.replicas:
+        if read_router.pins.is_pinned(_client_key.get()):
+            _pinned_reads.inc()
+        else:
+            replica = read_router.choose()
+    if replica is None:
+        _primary_reads.inc()
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    _replica_reads.inc()
+    async with replica.session_factory() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            # 连接失效时立即摘除副本, 由健康检查任务恢复
+            if e.connection_invalidated:
+                replica.healthy = False
+            raise
+
+
+def _client_key_from_scope(scope) -> str | None:
+    """
+    读己之写的客户端标识。
+    携带访问令牌时按令牌的 sub(用户)区分, 刷新令牌后或同一用户的多个会话共享固定状态;
+    这里只决定读路由, 不校验签名(伪造的令牌最多使读请求改用主库)。否则按客户端地址区分。
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    subject = jwt.get_unverified_claims(token).get("sub")
+                except JWTError:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else None
+
+
+class ReadYourWritesMiddleware:
+    """
+    记录当前请求的客户端标识, 供写事务提交后固定该客户端的读路由。
+    固定状态保存在每个 worker 内, 只保证后续由同一 worker 处理的读请求能读到自己的写入。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        # 未配置副本时所有读请求都使用主库, 不需要客户端标识
+        key = _client_key_from_scope(scope) if read_router.replicas else None
+        token = _client_key.set(key)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _client_key.reset(token)
+
+
+registry.register(Gauge("db_replicas_healthy", "Healthy read replicas", read_router.healthy_count))
@@ -0,0 +1,195 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import registry, Gauge, password_hash_duration, password_hash_queue_wait, \
+    password_hash_rejected
+from app.core.security import verify_password, get_password_hash
+
+
+_verify_duration = password_hash_duration.labels("verify")
+_hash_duration = password_hash_duration.labels("hash")
+_rejected_saturated = password_hash_rejected.labels("saturated")
+_rejected_deadline = password_hash_rejected.labels("deadline")
+
+
+class HashDeadlineExceeded(Exception):
+    """任务在排队期间已超过截止时间, 工作线程/进程不再执行"""
+
+
+def _run_before_deadline(deadline: float, func, *args):
+    """
+    在工作线程/进程中执行哈希函数。
+    若任务开始执行时已超过截止时间, 则直接放弃, 避免为已经超时的请求消耗 CPU。
+    :return: (结果, 开始执行时间, 执行结束时间)
+    """
+    started_at = time.time()
+    if started_at > deadline:
+        raise HashDeadlineExceeded()
+    result = func(*args)
+    return result, started_at, time.time()
+
+
+class PasswordHashExecutor:
+    """
+    密码哈希执行器。
+    将 Argon2 哈希与校验放到独立的线程池/进程池中执行, 避免阻塞事件循环;
+    通过有界队列与截止时间进行准入控制, 饱和时以 503 拒绝请求。
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 0, queue_size: int = 64, timeout: float = 2.0,
+                 bulk_workers: int = 0):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.bulk_workers = min(bulk_workers or max(1, self.workers // 2), self.workers)
+        # 所有批量任务共享的并发上限, 多个导入同时进行时也至少为交互请求保留 workers - bulk_workers 个工作线程/进程
+        self._bulk_slots = asyncio.Semaphore(self.bulk_workers)
+        self._executor: Executor | None = None
+
+        # 运行时统计
+        self._pending = 0  # 已提交但尚未完成的任务数(排队 + 执行中)
+        self._running = 0  # 正在执行的任务数
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait_total = 0.0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """允许同时存在的最大任务数(执行中 + 排队)"""
+        return self.workers + self.queue_size
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            # 使用 spawn 避免在已运行事件循环的进程中 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """返回执行器的运行状态, 用于按 CPU 核数调整配置"""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "bulk_workers": self.bulk_workers,
+            "queue_depth": self._pending - self._running,
+            "running": self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_queue_wait_ms": self.queue_wait_total / self.completed * 1000 if self.completed else 0.0,
+            "avg_hash_ms": self.hash_time_total / self.completed * 1000 if self.completed else 0.0,
+            "max_hash_ms": self.hash_time_max * 1000,
+        }
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, plain_password, hashed_password, histogram=_verify_duration)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(get_password_hash, password, histogram=_hash_duration)
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """
+        批量计算密码哈希, 用于批量导入。
+        所有批量任务合计同时最多提交 bulk_workers 个任务, 任务排队等待而不是被拒绝,
+        其余工作线程/进程和队列容量留给登录等交互请求。
+        :return: 与 passwords 顺序一致的哈希列表
+        """
+
+        async def hash_one(password: str) -> str:
+            async with self._bulk_slots:
+                return await self._submit(get_password_hash, password, histogram=_hash_duration, admission=False)
+
+        return list(await asyncio.gather(*(hash_one(password) for password in passwords)))
+
+    async def _submit(self, func, *args, histogram, admission: bool = True):
+        if self._executor is None:
+            self.start()
+        if admission and self._pending >= self.capacity:
+            self.rejected += 1
+            _rejected_saturated.inc()
+            raise self._unavailable()
+
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        deadline = submitted_at + self.timeout if admission else float("inf")
+        self._pending += 1
+        self.submitted += 1
+        concurrent_future = self._executor.submit(_run_before_deadline, deadline, func, *args)
+        # 以底层任务真正结束(完成或被取消)为准释放名额, 超时返回的请求不会提前释放仍在执行的任务
+        concurrent_future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        self._running = min(self._pending, self.workers)
+        future = asyncio.wrap_future(concurrent_future, loop=loop)
+        try:
+            result, started_at, finished_at = await asyncio.wait_for(future, timeout=self.timeout if admission else None)
+        except (asyncio.TimeoutError, HashDeadlineExceeded):
+            self.timed_out += 1
+            _rejected_deadline.inc()
+            raise self._unavailable()
+
+        hash_time = finished_at - started_at
+        queue_wait = max(started_at - submitted_at, 0.0)
+        histogram.observe(hash_time)
+        password_hash_queue_wait.observe(queue_wait)
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.hash_time_total += hash_time
+        self.hash_time_max = max(self.hash_time_max, hash_time)
+        return result
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # 事件循环已关闭(应用退出阶段), 无需再记账
+            pass
+
+    def _release(self):
+        self._pending -= 1
+        self._running = min(self._pending, self.workers)
+
+    @staticmethod
+    def _unavailable():
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing service is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
+
+
+password_hasher = PasswordHashExecutor(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_TIMEOUT,
+    bulk_workers=settings.PASSWORD_HASH_BULK_WORKERS,
+)
+
+registry.register(Gauge(
+    "password_hash_queue_depth", "Password hash tasks waiting for a worker",
+    lambda: password_hasher.stats()["queue_depth"]
+))
+registry.register(Gauge(
+    "password_hash_running", "Password hash tasks currently executing", lambda: password_hasher.stats()["running"]
+))
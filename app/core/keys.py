@@ -0,0 +1,106 @@
+import logging
+import os
+from typing import Optional
+
+from jose import jwk, jwt, JWTError
+
+logger = logging.getLogger(__name__)
+
+# python-jose 支持的非对称签名算法(不支持 EdDSA)
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+class TokenKeyRing:
+    """
+    JWT 签名与验证密钥环。
+    HS* 算法使用共享密钥 ``TOKEN_KEY``; 非对称算法从目录中加载 PEM 密钥:
+        ``<kid>.pem``      私钥, 可用于签名, 其公钥用于验证并发布到 JWKS
+        ``<kid>.pub.pem``  公钥, 仅用于验证(轮换后保留旧密钥, 直到用它签发的令牌全部过期)
+    密钥在启动时解析一次并缓存, 签发的令牌在头部携带 ``kid``, 验证时按 ``kid`` 选择密钥。
+    """
+
+    def __init__(self, algorithm: str, secret: str = None, keys_dir: str = None, active_kid: str = None):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self.signing_kid: Optional[str] = None
+        self._signing_key = None
+        self._verification_keys: dict[Optional[str], object] = {}
+        self._jwks: dict = {"keys": []}
+
+    @property
+    def is_asymmetric(self) -> bool:
+        return not self.algorithm.startswith("HS")
+
+    def load(self):
+        """解析并缓存所有密钥, 配置错误时抛出 ValueError"""
+        if not self.is_asymmetric:
+            key = jwk.construct(self.secret, self.algorithm)
+            self.signing_kid, self._signing_key = None, key
+            self._verification_keys = {None: key}
+            self._jwks = {"keys": []}
+            return
+
+        if self.algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported token signing algorithm: {self.algorithm}")
+        if not self.keys_dir or not os.path.isdir(self.keys_dir):
+            raise ValueError(f"Token key directory not found: {self.keys_dir}")
+
+        private_keys, public_keys = {}, {}
+        for filename in sorted(os.listdir(self.keys_dir)):
+            if not filename.endswith(".pem"):
+                continue
+            with open(os.path.join(self.keys_dir, filename), "r", encoding="utf-8") as file:
+                pem = file.read()
+            if filename.endswith(".pub.pem"):
+                kid = filename.removesuffix(".pub.pem")
+                public_keys[kid] = jwk.construct(pem, self.algorithm)
+            else:
+                kid = filename.removesuffix(".pem")
+                private_keys[kid] = jwk.construct(pem, self.algorithm)
+                public_keys[kid] = private_keys[kid].public_key()
+        if not private_keys:
+            raise ValueError(f"No private signing key in {self.keys_dir}")
+
+        # 未指定时使用文件名排序最后的私钥(如按日期命名的 kid)
+        kid = self.active_kid or max(private_keys)
+        if kid not in private_keys:
+            raise ValueError(f"Active signing key {kid} not found in {self.keys_dir}")
+
+        self.signing_kid, self._signing_key = kid, private_keys[kid]
+        self._verification_keys = public_keys
+        self._jwks = {"keys": [
+            {**key.to_dict(), "kid": kid, "use": "sig"} for kid, key in public_keys.items()
+        ]}
+        logger.info("Loaded %d token verification keys, signing with kid=%s", len(public_keys), kid)
+
+    def encode(self, claims: dict) -> str:
+        if self._signing_key is None:
+            self.load()
+        headers = {"kid": self.signing_kid} if self.signing_kid else None
+        return jwt.encode(claims, self._signing_key, algorithm=self.algorithm, headers=headers)
+
+    def decode(self, token: str) -> dict:
+        """
+        验证签名并解码令牌。
+        :param token: JWT 令牌字符串
+        :return: 解码后的 JWT 负载
+        :raises JWTError: 签名无效、已过期或 ``kid`` 未知
+        """
+        if self._signing_key is None:
+            self.load()
+        if self.is_asymmetric:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self._verification_keys.get(kid)
+            if key is None:
+                raise JWTError(f"Unknown key id: {kid}")
+        else:
+            key = self._verification_keys[None]
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict:
+        """JWKS 格式的公钥集合, HS* 算法下为空"""
+        if self._signing_key is None:
+            self.load()
+        return self._jwks
@@ -0,0 +1,292 @@
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# 默认的延迟分桶(秒), 覆盖从亚毫秒级的内存查询到秒级的 Argon2 排队
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        获取指定标签值的子指标。
+        热路径上应在模块加载时预先获取子指标并保存引用, 避免每次请求构造标签元组。
+        """
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> list[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._children[()].inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个为 +Inf 分桶
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """在采集时通过回调函数读取当前值的指标, 不在热路径上产生任何开销"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback):
+        self.callback = callback
+        super().__init__(name, documentation)
+
+    def _new_child(self):
+        return None
+
+    def _render_child(self, values, child):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP 热路径
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency of instrumented routes", ("path", "status"),
+))
+
+# 密码哈希
+password_hash_duration = registry.register(Histogram(
+    "password_hash_duration_seconds", "Argon2 hash/verify execution time in the worker pool", ("operation",),
+))
+password_hash_queue_wait = registry.register(Histogram(
+    "password_hash_queue_wait_seconds", "Time password hash tasks wait before a worker picks them up",
+))
+password_hash_rejected = registry.register(Counter(
+    "password_hash_rejected_total", "Password hash tasks rejected by admission control", ("reason",),
+))
+
+# 登录限流
+login_throttled = registry.register(Counter(
+    "login_throttled_total", "Login attempts rejected before password verification", ("endpoint", "reason"),
+))
+
+# 令牌撤销检查
+token_revocation_checks = registry.register(Counter(
+    "token_revocation_checks_total", "Outcomes of is_token_revoked", ("source", "result"),
+))
+token_version_checks = registry.register(Counter(
+    "token_version_checks_total", "Outcomes of is_token_outdated", ("source", "result"),
+))
+
+# 过期令牌清理
+token_purge_removed_rows = registry.register(Counter(
+    "token_purge_removed_rows_total", "Expired token_blocklist rows removed by the purge job",
+))
+token_purge_dropped_partitions = registry.register(Counter(
+    "token_purge_dropped_partitions_total", "Expired token_blocklist partitions dropped by the purge job",
+))
+
+# 数据库连接池
+db_pool_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting to check out a connection from the pool",
+))
+db_pool_timeouts = registry.register(Counter(
+    "db_pool_checkout_timeouts_total", "Connection checkouts that timed out waiting for the pool",
+))
+db_read_sessions = registry.register(Counter(
+    "db_read_sessions_total", "Read-only sessions by routing target", ("target",),
+))
+
+# 传感器数据接入
+ingest_frames = registry.register(Counter(
+    "ingest_frames_total", "Sensor frames consumed from RabbitMQ", ("result",),
+))
+ingest_flush_duration = registry.register(Histogram(
+    "ingest_flush_duration_seconds", "Time to insert and commit one batch of sensor frames",
+))
+
+# 学习者状态推送
+push_messages = registry.register(Counter(
+    "push_learner_updates_total", "Learner state updates serialized for push subscribers",
+))
+push_dropped_connections = registry.register(Counter(
+    "push_dropped_connections_total", "Push connections dropped for falling behind",
+))
+
+# 并发请求合并
+singleflight_calls = registry.register(Counter(
+    "singleflight_calls_total", "Calls that started a computation (leader) or joined one in flight (shared)",
+    ("name", "role"),
+))
+
+# 流媒体回调
+stream_auth_decisions = registry.register(Counter(
+    "stream_auth_decisions_total", "Streaming server callback decisions", ("action", "result", "source"),
+))
+
+# 定时任务
+scheduler_job_duration = registry.register(Histogram(
+    "scheduler_job_duration_seconds", "Duration of scheduled jobs", ("job", "status"),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+))
+
+
+def track_job(name: str):
+    """记录定时任务的执行时长与结果"""
+    succeeded = scheduler_job_duration.labels(name, "success")
+    failed = scheduler_job_duration.labels(name, "error")
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                failed.observe(time.perf_counter() - started_at)
+                raise
+            succeeded.observe(time.perf_counter() - started_at)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    记录指定路由的请求延迟。
+    仅对预先登记的路径计时, 每个 (路径, 状态类别) 的直方图在启动时创建, 请求期间不产生额外分配。
+    """
+
+    STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+    def __init__(self, app, paths):
+        self.app = app
+        self._histograms = {
+            path: [http_request_duration.labels(path, status_class) for status_class in self.STATUS_CLASSES]
+            for path in paths
+        }
+
+    async def __call__(self, scope, receive, send):
+        histograms = self._histograms.get(scope["path"]) if scope["type"] == "http" else None
+        if histograms is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            histograms[min(max(status_code // 100, 1), 5) - 1].observe(time.perf_counter() - started_at)
@@ -0,0 +1,114 @@
+from typing import Any, Callable
+
+import msgpack
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+JSON_MEDIA_TYPES = ("application/json", "application/*", "*/*")
+
+
+def _media_type(value: str | None) -> str:
+    return (value or "").split(";")[0].strip().lower()
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    根据 Accept 头选择响应格式。
+    只有 msgpack 的优先级(q 值)严格高于 JSON 时才使用 msgpack, 未声明 Accept 的客户端保持 JSON。
+    :return: "msgpack" 或 "json"
+    """
+    if not accept or "msgpack" not in accept:
+        return "json"
+    msgpack_q = json_q = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in JSON_MEDIA_TYPES:
+            json_q = max(json_q, q)
+    return "msgpack" if msgpack_q > json_q else "json"
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应, 作为应用的默认响应类"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _to_msgpack(response: Response) -> Response:
+    """将已渲染的 JSON 响应转换为 msgpack, 两次转换都在 C 扩展中完成"""
+    headers = {
+        name: value for name, value in response.headers.items() if name not in ("content-length", "content-type")
+    }
+    return Response(
+        content=msgpack.packb(orjson.loads(response.body)),
+        status_code=response.status_code,
+        headers=headers,
+        media_type="application/msgpack",
+        background=response.background,
+    )
+
+
+async def _decode_msgpack_request(request: Request) -> Request:
+    """
+    将 msgpack 请求体转换为等价的 JSON/表单请求, 使路由中的 Pydantic 模型和 Form 参数无需修改即可使用。
+    """
+    try:
+        data = msgpack.unpackb(await request.body())
+    except (ValueError, TypeError, msgpack.UnpackException):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid msgpack body")
+
+    scope = dict(request.scope)
+    scope["headers"] = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+    scope["headers"].append((b"content-type", b"application/json"))
+    decoded = Request(scope, request.receive)
+    # 预先填充 Starlette 的请求体缓存, FastAPI 按 JSON 或表单读取时不再读取原始请求体
+    decoded._body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    decoded._json = data
+    if isinstance(data, dict):
+        items = []
+        for key, value in data.items():
+            for item in value if isinstance(value, list) else (value,):
+                items.append((str(key), item if isinstance(item, str) else str(item)))
+        decoded._form = FormData(items)
+    return decoded
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    支持 msgpack 的路由。
+    - 请求: Content-Type 为 application/msgpack 时解码请求体, 可用于 JSON 模型参数和表单参数;
+    - 响应: 按 Accept 协商 msgpack 或 JSON, 路由返回的 JSON 响应在客户端要求时转换为 msgpack, 并带有 Vary: Accept。
+    错误响应(HTTPException 等)仍为 JSON。
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if _media_type(request.headers.get("content-type")) in MSGPACK_MEDIA_TYPES:
+                request = await _decode_msgpack_request(request)
+            response = await handler(request)
+            if _media_type(response.headers.get("content-type")) != "application/json":
+                return response
+            if negotiate(request.headers.get("accept")) == "msgpack" and getattr(response, "body", None):
+                response = _to_msgpack(response)
+            # 同一 URL 的响应格式取决于 Accept, JSON 响应同样需要声明, 避免缓存把一种格式返回给另一种客户端
+            response.headers.add_vary_header("Accept")
+            return response
+
+        return negotiated_handler
@@ -0,0 +1,134 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+
+
+class RevokedTokenIndex:
+    """
+    进程内的已撤销令牌索引。
+    启动时从 token_blocklist 全量加载, 之后按创建时间增量同步其他 worker 写入的记录,
+    本进程撤销令牌时直接写入, 使令牌校验的常见路径无需访问数据库。
+    条目在令牌过期后自动失效。
+    """
+
+    # 增量同步时向前回溯的时间, 覆盖创建时间早于提交时间的记录
+    SYNC_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, max_staleness: float = 15):
+        self.max_staleness = max_staleness  # 超过该时间(秒)未成功同步则视为不可用
+        self._entries: dict[str, datetime] = {}  # jti -> 过期时间
+        self._expiry_heap: list[tuple[datetime, str]] = []  # 按过期时间排列, 用于增量清理
+        self._watermark: datetime | None = None  # 已同步记录的最大创建时间
+        self._synced_at: float | None = None  # 最近一次成功同步的时间
+
+    @property
+    def ready(self) -> bool:
+        return self._synced_at is not None and time.monotonic() - self._synced_at <= self.max_staleness
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, jti: str, expires_at: datetime):
+        jti = str(jti)
+        if jti not in self._entries:
+            heapq.heappush(self._expiry_heap, (expires_at, jti))
+        self._entries[jti] = expires_at
+
+    def is_revoked(self, jti: str) -> bool | None:
+        """
+        查询令牌是否已被撤销。
+        :return: True/False; 索引尚未加载或同步中断时返回 None, 调用方应回退到数据库查询
+        """
+        if not self.ready:
+            return None
+        return jti in self._entries
+
+    def sync_since(self) -> datetime | None:
+        """下一次增量同步的起始创建时间, 首次同步返回 None 表示全量加载"""
+        if self._watermark is None:
+            return None
+        return self._watermark - self.SYNC_OVERLAP
+
+    def merge(self, rows):
+        """
+        合并从数据库读取的撤销记录。
+        :param rows: (jti, expires_at, created_at) 序列
+        """
+        for jti, expires_at, created_at in rows:
+            self.add(jti, expires_at)
+            if created_at is not None and (self._watermark is None or created_at > self._watermark):
+                self._watermark = created_at
+        if self._watermark is None:
+            self._watermark = datetime.now()
+        self._synced_at = time.monotonic()
+
+    def prune(self) -> int:
+        """清除已过期的条目, 返回清除数量"""
+        now = datetime.now()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            if self._entries.pop(jti, None) is not None:
+                removed += 1
+        return removed
+
+
+class TokenVersionIndex:
+    """
+    进程内的用户令牌版本索引(user_id -> token_version)。
+    只保存版本不为 0 的用户, 未出现的用户版本为 0。
+    启动时全量加载, 之后按 updated_at 增量同步, 本进程递增版本时直接写入。
+    """
+
+    SYNC_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, max_staleness: float = 15):
+        self.max_staleness = max_staleness
+        self._versions: dict[str, int] = {}
+        self._watermark: datetime | None = None  # 已同步记录的最大更新时间
+        self._synced_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._synced_at is not None and time.monotonic() - self._synced_at <= self.max_staleness
+
+    def __len__(self):
+        return len(self._versions)
+
+    def set(self, user_id: str, version: int):
+        # 版本只增不减, 重叠同步窗口内读到的旧值不会覆盖新值
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    def get(self, user_id: str) -> int | None:
+        """
+        查询用户当前的令牌版本。
+        :return: 版本号; 索引尚未加载或同步中断时返回 None, 调用方应回退到数据库查询
+        """
+        if not self.ready:
+            return None
+        return self._versions.get(user_id, 0)
+
+    def sync_since(self) -> datetime | None:
+        if self._watermark is None:
+            return None
+        return self._watermark - self.SYNC_OVERLAP
+
+    def merge(self, rows):
+        """
+        合并从数据库读取的版本记录。
+        :param rows: (user_id, token_version, updated_at) 序列
+        """
+        for user_id, version, updated_at in rows:
+            self.set(user_id, version)
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+        if self._watermark is None:
+            self._watermark = datetime.now()
+        self._synced_at = time.monotonic()
+
+
+revoked_token_index = RevokedTokenIndex(max_staleness=settings.TOKEN_REVOCATION_SYNC_SECONDS * 3)
+token_version_index = TokenVersionIndex(max_staleness=settings.TOKEN_REVOCATION_SYNC_SECONDS * 3)
@@ -2,11 +2,11 @@ import uuid
 from datetime import datetime, timedelta, timezone
 
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from pwdlib import PasswordHash
 from pwdlib.hashers.argon2 import Argon2Hasher
 
 from app.core.config import settings
+from app.core.keys import TokenKeyRing
 
 pwd_context = PasswordHash((
     Argon2Hasher(),
@@ -14,6 +14,13 @@ pwd_context = PasswordHash((
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+token_keys = TokenKeyRing(
+    settings.ENCRYPTION_ALGORITHM,
+    secret=settings.TOKEN_KEY,
+    keys_dir=settings.TOKEN_KEYS_DIR,
+    active_kid=settings.TOKEN_ACTIVE_KID,
+)
+
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
@@ -41,16 +48,18 @@ def create_token(data: dict, token_type: str, expires_delta: timedelta, expire_a
         "exp": expire.timestamp(),
         "type": token_type
     })
-    return jwt.encode(to_encode, settings.TOKEN_KEY, algorithm=settings.ENCRYPTION_ALGORITHM)
+    return token_keys.encode(to_encode)
 
 
-def create_access_token(user_id: str, expires_delta: timedelta = None, expire_at: datetime = None):
+def create_access_token(user_id: str, expires_delta: timedelta = None, expire_at: datetime = None,
+                        claims: dict = None):
     if expires_delta is None:
         expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return create_token({"sub": user_id}, "access", expires_delta, expire_at)
+    return create_token({**(claims or {}), "sub": user_id}, "access", expires_delta, expire_at)
 
 
-def create_refresh_token(user_id: str, expires_delta: timedelta = None, expire_at: datetime = None):
+def create_refresh_token(user_id: str, expires_delta: timedelta = None, expire_at: datetime = None,
+                         claims: dict = None):
     if expires_delta is None:
         expires_delta = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    return create_token({"sub": user_id}, "refresh", expires_delta, expire_at)
+    return create_token({**(claims or {}), "sub": user_id}, "refresh", expires_delta, expire_at)
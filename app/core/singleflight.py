@@ -0,0 +1,56 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.core.metrics import singleflight_calls
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    进程内的并发请求合并。
+    同一个键的计算进行中时, 后到的调用等待同一个 Future, 不再重复计算; 计算完成后键即被移除, 不缓存结果。
+    发起计算的调用被取消时, 等待者中的一个重新发起计算; 计算抛出的异常由所有等待者共享。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self._leader = singleflight_calls.labels(name, "leader")
+        self._shared = singleflight_calls.labels(name, "shared")
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: 合并的键, 只有键相同的调用共享结果
+        :param func: 计算结果的协程函数, 每次合并只执行一次
+        :return: 计算结果
+        """
+        while (future := self._calls.get(key)) is not None:
+            self._shared.inc()
+            try:
+                # shield: 等待者被取消时不影响进行中的计算
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self._leader.inc()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待者时不再报告 "exception was never retrieved"
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
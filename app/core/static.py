@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+from fastapi import Request, Response, status
+
+try:
+    # brotli 已列入 requirements.txt; 未安装时只提供 gzip 压缩版本
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+if brotli is None:
+    logger.warning("brotli is not installed, static files are served with gzip only")
+
+# 值得预先压缩的内容类型
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+
+class StaticAsset:
+    """单个静态文件在内存中的各个编码版本"""
+
+    __slots__ = ("media_type", "mtime", "variants", "etags")
+
+    def __init__(self, content: bytes, media_type: str, mtime: float):
+        self.media_type = media_type
+        self.mtime = mtime
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        # 编码 -> (内容, 强 ETag); 不同编码的字节不同, 因此使用不同的 ETag
+        self.variants: dict[str, tuple[bytes, str]] = {"identity": (content, f'"{digest}"')}
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content):
+                self.variants["gzip"] = (compressed, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(content, quality=11)
+                if len(compressed) < len(content):
+                    self.variants["br"] = (compressed, f'"{digest}-br"')
+        self.etags = frozenset(etag for _, etag in self.variants.values())
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if name:
+            encodings.add(name.lower())
+    return encodings
+
+
+class StaticFileCache:
+    """
+    静态文件内存缓存。
+    启动时一次性读取目录下的所有文件并预先生成 gzip 和 brotli(需安装 brotli 包)压缩版本,
+    请求时不再读取磁盘; 支持 ETag/If-None-Match 协商缓存与 Cache-Control。
+    """
+
+    def __init__(self, directory: str, max_age: int = 300):
+        self.directory = directory
+        self.max_age = max_age
+        self._assets: dict[str, StaticAsset] = {}
+
+    def __contains__(self, name: str):
+        return name in self._assets
+
+    def load(self):
+        """读取目录下的所有文件, 已加载且未修改的文件不会重复处理"""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                mtime = os.stat(path).st_mtime
+                asset = self._assets.get(name)
+                if asset is None or asset.mtime != mtime:
+                    with open(path, "rb") as file:
+                        content = file.read()
+                    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                    if media_type.startswith("text/"):
+                        media_type += "; charset=utf-8"
+                    asset = StaticAsset(content, media_type, mtime)
+                assets[name] = asset
+        self._assets = assets
+
+    def changed(self) -> bool:
+        """检查目录下的文件是否有新增、删除或修改"""
+        seen = 0
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                asset = self._assets.get(name)
+                if asset is None or asset.mtime != os.stat(path).st_mtime:
+                    return True
+                seen += 1
+        return seen != len(self._assets)
+
+    async def watch(self, interval: float = 1.0):
+        """开发模式下定期检查文件变化并重新加载"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.changed):
+                    await asyncio.to_thread(self.load)
+                    logger.info("Reloaded static files from %s", self.directory)
+            except OSError as e:
+                logger.warning("Failed to reload static files: %s", e)
+
+    def response(self, request: Request, name: str) -> Response:
+        asset = self._assets.get(name)
+        if asset is None:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in asset.variants and candidate in accepted:
+                encoding = candidate
+                break
+        content, etag = asset.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={self.max_age}",
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or any(
+                tag.strip().removeprefix("W/") in asset.etags for tag in if_none_match.split(","))):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=content, media_type=asset.media_type, headers=headers)
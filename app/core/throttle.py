@@ -0,0 +1,168 @@
+import math
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class FailureCounter:
+    """
+    登录失败的滑动窗口计数及封禁时间。
+    用相邻两个固定窗口的计数加权近似滑动窗口, 只需保存两个计数, 也便于在数据库中以同样的方式保存(共享模式)。
+    """
+
+    __slots__ = ("window_index", "previous", "current", "blocked_until")
+
+    def __init__(self, window_index: int = 0, previous: int = 0, current: int = 0, blocked_until: float = 0.0):
+        self.window_index = window_index
+        self.previous = previous
+        self.current = current
+        self.blocked_until = blocked_until  # Unix 时间戳, 共享模式下各 worker 使用同一时钟
+
+    def _roll(self, now: float, window: float):
+        index = int(now // window)
+        if index != self.window_index:
+            self.previous = self.current if index == self.window_index + 1 else 0
+            self.current = 0
+            self.window_index = index
+
+    def failures(self, now: float, window: float) -> float:
+        """滑动窗口内的失败次数估计值"""
+        self._roll(now, window)
+        elapsed = now / window - self.window_index
+        return self.current + self.previous * (1 - elapsed)
+
+    def add_failure(self, now: float, window: float, threshold: int, base: float, cap: float):
+        """
+        记录一次失败, 窗口内失败次数达到阈值后封禁, 之后每次失败封禁时间翻倍, 不超过 cap。
+        """
+        self._roll(now, window)
+        self.current += 1
+        excess = self.failures(now, window) - threshold
+        if excess >= 0:
+            backoff = min(cap, base * 2 ** min(int(excess), 32))
+            self.blocked_until = max(self.blocked_until, now + backoff)
+
+
+class LoginThrottle:
+    """
+    登录限流。
+    在验证密码(Argon2)和查询数据库之前拒绝请求:
+    - 每个 IP 一个令牌桶, 限制尝试速率(成功和失败都计入);
+    - 每个 IP 和每个账号各一个失败计数, 滑动窗口内失败次数达到阈值后按指数退避封禁。
+    状态保存在进程内, 共享模式下失败计数同时写入数据库, 其他 worker 定期同步封禁状态。
+    """
+
+    def __init__(self, rate: float, burst: int, window: float, ip_threshold: int, user_threshold: int,
+                 backoff_base: float, backoff_max: float, max_keys: int = 100000):
+        self.rate = rate  # 每个 IP 每秒补充的尝试次数
+        self.burst = burst  # 每个 IP 的令牌桶容量
+        self.window = window
+        self.ip_threshold = ip_threshold
+        self.user_threshold = user_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()  # ip -> [剩余令牌, 上次更新时间]
+        self._counters: OrderedDict[str, FailureCounter] = OrderedDict()  # "ip:..."/"user:..." -> 失败计数
+
+    @staticmethod
+    def ip_key(ip: str) -> str:
+        return f"ip:{ip}"
+
+    @staticmethod
+    def user_key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def keys(self, ip: str | None, user_id: str | None) -> list[tuple[str, int]]:
+        """需要记录失败的 (键, 阈值) 列表"""
+        keys = []
+        if ip:
+            keys.append((self.ip_key(ip), self.ip_threshold))
+        if user_id:
+            keys.append((self.user_key(user_id), self.user_threshold))
+        return keys
+
+    def check(self, ip: str | None, user_id: str | None) -> tuple[str, float] | None:
+        """
+        检查是否允许本次登录尝试, 允许时消耗 IP 令牌桶中的一个令牌。
+        :param ip: 客户端 IP, 为 None 时只检查账号(如 RabbitMQ 认证回调的来源是 broker 本身)
+        :param user_id: 账号
+        :return: 拒绝时返回 (原因, 需要等待的秒数), 允许时返回 None
+        """
+        now = time.time()
+        for key, reason in ((self.user_key(user_id) if user_id else None, "user_backoff"),
+                            (self.ip_key(ip) if ip else None, "ip_backoff")):
+            counter = self._counters.get(key) if key else None
+            if counter is not None and counter.blocked_until > now:
+                return reason, counter.blocked_until - now
+        if ip and self.rate > 0:
+            bucket = self._buckets.get(ip)
+            if bucket is None:
+                bucket = self._buckets[ip] = [float(self.burst), now]
+                self._trim(self._buckets)
+            else:
+                self._buckets.move_to_end(ip)
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return "ip_rate", (1 - bucket[0]) / self.rate
+            bucket[0] -= 1
+        return None
+
+    def counter(self, key: str) -> FailureCounter:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = FailureCounter()
+            self._trim(self._counters)
+        else:
+            self._counters.move_to_end(key)
+        return counter
+
+    def record_failure(self, ip: str | None, user_id: str | None):
+        now = time.time()
+        for key, threshold in self.keys(ip, user_id):
+            self.counter(key).add_failure(now, self.window, threshold, self.backoff_base, self.backoff_max)
+
+    def record_success(self, user_id: str) -> bool:
+        """
+        登录成功后清除账号的失败计数(IP 的失败计数保留, 避免用一个有效账号掩护对其他账号的尝试)。
+        :return: 账号此前是否有失败记录
+        """
+        return self._counters.pop(self.user_key(user_id), None) is not None
+
+    def block(self, key: str, blocked_until: float):
+        """合并其他 worker 写入的封禁状态"""
+        if blocked_until > time.time():
+            counter = self.counter(key)
+            counter.blocked_until = max(counter.blocked_until, blocked_until)
+
+    def _trim(self, entries: OrderedDict):
+        while len(entries) > self.max_keys:
+            entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "ips": len(self._buckets),
+            "counters": len(self._counters),
+            "blocked": sum(counter.blocked_until > now for counter in self._counters.values()),
+        }
+
+
+def retry_after(seconds: float) -> str:
+    """Retry-After 头的值(整数秒, 向上取整)"""
+    return str(max(1, math.ceil(seconds)))
+
+
+# 令牌桶不在 worker 之间共享, 速率和容量按 worker 数平分
+login_throttle = LoginThrottle(
+    rate=settings.LOGIN_RATE_PER_IP / max(1, settings.WORKERS),
+    burst=max(1, settings.LOGIN_BURST_PER_IP // max(1, settings.WORKERS)),
+    window=settings.LOGIN_FAILURE_WINDOW_SECONDS,
+    ip_threshold=settings.LOGIN_FAILURE_THRESHOLD_PER_IP,
+    user_threshold=settings.LOGIN_FAILURE_THRESHOLD_PER_USER,
+    backoff_base=settings.LOGIN_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.LOGIN_BACKOFF_MAX_SECONDS,
+    max_keys=settings.LOGIN_THROTTLE_MAX_KEYS,
+)
@@ -1,9 +1,34 @@
+import ipaddress
 from fastapi import Request
 
+from app.core.config import settings
+
+_trusted_proxies = tuple(ipaddress.ip_network(proxy, strict=False) for proxy in settings.TRUSTED_PROXIES)
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_proxies)
+
+
 def get_client_ip(request: Request) -> str:
+    """
+    获取客户端 IP。
+    X-Forwarded-For 最左侧的条目由客户端自行填写, 不可信任;
+    只有直接连接方是可信代理时才读取该头, 并从右向左跳过可信代理追加的条目, 取第一个不可信的地址。
+    :param request: 请求对象
+    :return: 客户端 IP
+    """
+    ip = request.client.host if request.client else ""
+    if not _is_trusted_proxy(ip):
+        return ip
     x_forwarded_for = request.headers.get("x-forwarded-for")
     if x_forwarded_for:
-        ip = x_forwarded_for.split(",")[0].strip()
-    else:
-        ip = request.client.host
+        for entry in reversed(x_forwarded_for.split(",")):
+            ip = entry.strip()
+            if not _is_trusted_proxy(ip):
+                break
     return ip
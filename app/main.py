@@ -1,48 +1,214 @@
+import asyncio
+import logging
+import os
+import uuid
+
 from dotenv import load_dotenv
 
 load_dotenv("../.env")
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
 from app.core.config import settings
-from app.core.database import get_db
-from app.common.dao import TokenBlocklistDAO
+from app.common.dao import PermissionDAO, TokenBlocklistDAO, UserDAO
+from app.core.database import get_db, engine, AsyncSessionLocal, warm_up_pool
+from app.core.database.lock import advisory_lock
+from app.core.database.replica import read_router, ReadYourWritesMiddleware
+from app.core.hasher import password_hasher
+from app.core.metrics import MetricsMiddleware, track_job
+from app.core.responses import FastJSONResponse
+from app.core.security import token_keys
+from app.core.static import StaticFileCache
 from app.modules.auth import auth_router
+from app.modules.auth.buffer import login_info_buffer
+from app.modules.auth.services import sync_revoked_tokens, sync_token_versions, purge_expired_tokens, \
+    sync_login_throttle, purge_login_throttle
+from app.modules.ingest import telemetry_ingestor, telemetry_tap
+from app.modules.push import push_router
+from app.modules.push.gateway import push_gateway
 from app.modules.users import users_router
 from app.modules.rabbitmq import rabbitmq_router
+from app.modules.rabbitmq.services import refresh_permissions
+from app.modules.state import state_engine
+from app.modules.stream import stream_router
+from app.modules.system import system_router
+
+logger = logging.getLogger(__name__)
 
+# 静态页面在启动时加载到内存
+static_files = StaticFileCache(
+    os.path.join(os.path.dirname(__file__), "static"), max_age=settings.STATIC_CACHE_MAX_AGE
+)
 
+
+@track_job("remove_expired_tokens")
 async def remove_expired_tokens_job():
     """
-    定期清理过期的令牌。
-    该函数会被调度器定期调用。
+    定期清理过期的令牌(以及共享模式下过期的登录失败计数)。
+    该函数会被调度器定期调用, 各 worker 通过数据库锁竞争, 同一时间只有一个 worker 执行清理。
+    """
+    async with advisory_lock("platform.remove_expired_tokens") as acquired:
+        if not acquired:
+            return
+        async for db_session in get_db():
+            await purge_expired_tokens(db_session)
+            if settings.LOGIN_THROTTLE_SHARED:
+                await purge_login_throttle(db_session)
+
+
+@track_job("sync_revoked_tokens")
+async def sync_revoked_tokens_job():
+    """
+    定期同步撤销令牌索引和用户令牌版本索引。
+    其他 worker 撤销的令牌或递增的令牌版本会在一个同步间隔内对本 worker 生效。
     """
     async for db_session in get_db():
-        await TokenBlocklistDAO.remove_expired_tokens(db_session)
+        await sync_revoked_tokens(db_session)
+        await sync_token_versions(db_session)
+
+
+@track_job("refresh_permissions")
+async def refresh_permissions_job():
+    """
+    定期检查权限表变更。
+    角色、权限或用户角色发生变化时重建 RabbitMQ 权限匹配器。
+    """
+    async for db_session in get_db():
+        await refresh_permissions(db_session)
+
+
+@track_job("sync_login_throttle")
+async def sync_login_throttle_job():
+    """共享模式下定期同步其他 worker 写入的登录封禁状态"""
+    async for db_session in get_db():
+        await sync_login_throttle(db_session)
+
+
+@track_job("check_replicas")
+async def check_replicas_job():
+    """定期检查只读副本的连通性和复制延迟, 不可用的副本暂停分流读请求, 恢复后重新加入"""
+    await read_router.check_replicas()
+
+
+@track_job("flush_login_info")
+async def flush_login_info_job():
+    """定期将缓冲的最后登录信息批量写入数据库"""
+    await login_info_buffer.flush()
+
+
+async def warm_up_database():
+    """
+    预热数据库连接池和语句编译缓存。
+    打开一批连接, 并对主库和各副本执行一次热点查询, 使 SQLAlchemy 缓存其编译结果,
+    部署后的首批请求不再承担建立连接和编译语句的开销。
+    """
+    await warm_up_pool(engine, settings.DB_POOL_WARMUP)
+    await read_router.warm_up(settings.DB_POOL_WARMUP)
+    session_factories = [AsyncSessionLocal] + [replica.session_factory for replica in read_router.replicas
+                                               if replica.healthy]
+    for session_factory in session_factories:
+        async with session_factory() as db:
+            await UserDAO.get_principal(db, "")
+            await UserDAO.get_token_version(db, "")
+            await TokenBlocklistDAO.is_token_revoked(db, str(uuid.UUID(int=0)))
+            await PermissionDAO.get_role_names_by_user_id(db, "")
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """
-    应用程序的生命周期管理器，用于在应用启动时初始化调度器。
+    应用程序的生命周期管理器，用于在应用启动时初始化调度器和密码哈希执行器。
     """
+    # 加载令牌签名密钥, 配置错误时拒绝启动
+    token_keys.load()
+    # 启动密码哈希执行器
+    password_hasher.start()
+    # 加载静态页面
+    static_files.load()
+    static_watcher = asyncio.create_task(static_files.watch()) if settings.STATIC_AUTO_RELOAD else None
     # 创建任务调度器
     scheduler = AsyncIOScheduler()
     # 添加异步任务
     scheduler.add_job(
         func=remove_expired_tokens_job,
-        trigger=IntervalTrigger(minutes=60),
+        trigger=IntervalTrigger(minutes=settings.TOKEN_PURGE_INTERVAL_MINUTES),
+        max_instances=1,
+    )
+    scheduler.add_job(
+        func=sync_revoked_tokens_job,
+        trigger=IntervalTrigger(seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS),
+        max_instances=1,
+    )
+    scheduler.add_job(
+        func=flush_login_info_job,
+        trigger=IntervalTrigger(seconds=settings.LOGIN_INFO_FLUSH_SECONDS),
+        max_instances=1,
+    )
+    scheduler.add_job(
+        func=refresh_permissions_job,
+        trigger=IntervalTrigger(seconds=settings.RABBITMQ_PERMISSION_REFRESH_SECONDS),
         max_instances=1,
     )
+    if settings.LOGIN_THROTTLE_ENABLED and settings.LOGIN_THROTTLE_SHARED:
+        scheduler.add_job(
+            func=sync_login_throttle_job,
+            trigger=IntervalTrigger(seconds=settings.LOGIN_THROTTLE_SYNC_SECONDS),
+            max_instances=1,
+        )
+    if read_router.replicas:
+        scheduler.add_job(
+            func=check_replicas_job,
+            trigger=IntervalTrigger(seconds=settings.DATABASE_REPLICA_CHECK_SECONDS),
+            max_instances=1,
+        )
+        await check_replicas_job()
+    # 预热数据库连接, 失败时不影响启动
+    try:
+        await warm_up_database()
+    except Exception as e:
+        logger.warning("Failed to warm up database connections: %s", e)
+    # 加载撤销令牌索引和令牌版本索引, 失败时由定时任务重试, 期间令牌校验回退到数据库查询
+    try:
+        await sync_revoked_tokens_job()
+    except Exception as e:
+        logger.warning("Failed to load revoked token index: %s", e)
+    # 编译 RabbitMQ 权限匹配器, 失败时在首次授权请求或下次定时任务中重试
+    try:
+        await refresh_permissions_job()
+    except Exception as e:
+        logger.warning("Failed to load RabbitMQ permissions: %s", e)
     # 启动调度器
     scheduler.start()
+    # 启动传感器数据接入(每个 worker 各有一个消费者, 共同消费同一组队列并写入数据库)
+    if settings.INGEST_ENABLED:
+        telemetry_ingestor.start()
+    # 启动学习者状态引擎, 每个 worker 通过独占队列收到所有学习者的全部数据帧, 与数据库写入的部署方式无关
+    state_enabled = settings.INGEST_ENABLED if settings.STATE_ENABLED is None else settings.STATE_ENABLED
+    if state_enabled:
+        telemetry_tap.subscribe(state_engine.feed)
+        push_gateway.attach(state_engine)
+        state_engine.start(settings.STATE_TICK_SECONDS)
+        telemetry_tap.start()
     # 运行时
     yield
+    # 写入并确认已收到的传感器数据
+    if settings.INGEST_ENABLED:
+        await telemetry_ingestor.shutdown()
+    if state_enabled:
+        await telemetry_tap.shutdown()
+        await state_engine.shutdown()
     # 在应用关闭时清理调度器
     scheduler.shutdown()
+    # 写入缓冲区中剩余的登录信息
+    await login_info_buffer.flush()
+    # 关闭密码哈希执行器
+    password_hasher.shutdown()
+    if static_watcher is not None:
+        static_watcher.cancel()
+    # 关闭只读副本的连接池
+    await read_router.dispose()
 
 
 app = FastAPI(
@@ -52,25 +218,38 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+app.add_middleware(MetricsMiddleware, paths=(
+    "/auth/token", "/auth/refresh", "/auth/logout", "/auth/introspect",
+    "/api/rabbitmq/auth/user", "/api/rabbitmq/auth/vhost", "/api/rabbitmq/auth/resource", "/api/rabbitmq/auth/topic",
+    "/api/stream/on_connect", "/api/stream/on_publish", "/api/stream/on_play",
+))
+
+app.add_middleware(ReadYourWritesMiddleware)
+
 app.include_router(auth_router, tags=["Authentication"])
 app.include_router(users_router, prefix="/api", tags=["Users"])
 app.include_router(rabbitmq_router, prefix="/api/rabbitmq", tags=["RabbitMQ"])
+app.include_router(push_router, prefix="/api", tags=["Push"])
+app.include_router(stream_router, prefix="/api/stream", tags=["Streaming"])
+app.include_router(system_router, tags=["System"])
+
+
+@app.get("/", include_in_schema=False)
+async def root(request: Request):
+    return static_files.response(request, "index.html")
 
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    with open("static/index.html", "r", encoding="utf-8") as file:
-        html_content = file.read()
-    return HTMLResponse(content=html_content)
+@app.get("/register", include_in_schema=False)
+async def register(request: Request):
+    return static_files.response(request, "register.html")
 
 
-@app.get("/register", response_class=HTMLResponse)
-async def register():
-    with open("static/register.html", "r", encoding="utf-8") as file:
-        html_content = file.read()
-    return HTMLResponse(content=html_content)
+@app.get("/static/{path:path}", include_in_schema=False)
+async def static(request: Request, path: str):
+    return static_files.response(request, path)
 
 
 if __name__ == "__main__":
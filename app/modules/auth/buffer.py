@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from app.common.dao import UserDAO
+from app.core.config import settings
+from app.core.database.base import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class LoginInfoBuffer:
+    """
+    最后登录信息的写后缓冲。
+    登录时只在内存中记录每个用户最近一次的登录 IP 和时间, 由定时任务批量写入数据库,
+    登录请求不再等待写事务, 也避免了上课高峰时对 users 表的行锁竞争。
+    """
+
+    def __init__(self, max_size: int = 10000, chunk_size: int = 500):
+        self.max_size = max_size
+        self.chunk_size = chunk_size  # 每条 UPDATE 语句包含的最大用户数
+        self._pending: dict[str, tuple[str, datetime]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, user_id: str, last_login_ip: str, last_login_at: datetime):
+        if user_id not in self._pending and len(self._pending) >= self.max_size:
+            # 缓冲区已满且正在写入, 登录信息属于尽力而为的数据, 直接丢弃
+            self.dropped += 1
+            self._schedule_flush()
+            return
+        self._pending[user_id] = (last_login_ip, last_login_at)
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """将缓冲区中的登录信息写入数据库, 写入失败的条目会重新放回缓冲区"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            items = list(pending.items())
+            for i in range(0, len(items), self.chunk_size):
+                chunk = dict(items[i:i + self.chunk_size])
+                try:
+                    async for db in get_db():
+                        await UserDAO.bulk_update_login_info(db, chunk)
+                except Exception as e:
+                    logger.warning("Failed to flush login info for %d users: %s", len(chunk), e)
+                    # 只放回没有被更新的登录记录覆盖的条目
+                    for user_id, info in chunk.items():
+                        if user_id not in self._pending and len(self._pending) < self.max_size:
+                            self._pending[user_id] = info
+
+
+login_info_buffer = LoginInfoBuffer(max_size=settings.LOGIN_INFO_BUFFER_SIZE)
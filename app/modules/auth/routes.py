@@ -1,53 +1,79 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.schemas import TokenResponse
-from app.core.database import get_db
+from app.common.schemas import TokenResponse, IntrospectionRequest, IntrospectionResult, IntrospectionResponse
+from app.core.database import get_db, get_read_db
+from app.core.responses import NegotiatedRoute
+from app.core.revocation import revoked_token_index
+from app.core.throttle import retry_after
 from app.core.security import create_access_token, create_refresh_token, oauth2_scheme
 from app.core.utils import get_client_ip
-from app.modules.auth.services import authenticate_user, verify_token, revoke_token, update_login_info
+from app.common.dao import UserDAO
+from app.modules.auth.services import (
+    authenticate_user, verify_token, revoke_tokens, update_login_info, token_claims, revoke_all_sessions,
+    check_login_throttle, record_login_failure, record_login_success, introspect_token, introspection_max_age
+)
 
-router = APIRouter(prefix="/auth")
+router = APIRouter(prefix="/auth", route_class=NegotiatedRoute)
 
 
 @router.post("/token", response_model=TokenResponse)
-async def login_endpoint(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
-    """用户认证"""
+async def login_endpoint(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_read_db)):
+    """用户认证(只读取用户信息, 最后登录信息由缓冲区批量写入主库)"""
     # 此处的 form_data.username 是学号/工号, 即 数据库中的 user_id
+    ip = get_client_ip(request)
+    # 被限流的请求不进行密码哈希和数据库查询
+    wait = check_login_throttle("token", ip, form_data.username)
+    if wait is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": retry_after(wait)},
+        )
     user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
+        await record_login_failure(ip, form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(user.user_id)
-    refresh_token = create_refresh_token(user.user_id)
+    access_token = create_access_token(user.user_id, claims=token_claims(user))
+    refresh_token = create_refresh_token(user.user_id, claims={"ver": user.token_version})
+    await record_login_success(user.user_id)
     # 更新用户的最后登录信息
-    await update_login_info(form_data.username, get_client_ip(request), datetime.now(), db=db)
+    update_login_info(user.user_id, ip, datetime.now())
     return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
 @router.post("/refresh", response_model=TokenResponse)
 async def refresh_token_endpoint(refresh_token: str = Form(...), db: AsyncSession = Depends(get_db)):
-    # 解码并验证令牌有效性
-    payload = await verify_token(refresh_token, "refresh", db=db)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired refresh token",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
+    invalid_token_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+    # 解码令牌, 进程内索引可以确定已撤销时直接拒绝; 索引不可用时不查询数据库, 由下面的插入判断
+    payload = await verify_token(refresh_token, "refresh", verify_revoked=False, db=db)
+    if not payload or revoked_token_index.is_revoked(payload["jti"]):
+        raise invalid_token_exception
 
-    # 拉黑旧令牌
-    await revoke_token(payload["jti"], payload["sub"], "refresh", datetime.fromtimestamp(payload["exp"]), db=db)
+    # 重新读取用户的角色、状态和令牌版本, 写入新的访问令牌
+    user = await UserDAO.get_principal(db, payload["sub"])
+    if not user or not user.is_enabled or payload.get("ver", 0) < user.token_version:
+        raise invalid_token_exception
+
+    # 拉黑旧令牌并提交, 没有插入新行说明旧令牌已被撤销(包括被并发的刷新请求抢先使用)
+    if not await revoke_tokens([payload], db=db):
+        raise invalid_token_exception
 
     # 颁发新令牌
-    new_access_token = create_access_token(payload["sub"])
-    new_refresh_token = create_refresh_token(payload["sub"], expire_at=datetime.fromtimestamp(payload["exp"]))
+    new_access_token = create_access_token(user.user_id, claims=token_claims(user))
+    new_refresh_token = create_refresh_token(user.user_id, expire_at=datetime.fromtimestamp(payload["exp"]),
+                                             claims={"ver": user.token_version})
     return TokenResponse(access_token=new_access_token, refresh_token=new_refresh_token)
 
 
@@ -59,16 +85,72 @@ async def logout_endpoint(
     """
     注销用户，撤销当前访问令牌和刷新令牌。
     """
-    # 验证访问令牌
+    # 解码访问令牌和刷新令牌, 无效或已过期的令牌不需要撤销
+    payloads = [
+        payload for payload in (
+            await verify_token(access_token, "access", verify_revoked=False, db=db),
+            await verify_token(refresh_token, "refresh", verify_revoked=False, db=db),
+        ) if payload
+    ]
+    # 用一条语句拉黑两个令牌, 已撤销的令牌被忽略, 无需事先查询
+    await revoke_tokens(payloads, "logout", db=db)
+
+
+@router.post("/logout/all", status_code=status.HTTP_200_OK)
+async def logout_all_endpoint(access_token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    注销用户的所有会话(所有设备上的访问令牌和刷新令牌)。
+    """
     payload = await verify_token(access_token, "access", db=db)
-    if payload:
-        # 拉黑访问令牌
-        await revoke_token(jti=payload["jti"], user_id=payload["sub"], token_type="access",
-                           expires_at=datetime.fromtimestamp(payload["exp"]), revoked_reason="logout", db=db)
-
-    # 验证刷新令牌
-    payload = await verify_token(refresh_token, "refresh", db=db)
-    if payload:
-        # 拉黑刷新令牌
-        await revoke_token(jti=payload["jti"], user_id=payload["sub"], token_type="refresh",
-                           expires_at=datetime.fromtimestamp(payload["exp"]), revoked_reason="logout", db=db)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    await revoke_all_sessions(payload["sub"], db=db)
+
+
+@router.api_route("/introspect", methods=["GET", "HEAD"], status_code=status.HTTP_204_NO_CONTENT)
+async def introspect_endpoint(request: Request, db: AsyncSession = Depends(get_read_db)):
+    """
+    NGINX auth_request 使用的令牌校验。
+    令牌有效时返回 204 和 X-User-Id、X-Roles 头, 否则返回 401。
+    成功的结果可按 Cache-Control 缓存(以 Authorization 头为缓存键), 失败的结果不缓存。
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    result = await introspect_token(token, db) if scheme.lower() == "bearer" and token else None
+    if result is None:
+        return Response(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            headers={"WWW-Authenticate": "Bearer", "Cache-Control": "no-store"},
+        )
+    user, payload = result
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={
+        "X-User-Id": user.user_id,
+        "X-Roles": ",".join(sorted(user.roles)),
+        "Cache-Control": f"max-age={introspection_max_age(payload)}",
+        "Vary": "Authorization",
+    })
+
+
+@router.post("/introspect", response_model=IntrospectionResponse, response_model_exclude_none=True)
+async def introspect_batch_endpoint(body: IntrospectionRequest, db: AsyncSession = Depends(get_read_db)):
+    """
+    批量校验访问令牌, 供网关一次校验多个连接的令牌。
+    max_age 为所有有效令牌中最短的可缓存时间。
+    """
+    results = []
+    max_age = None
+    for token in body.tokens:
+        result = await introspect_token(token, db)
+        if result is None:
+            results.append(IntrospectionResult(active=False))
+            continue
+        user, payload = result
+        results.append(IntrospectionResult(
+            active=True, sub=user.user_id, roles=sorted(user.roles), exp=int(payload["exp"])
+        ))
+        age = introspection_max_age(payload)
+        max_age = age if max_age is None else min(max_age, age)
+    return IntrospectionResponse(results=results, max_age=max_age or 0)
@@ -1,13 +1,33 @@
-from datetime import datetime
+import logging
+import time
+from datetime import datetime, timedelta
 
 from fastapi import Depends, HTTPException, status
-from jose import jwt, JWTError
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.dao import UserDAO, TokenBlocklistDAO
+from app.common.dao import UserDAO, TokenBlocklistDAO, LoginThrottleDAO
+from app.common.schemas import Principal
 from app.core.config import settings
-from app.core.database.base import get_db
-from app.core.security import verify_password, oauth2_scheme
+from app.core.database import get_db, get_read_db
+from app.core.hasher import password_hasher
+from app.core.metrics import token_revocation_checks, token_version_checks, token_purge_removed_rows, token_purge_dropped_partitions, \
+    login_throttled
+from app.core.revocation import revoked_token_index, token_version_index
+from app.core.security import oauth2_scheme, token_keys
+from app.core.throttle import login_throttle
+from app.modules.auth.buffer import login_info_buffer
+
+logger = logging.getLogger(__name__)
+
+_revocation_outcomes = {
+    (source, revoked): token_revocation_checks.labels(source, "revoked" if revoked else "valid")
+    for source in ("index", "db") for revoked in (True, False)
+}
+_version_outcomes = {
+    (source, outdated): token_version_checks.labels(source, "outdated" if outdated else "current")
+    for source in ("index", "db") for outdated in (True, False)
+}
 
 
 async def verify_token(token: str, token_type: str, verify_revoked: bool = True, db: AsyncSession = Depends(get_db)):
@@ -21,20 +41,152 @@ async def verify_token(token: str, token_type: str, verify_revoked: bool = True,
     """
     try:
         # 解码 JWT 令牌
-        payload = jwt.decode(token, settings.TOKEN_KEY, algorithms=[settings.ENCRYPTION_ALGORITHM])
+        payload = token_keys.decode(token)
         # 检查令牌类型
         if payload.get("type") != token_type:
             return None
-        # 如果需要，检查令牌是否被撤销
-        if verify_revoked and await TokenBlocklistDAO.is_token_revoked(db, payload.get("jti")):
+        # 如果需要，检查令牌是否被撤销或已被递增的令牌版本作废
+        if verify_revoked and await is_token_revoked(payload.get("jti"), db=db):
+            return None
+        if verify_revoked and await is_token_outdated(payload["sub"], payload.get("ver", 0), db=db):
             return None
 
         return payload
     except JWTError as e:
-        print(e)
+        logger.debug("Invalid %s token: %s", token_type, e)
         return None
 
 
+async def is_token_revoked(jti: str, db: AsyncSession = Depends(get_db)):
+    """
+    检查令牌是否已被撤销。
+    优先查询进程内的撤销索引, 索引尚未加载完成时回退到数据库查询。
+    :param jti: JWT ID
+    :param db: 数据库会话
+    :return: 是否已撤销
+    """
+    source = "index"
+    revoked = revoked_token_index.is_revoked(jti)
+    if revoked is None:
+        source = "db"
+        revoked = await TokenBlocklistDAO.is_token_revoked(db, jti)
+    _revocation_outcomes[(source, revoked)].inc()
+    return revoked
+
+
+async def is_token_outdated(user_id: str, version: int, db: AsyncSession = Depends(get_db)):
+    """
+    检查令牌携带的版本是否早于用户当前的令牌版本。
+    优先查询进程内的版本索引, 索引尚未加载完成时回退到数据库查询。
+    :param user_id: 用户 ID
+    :param version: 令牌中的 ``ver`` 声明
+    :param db: 数据库会话
+    :return: 是否已作废
+    """
+    source = "index"
+    current = token_version_index.get(user_id)
+    if current is None:
+        source = "db"
+        current = await UserDAO.get_token_version(db, user_id) or 0
+    outdated = version < current
+    _version_outcomes[(source, outdated)].inc()
+    return outdated
+
+
+def token_claims(user: Principal) -> dict:
+    """
+    访问令牌中携带的用户声明, 使 get_current_user 在常见路径上无需查询数据库。
+    :param user: 已认证的用户
+    :return: 声明字典
+    """
+    return {
+        "name": user.name,
+        "status": user.status,
+        "roles": sorted(user.roles),
+        "ver": user.token_version,
+    }
+
+
+async def sync_revoked_tokens(db: AsyncSession = Depends(get_db)):
+    """
+    将数据库中的撤销记录同步到进程内索引。
+    首次调用时全量加载, 之后仅拉取新增记录, 用于同步其他 worker 撤销的令牌。
+    :param db: 数据库会话
+    """
+    rows = await TokenBlocklistDAO.get_revoked_tokens(db, revoked_token_index.sync_since())
+    revoked_token_index.merge(rows)
+    revoked_token_index.prune()
+
+
+async def sync_token_versions(db: AsyncSession = Depends(get_db)):
+    """
+    将数据库中的用户令牌版本同步到进程内索引。
+    首次调用时全量加载, 之后仅拉取最近更新的用户。
+    :param db: 数据库会话
+    """
+    rows = await UserDAO.get_token_versions(db, token_version_index.sync_since())
+    token_version_index.merge(rows)
+
+
+async def revoke_all_sessions(user_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    撤销用户的所有会话。
+    只需递增用户的令牌版本, 此前签发的访问令牌和刷新令牌在版本检查时全部失效, 不需要逐个拉黑 JTI。
+    :param user_id: 用户 ID
+    :param db: 数据库会话
+    :return: 新的令牌版本
+    """
+    version = await UserDAO.bump_token_version(db, user_id)
+    if version is not None:
+        token_version_index.set(user_id, version)
+    return version
+
+
+async def _rotate_blocklist_partitions(db: AsyncSession):
+    """
+    删除已整体过期的按天分区, 并预先创建未来的分区。
+    :return: 删除的分区数
+    """
+    partitions = await TokenBlocklistDAO.get_partitions(db)
+    now = time.time()
+    expired = [name for name, upper_bound in partitions if upper_bound is not None and upper_bound <= now]
+    await TokenBlocklistDAO.drop_partitions(db, expired)
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    bounds = [upper_bound for _, upper_bound in partitions if upper_bound is not None and upper_bound > now]
+    next_bound = datetime.fromtimestamp(max(bounds)) + timedelta(days=1) if bounds else today + timedelta(days=1)
+    last_bound = today + timedelta(days=settings.TOKEN_BLOCKLIST_PARTITION_DAYS_AHEAD + 1)
+    new_bounds = []
+    while next_bound <= last_bound:
+        new_bounds.append(next_bound)
+        next_bound += timedelta(days=1)
+    await TokenBlocklistDAO.add_partitions(db, new_bounds)
+    return len(expired)
+
+
+async def purge_expired_tokens(db: AsyncSession = Depends(get_db)):
+    """
+    清理过期的撤销记录。
+    分区模式下直接删除整体过期的分区, 否则分批删除过期行。
+    :param db: 数据库会话
+    :return: 清理结果统计
+    """
+    started_at = time.perf_counter()
+    removed_rows = 0
+    dropped_partitions = 0
+    if settings.TOKEN_BLOCKLIST_PARTITIONED:
+        dropped_partitions = await _rotate_blocklist_partitions(db)
+    else:
+        removed_rows = await TokenBlocklistDAO.remove_expired_tokens(
+            db, settings.TOKEN_PURGE_BATCH_SIZE, settings.TOKEN_PURGE_BATCH_PAUSE
+        )
+    duration = time.perf_counter() - started_at
+    token_purge_removed_rows.inc(removed_rows)
+    token_purge_dropped_partitions.inc(dropped_partitions)
+    logger.info("Purged expired tokens: %d rows, %d partitions in %.3fs", removed_rows, dropped_partitions, duration)
+    return {"removed_rows": removed_rows, "dropped_partitions": dropped_partitions, "duration": duration}
+
+
 async def revoke_token(jti: str, user_id: str, token_type: str, expires_at: datetime, revoked_reason: str = None,
                        db: AsyncSession = Depends(get_db)):
     """
@@ -50,45 +202,180 @@ async def revoke_token(jti: str, user_id: str, token_type: str, expires_at: date
     return await TokenBlocklistDAO.add_to_blocklist(db, jti, user_id, token_type, expires_at, revoked_reason)
 
 
+async def revoke_tokens(payloads: list[dict], revoked_reason: str = None, db: AsyncSession = Depends(get_db)):
+    """
+    在一个事务中撤销多个令牌。
+    已被撤销的令牌被忽略, 因此插入的行数同时说明了令牌在撤销前是否有效。
+    :param payloads: 已解码的 JWT 负载
+    :param revoked_reason: 撤销原因
+    :param db: 数据库会话
+    :return: 新撤销的令牌数
+    """
+    return await TokenBlocklistDAO.add_many_to_blocklist(db, [
+        {
+            "jti": payload["jti"],
+            "user_id": payload["sub"],
+            "token_type": payload["type"],
+            "expires_at": datetime.fromtimestamp(payload["exp"]),
+            "revoked_reason": revoked_reason,
+        }
+        for payload in payloads
+    ])
+
+
 async def authenticate_user(user_id: str, password: str, db: AsyncSession = Depends(get_db)):
     """
     验证用户凭据。
     :param user_id: 用户 ID（学号或工号）
     :param password: 用户密码
     :param db: 数据库会话
-    :return: 用户实体或 None
+    :return: Principal 或 None
     """
-    user = await UserDAO.get_user_by_user_id(db, user_id)
-    if not user or not verify_password(password, user.hashed_password):
+    user = await UserDAO.get_principal(db, user_id)
+    if not user or not user.is_enabled:
+        return None
+    if not await password_hasher.verify(password, user.hashed_password):
         return None
     return user
 
 
-async def update_login_info(user_id: str, last_login_ip: str, last_login_time: datetime, db: AsyncSession = Depends(get_db)):
+def check_login_throttle(endpoint: str, ip: str | None, user_id: str | None):
     """
-    更新用户的最后登录信息。
+    在验证密码和查询数据库之前检查登录限流。
+    :param endpoint: 登录入口, 用于指标("token" 或 "rabbitmq")
+    :param ip: 客户端 IP, 为 None 时只检查账号
     :param user_id: 用户 ID
-    :param last_login_ip: 最后登录 IP 地址
-    :param last_login_time: 最后登录时间
+    :return: 被拒绝时返回需要等待的秒数, 允许时返回 None
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return None
+    rejected = login_throttle.check(ip, user_id)
+    if rejected is None:
+        return None
+    reason, wait = rejected
+    login_throttled.labels(endpoint, reason).inc()
+    return wait
+
+
+async def record_login_failure(ip: str | None, user_id: str | None):
+    """
+    记录一次登录失败。
+    共享模式下同时写入 login_throttle 表, 写入失败时只影响其他 worker 的同步, 不影响本次请求。
+    :param ip: 客户端 IP
+    :param user_id: 用户 ID
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return
+    login_throttle.record_failure(ip, user_id)
+    if not settings.LOGIN_THROTTLE_SHARED:
+        return
+    try:
+        async for db in get_db():
+            blocked = await LoginThrottleDAO.record_failures(
+                db, login_throttle.keys(ip, user_id), login_throttle.window,
+                login_throttle.backoff_base, login_throttle.backoff_max,
+            )
+            for key, blocked_until in blocked.items():
+                login_throttle.block(key, blocked_until)
+    except Exception as e:
+        logger.warning("Failed to record login failure: %s", e)
+
+
+async def record_login_success(user_id: str):
+    """
+    登录成功后清除账号的失败计数。
+    共享模式下只有本 worker 记录过该账号的失败时才写数据库, 其他 worker 记录的失败随窗口过期。
+    :param user_id: 用户 ID
+    """
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return
+    if login_throttle.record_success(user_id) and settings.LOGIN_THROTTLE_SHARED:
+        try:
+            async for db in get_db():
+                await LoginThrottleDAO.clear(db, login_throttle.user_key(user_id))
+        except Exception as e:
+            logger.warning("Failed to clear login failures: %s", e)
+
+
+async def sync_login_throttle(db: AsyncSession = Depends(get_db)):
+    """
+    将其他 worker 写入的封禁状态同步到进程内(共享模式)。
     :param db: 数据库会话
-    :return: 更新后的用户实体
     """
-    return await UserDAO.update_login_info(db, user_id, last_login_ip, last_login_time)
+    for key, blocked_until in await LoginThrottleDAO.get_blocked(db):
+        login_throttle.block(key, blocked_until.timestamp())
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"}
-    )
+async def purge_login_throttle(db: AsyncSession = Depends(get_db)):
+    """
+    删除 login_throttle 表中不再影响限流的记录(共享模式)。
+    :param db: 数据库会话
+    :return: 删除的行数
+    """
+    return await LoginThrottleDAO.remove_stale(db, login_throttle.window)
+
+
+def update_login_info(user_id: str, last_login_ip: str, last_login_time: datetime):
+    """
+    记录用户的最后登录信息。
+    信息先写入内存缓冲区, 由定时任务批量写入数据库。
+    :param user_id: 用户 ID
+    :param last_login_ip: 最后登录 IP 地址
+    :param last_login_time: 最后登录时间
+    """
+    login_info_buffer.record(user_id, last_login_ip, last_login_time)
+
 
+async def introspect_token(token: str, db: AsyncSession = Depends(get_read_db)):
+    """
+    校验访问令牌并得到令牌所属的用户。
+    令牌版本未变化时, 声明中的角色和状态仍然有效, 直接由声明构造用户, 不查询 users 表。
+    :param token: 访问令牌
+    :param db: 数据库会话
+    :return: (Principal, JWT 负载); 令牌无效、已撤销或用户已禁用时返回 None
+    """
     payload = await verify_token(token, "access", db=db)
     if not payload:
-        raise credentials_exception
+        return None
+
+    if "roles" in payload:
+        user = Principal(
+            user_id=payload["sub"],
+            name=payload.get("name", ""),
+            status=payload.get("status", ""),
+            roles=frozenset(payload["roles"]),
+            token_version=payload.get("ver", 0),
+        )
+    else:
+        # 不携带声明的旧令牌
+        user = await UserDAO.get_principal(db, payload["sub"])
+    if not user or not user.is_enabled:
+        return None
+    return user, payload
+
+
+def introspection_max_age(payload: dict) -> int:
+    """
+    校验结果可被网关缓存的秒数。
+    不超过令牌的剩余有效期, 也不超过撤销索引的同步间隔, 使撤销在缓存中的延迟与 worker 之间的同步延迟相当。
+    """
+    remaining = int(payload["exp"] - time.time())
+    return max(0, min(remaining, settings.TOKEN_REVOCATION_SYNC_SECONDS))
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
+    result = await introspect_token(token, db)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return result[0]
 
-    user = await UserDAO.get_user_by_user_id(db, payload["sub"])
-    if not user:
-        raise credentials_exception
 
+async def require_admin(user: Principal = Depends(get_current_user)):
+    """仅允许管理员访问"""
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator role required")
     return user
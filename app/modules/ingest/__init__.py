@@ -0,0 +1 @@
+from app.modules.ingest.services import telemetry_ingestor, telemetry_tap
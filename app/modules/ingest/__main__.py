@@ -0,0 +1,24 @@
+"""
+单独运行传感器数据接入服务(不启动 Web 服务):
+    python -m app.modules.ingest
+"""
+import asyncio
+import logging
+import signal
+
+from app.modules.ingest import telemetry_ingestor
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    telemetry_ingestor.start()
+    await stop.wait()
+    await telemetry_ingestor.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
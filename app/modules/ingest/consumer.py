@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+from functools import partial
+from typing import NamedTuple
+
+import pika
+from pika.exceptions import AMQPError
+
+logger = logging.getLogger(__name__)
+
+
+class Delivery(NamedTuple):
+    generation: int  # 所属连接的代数, 重连后旧连接上的 delivery tag 失效
+    delivery_tag: int
+    routing_key: str
+    body: bytes
+
+
+class AmqpConsumerThread(threading.Thread):
+    """
+    在独立线程中运行 pika BlockingConnection, 将收到的消息转交给事件循环中的队列。
+    消息的确认由事件循环在数据库提交后通过 ``settle`` 发起, 再经 ``add_callback_threadsafe`` 回到本线程执行。
+    未确认的消息数受 prefetch 限制, 数据库写入变慢时 broker 会自动暂停投递, 形成背压。
+    exclusive 为 True 时不使用 queues 中的队列名, 而是为每个 routing key 声明一个本连接独占的临时队列,
+    每个消费者都能收到交换机上的全部消息; 临时队列的长度不超过 max_length, 超出时丢弃最旧的消息。
+    """
+
+    def __init__(self, url: str, exchange: str, queues: dict[str, str], prefetch: int,
+                 loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, exclusive: bool = False,
+                 max_length: int = 10000):
+        super().__init__(name="amqp-consumer", daemon=True)
+        self.url = url
+        self.exchange = exchange
+        self.queues = queues
+        self.prefetch = prefetch
+        self.exclusive = exclusive
+        self.max_length = max_length
+        self.generation = 0
+        self._loop = loop
+        self._queue = queue
+        self._connection = None
+        self._channel = None
+        self._stopping = threading.Event()  # 停止接收新消息
+        self._closing = threading.Event()  # 关闭连接并退出线程
+
+    def run(self):
+        delay = 1.0
+        while not self._stopping.is_set():
+            try:
+                self._consume()
+                delay = 1.0
+            except AMQPError as e:
+                logger.warning("RabbitMQ consumer disconnected: %r, reconnecting in %.0fs", e, delay)
+                self._stopping.wait(delay)
+                delay = min(delay * 2, 30.0)
+        # 停止消费后继续处理确认回调, 直到事件循环写完剩余的消息
+        connection = self._connection
+        while connection is not None and connection.is_open and not self._closing.is_set():
+            try:
+                connection.process_data_events(time_limit=0.1)
+            except AMQPError:
+                break
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except AMQPError:
+                pass
+
+    def _consume(self):
+        connection = pika.BlockingConnection(pika.URLParameters(self.url))
+        channel = connection.channel()
+        channel.basic_qos(prefetch_count=self.prefetch)
+        for queue_name, routing_key in self.queues.items():
+            if self.exclusive:
+                result = channel.queue_declare(queue="", exclusive=True, arguments={
+                    "x-max-length": self.max_length, "x-overflow": "drop-head",
+                })
+                queue_name = result.method.queue
+            else:
+                channel.queue_declare(queue=queue_name, durable=True)
+            channel.queue_bind(queue=queue_name, exchange=self.exchange, routing_key=routing_key)
+            channel.basic_consume(queue=queue_name, on_message_callback=self._on_message)
+        self.generation += 1
+        self._connection, self._channel = connection, channel
+        if self.exclusive:
+            logger.info("Consuming sensor frames from exclusive queues bound to %s", ", ".join(self.queues.values()))
+        else:
+            logger.info("Consuming sensor frames from %s", ", ".join(self.queues))
+        if self._stopping.is_set():
+            return
+        channel.start_consuming()
+
+    def _on_message(self, _channel, method, _properties, body: bytes):
+        delivery = Delivery(self.generation, method.delivery_tag, method.routing_key, body)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, delivery)
+
+    def settle(self, generation: int, ack_tag: int | None, reject_tags: list[int]):
+        """
+        确认一批已处理的消息。可在任意线程调用。
+        :param generation: 消息所属连接的代数, 与当前连接不同时忽略(broker 已重新投递)
+        :param ack_tag: 最大的已写入消息的 delivery tag, 使用 multiple 一次确认之前的所有消息
+        :param reject_tags: 校验失败的消息, 拒绝且不重新入队
+        """
+        connection, channel = self._connection, self._channel
+        if generation != self.generation or connection is None or not connection.is_open:
+            return
+        try:
+            connection.add_callback_threadsafe(partial(self._settle, channel, ack_tag, reject_tags))
+        except AMQPError:
+            pass
+
+    @staticmethod
+    def _settle(channel, ack_tag: int | None, reject_tags: list[int]):
+        if not channel.is_open:
+            return
+        for tag in reject_tags:
+            channel.basic_nack(delivery_tag=tag, requeue=False)
+        if ack_tag is not None:
+            channel.basic_ack(delivery_tag=ack_tag, multiple=True)
+
+    def stop_consuming(self):
+        """停止接收新消息, 连接保持打开以便确认已收到的消息"""
+        self._stopping.set()
+        connection, channel = self._connection, self._channel
+        if connection is not None and connection.is_open:
+            try:
+                connection.add_callback_threadsafe(channel.stop_consuming)
+            except AMQPError:
+                pass
+
+    def close(self, timeout: float = 5.0):
+        """关闭连接并等待线程退出, 未确认的消息由 broker 重新投递"""
+        self._stopping.set()
+        self._closing.set()
+        self.join(timeout)
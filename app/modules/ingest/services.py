@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable
+
+import msgpack
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+
+from app.common.dao import SensorFrameDAO
+from app.common.schemas import SENSOR_FRAME_SCHEMAS
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import registry, Gauge, ingest_frames, ingest_flush_duration
+from app.modules.ingest.consumer import AmqpConsumerThread, Delivery
+
+logger = logging.getLogger(__name__)
+
+_accepted_frames = ingest_frames.labels("accepted")
+_rejected_frames = ingest_frames.labels("rejected")
+
+
+def decode_frames(deliveries: list[Delivery]):
+    """
+    解码并校验一批消息。
+    :param deliveries: 从 RabbitMQ 收到的消息
+    :return: (待写入的行, (user_id, modality, SensorFrame) 列表, 校验失败的消息)
+    """
+    rows = []
+    frames = []
+    rejected = []
+    for delivery in deliveries:
+        # routing key: sensor.<user_id>.<modality>, RabbitMQ 的 topic 权限保证 user_id 与发布者一致
+        parts = delivery.routing_key.split(".")
+        schema = SENSOR_FRAME_SCHEMAS.get(parts[2]) if len(parts) == 3 and parts[0] == "sensor" else None
+        if schema is None or not 0 < len(parts[1]) <= 20:
+            rejected.append(delivery)
+            continue
+        try:
+            frame = schema.model_validate(msgpack.unpackb(delivery.body))
+            row = {
+                "user_id": parts[1],
+                "modality": parts[2],
+                "seq": frame.seq,
+                "captured_at": datetime.fromtimestamp(frame.timestamp),
+                "sample_rate": frame.sample_rate,
+                "sample_count": len(frame.data),
+                "channel_count": len(frame.data[0]),
+                "payload": delivery.body,
+            }
+        except (ValueError, TypeError, OverflowError, OSError):
+            # 无法解码或时间戳无法转换的消息只拒绝这一条, 不影响同一批的其他消息
+            rejected.append(delivery)
+            continue
+        frames.append((parts[1], parts[2], frame))
+        rows.append(row)
+    return rows, frames, rejected
+
+
+def _is_transient(error: Exception) -> bool:
+    """数据库连接断开、超时或暂时不可用的错误, 稍后重试可能成功"""
+    if isinstance(error, (OperationalError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class TelemetryIngestor:
+    """
+    传感器数据接入服务。
+    消费线程收到的消息在事件循环中攒批(达到批大小或等待超过刷新间隔), 解码校验后多行插入数据库,
+    提交成功后才向 broker 确认; 数据库暂时不可用时保留消息不确认并退避重试(最多 max_retries 次),
+    未确认消息达到 prefetch 后 broker 暂停投递; 其他写入错误(如数据超出列范围)重试也不会成功,
+    直接拒绝这一批(不重新入队), 避免阻塞后续消息。
+    投递语义为至少一次: 连接在提交与确认之间断开时, broker 会重新投递已写入的消息。
+    """
+
+    def __init__(self, url: str, exchange: str, queues: dict[str, str], prefetch: int, batch_size: int,
+                 flush_interval: float, max_retries: int = 8):
+        self.url = url
+        self.exchange = exchange
+        self.queues = queues
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        # 队列长度受 prefetch 限制, 不需要额外设置上限
+        self._queue: asyncio.Queue[Delivery | None] = asyncio.Queue()
+        self._consumer: AmqpConsumerThread | None = None
+        self._task: asyncio.Task | None = None
+        self._subscribers: list[Callable[[list], None]] = []
+
+    def subscribe(self, callback: Callable[[list], None]):
+        """
+        注册已校验数据帧的回调(如学习者状态引擎), 在写入数据库之前于事件循环中调用, 不应阻塞。
+        回调参数为 (user_id, modality, SensorFrame) 列表。
+        """
+        self._subscribers.append(callback)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._consumer = self._create_consumer()
+        self._consumer.start()
+        self._task = asyncio.create_task(self._run())
+
+    def _create_consumer(self) -> AmqpConsumerThread:
+        return AmqpConsumerThread(
+            self.url, self.exchange, self.queues, self.prefetch, asyncio.get_running_loop(), self._queue
+        )
+
+    async def shutdown(self, timeout: float = 10.0):
+        """停止接收新消息, 写入并确认已收到的消息后关闭连接"""
+        if self._task is None:
+            return
+        self._consumer.stop_consuming()
+        self._queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out flushing sensor frames, unacknowledged frames will be redelivered")
+        await asyncio.to_thread(self._consumer.close)
+        self._task = self._consumer = None
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect()
+            if not batch:
+                continue
+            try:
+                await self._process(batch)
+            except Exception:
+                # 未预料的错误不能终止接入; 拒绝这一批(不重新入队, 队列配置了死信交换机时转入死信队列),
+                # 否则这些消息一直占用 prefetch 额度
+                logger.exception("Failed to process %d sensor frames, rejecting them", len(batch))
+                _rejected_frames.inc(len(batch))
+                self._settle(batch, batch)
+
+    async def _collect(self) -> tuple[list[Delivery], bool]:
+        """收集一批消息, 返回 (消息列表, 是否收到停止信号)"""
+        batch = []
+        item = await self._queue.get()
+        if item is None:
+            return batch, True
+        batch.append(item)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _process(self, batch: list[Delivery]):
+        # 解码与校验是 CPU 密集操作, 放到线程中执行以免阻塞事件循环
+        rows, frames, rejected = await asyncio.to_thread(decode_frames, batch)
+        # 实时计算不等待数据库写入
+        self._notify(frames)
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            started_at = time.perf_counter()
+            try:
+                async for db in get_db():
+                    await SensorFrameDAO.bulk_insert(db, rows)
+                break
+            except Exception as e:
+                if not _is_transient(e) or attempt == self.max_retries:
+                    # 重试无法恢复, 拒绝整批消息(配置了死信交换机时转入死信队列)
+                    logger.error("Failed to write %d sensor frames, rejecting them: %s", len(rows), e)
+                    _rejected_frames.inc(len(batch))
+                    self._settle(batch, batch)
+                    return
+                logger.warning("Failed to write %d sensor frames: %s, retrying in %.1fs", len(rows), e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+        ingest_flush_duration.observe(time.perf_counter() - started_at)
+        _accepted_frames.inc(len(rows))
+        _rejected_frames.inc(len(rejected))
+
+        self._settle(batch, rejected)
+
+    def _notify(self, frames: list):
+        for callback in self._subscribers:
+            try:
+                callback(frames)
+            except Exception:
+                logger.exception("Sensor frame subscriber failed")
+
+    def _settle(self, batch: list[Delivery], rejected: list[Delivery]):
+        """按连接分组确认: 先拒绝无效消息, 再用 multiple 确认最大的有效 delivery tag"""
+        rejected_tags = {(delivery.generation, delivery.delivery_tag) for delivery in rejected}
+        settlements: dict[int, tuple[int | None, list[int]]] = {}
+        for delivery in batch:
+            ack_tag, reject_tags = settlements.get(delivery.generation, (None, []))
+            if (delivery.generation, delivery.delivery_tag) in rejected_tags:
+                reject_tags.append(delivery.delivery_tag)
+            else:
+                ack_tag = delivery.delivery_tag if ack_tag is None else max(ack_tag, delivery.delivery_tag)
+            settlements[delivery.generation] = (ack_tag, reject_tags)
+        for generation, (ack_tag, reject_tags) in settlements.items():
+            self._consumer.settle(generation, ack_tag, reject_tags)
+
+
+class TelemetryTap(TelemetryIngestor):
+    """
+    学习者状态引擎的数据源。
+    写入数据库的队列由各 worker(以及单独运行的接入进程)竞争消费, 每个 worker 只能收到一部分数据帧;
+    状态计算需要每个学习者的全部数据, 因此每个 worker 另外声明一个独占的临时队列绑定到同一交换机,
+    topic 交换机向每个绑定的队列各投递一份, 各 worker 的状态引擎都能收到所有学习者的完整数据。
+    不写入数据库, 解码后即确认; 状态引擎跟不上时 broker 丢弃临时队列中最旧的消息, 不影响数据库写入。
+    """
+
+    def __init__(self, *args, max_length: int = 10000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_length = max_length
+
+    def _create_consumer(self) -> AmqpConsumerThread:
+        return AmqpConsumerThread(
+            self.url, self.exchange, self.queues, self.prefetch, asyncio.get_running_loop(), self._queue,
+            exclusive=True, max_length=self.max_length,
+        )
+
+    async def _process(self, batch: list[Delivery]):
+        _, frames, rejected = await asyncio.to_thread(decode_frames, batch)
+        self._notify(frames)
+        self._settle(batch, rejected)
+
+
+telemetry_ingestor = TelemetryIngestor(
+    settings.INGEST_AMQP_URL,
+    settings.INGEST_EXCHANGE,
+    settings.INGEST_QUEUES,
+    settings.INGEST_PREFETCH,
+    settings.INGEST_BATCH_SIZE,
+    settings.INGEST_FLUSH_SECONDS,
+    settings.INGEST_WRITE_RETRIES,
+)
+
+registry.register(Gauge(
+    "ingest_queue_depth", "Sensor frames received but not yet written", lambda: telemetry_ingestor.queue_depth
+))
+
+# 每个 worker 的状态引擎各自完整消费一份数据帧
+telemetry_tap = TelemetryTap(
+    settings.INGEST_AMQP_URL,
+    settings.INGEST_EXCHANGE,
+    settings.INGEST_QUEUES,
+    settings.INGEST_PREFETCH,
+    settings.INGEST_BATCH_SIZE,
+    settings.STATE_TICK_SECONDS,
+    max_length=settings.STATE_FEED_MAX_LENGTH,
+)
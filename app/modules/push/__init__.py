@@ -0,0 +1 @@
+from app.modules.push.routes import router as push_router
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+from app.common.schemas import Principal
+from app.core.config import settings
+from app.core.metrics import registry, Gauge, push_dropped_connections, push_messages
+from app.core.revocation import revoked_token_index, token_version_index
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """
+    一个 WebSocket/SSE 连接。
+    待发送的更新按学习者合并, 同一学习者只保留最新一条, 因此缓冲区大小不超过订阅的学习者数。
+    保存连接时使用的访问令牌的 jti 和过期时间, 令牌过期、被撤销或用户令牌版本递增后由网关断开连接。
+    """
+
+    __slots__ = ("user", "jti", "expires_at", "learners", "pending", "replies", "pending_since", "closed",
+                 "close_reason", "_ready")
+
+    def __init__(self, user: Principal, jti: str | None = None, expires_at: float | None = None):
+        self.user = user
+        self.jti = jti
+        self.expires_at = expires_at  # 令牌过期的 Unix 时间
+        self.learners: set[str] = set()
+        self.pending: dict[str, bytes] = {}  # 学习者 -> 已序列化的最新状态
+        self.replies: deque[bytes] = deque(maxlen=16)  # 订阅请求的应答
+        self.pending_since: float | None = None  # 缓冲区从空变为非空的时间
+        self.closed = False
+        self.close_reason: str | None = None  # "slow"、"expired" 或 "revoked", 正常断开时为 None
+        self._ready = asyncio.Event()
+
+    def push(self, learner_id: str, data: bytes, now: float):
+        if not self.pending:
+            self.pending_since = now
+        self.pending[learner_id] = data
+        self._ready.set()
+
+    def reply(self, message: dict):
+        self.replies.append(json.dumps(message, separators=(",", ":")).encode())
+        self._ready.set()
+
+    def close(self, reason: str | None = None):
+        if not self.closed:
+            self.close_reason = reason
+        self.closed = True
+        self._ready.set()
+
+    async def next_message(self, timeout: float) -> bytes | None:
+        """
+        等待并取出下一条要发送的消息: 先发送应答, 再将所有待发送的状态合并为一条消息。
+        :param timeout: 最长等待时间(秒)
+        :return: 消息; 超时(应发送心跳)或连接已关闭时返回 None
+        """
+        if not self.replies and not self.pending and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.closed:
+            return None
+        if self.replies:
+            message = self.replies.popleft()
+        else:
+            updates, self.pending, self.pending_since = self.pending, {}, None
+            message = b'{"type":"state","updates":[' + b",".join(updates.values()) + b"]}" if updates else None
+        if not self.replies and not self.pending:
+            self._ready.clear()
+        return message
+
+
+class PushGateway:
+    """
+    学习者状态推送网关。
+    订阅学习者状态引擎的计算结果, 每个学习者的状态每周期只序列化一次, 由所有订阅该学习者的连接共享。
+    各连接的发送协程独立取走合并后的更新, 超过发送超时仍未取走的慢连接会被断开, 不影响其他连接。
+    每个 worker 的状态引擎都收到所有学习者的全部数据帧(见 ingest.services.TelemetryTap),
+    因此连接到任意 worker 的订阅者都能收到完整的状态; 本 worker 未运行状态引擎时拒绝连接。
+    访问令牌只在连接时校验一次, 之后每 REVALIDATE_SECONDS 秒按进程内的撤销索引和令牌版本索引重新检查所有连接,
+    断开令牌已过期、已注销(撤销 jti)或已被作废(注销全部会话、禁用用户、修改密码或角色)的连接。
+    """
+
+    REVALIDATE_SECONDS = 1.0
+
+    def __init__(self, max_connections: int, max_learners: int, send_timeout: float):
+        self.max_connections = max_connections
+        self.max_learners = max_learners
+        self.send_timeout = send_timeout
+        self._subscribers: set[Subscriber] = set()
+        self._revalidated_at = 0.0
+        self._by_learner: dict[str, set[Subscriber]] = {}
+        self.attached = False  # 是否已订阅状态引擎
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def attach(self, engine):
+        """订阅学习者状态引擎的计算结果, 之后才接受连接"""
+        engine.subscribe(self.publish)
+        self.attached = True
+
+    def connect(self, user: Principal, payload: dict | None = None) -> Subscriber | None:
+        """
+        创建连接, 未订阅状态引擎或连接数已满时返回 None。
+        :param user: 令牌所属的用户
+        :param payload: 访问令牌的 JWT 负载, 用于在连接期间检查令牌是否过期或被撤销
+        """
+        if not self.attached or len(self._subscribers) >= self.max_connections:
+            return None
+        payload = payload or {}
+        subscriber = Subscriber(user, payload.get("jti"), payload.get("exp"))
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber, reason: str | None = None):
+        subscriber.close(reason)
+        self._subscribers.discard(subscriber)
+        self.unsubscribe(subscriber, list(subscriber.learners))
+
+    def subscribe(self, subscriber: Subscriber, learner_ids) -> int:
+        """
+        订阅学习者, 超出单个连接的订阅上限的部分被忽略。
+        :return: 当前订阅的学习者数
+        """
+        for learner_id in learner_ids:
+            if len(subscriber.learners) >= self.max_learners:
+                break
+            subscriber.learners.add(learner_id)
+            self._by_learner.setdefault(learner_id, set()).add(subscriber)
+        return len(subscriber.learners)
+
+    def unsubscribe(self, subscriber: Subscriber, learner_ids) -> int:
+        for learner_id in learner_ids:
+            subscriber.learners.discard(learner_id)
+            subscriber.pending.pop(learner_id, None)
+            subscribers = self._by_learner.get(learner_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._by_learner[learner_id]
+        return len(subscriber.learners)
+
+    def publish(self, results: dict):
+        """
+        学习者状态引擎的回调: 序列化有订阅者的学习者的最新状态, 并放入各订阅连接的缓冲区。
+        :param results: 模态 -> WindowFeatures
+        """
+        now = time.monotonic()
+        if now - self._revalidated_at >= self.REVALIDATE_SECONDS:
+            self._revalidated_at = now
+            self._drop_invalid_subscribers()
+        if not self._by_learner:
+            return
+        states: dict[str, dict] = {}
+        for modality, features in results.items():
+            rows = [i for i, user_id in enumerate(features.user_ids) if user_id in self._by_learner]
+            if not rows:
+                continue
+            # 向量化地取出并舍入需要推送的行, 再一次性转换为 Python 列表
+            mean = features.mean[rows].round(4).tolist()
+            var = features.var[rows].round(4).tolist()
+            rate = features.rate[rows].round(2).tolist()
+            low = features.low[rows].tolist()
+            high = features.high[rows].tolist()
+            signal_loss = features.signal_loss[rows].tolist()
+            for k, i in enumerate(rows):
+                alerts = [name for name, flag in (("low", low[k]), ("high", high[k]),
+                                                  ("signal_loss", signal_loss[k])) if flag]
+                states.setdefault(features.user_ids[i], {})[modality] = {
+                    "mean": mean[k], "var": var[k], "rate": rate[k], "alerts": alerts,
+                }
+
+        timestamp = round(time.time(), 3)
+        for learner_id, modalities in states.items():
+            data = json.dumps(
+                {"user_id": learner_id, "ts": timestamp, "modalities": modalities}, separators=(",", ":")
+            ).encode()
+            for subscriber in self._by_learner[learner_id]:
+                subscriber.push(learner_id, data, now)
+        push_messages.inc(len(states))
+        self._drop_slow_subscribers(now)
+
+    def _drop_slow_subscribers(self, now: float):
+        slow = [
+            subscriber for subscriber in self._subscribers
+            if subscriber.pending_since is not None and now - subscriber.pending_since > self.send_timeout
+        ]
+        for subscriber in slow:
+            logger.info("Dropping slow push subscriber %s", subscriber.user.user_id)
+            self.disconnect(subscriber, "slow")
+        push_dropped_connections.inc(len(slow))
+
+    def _drop_invalid_subscribers(self):
+        """
+        断开令牌已失效的连接。
+        索引尚未加载或同步中断时无法判断撤销状态, 只检查过期时间, 不在推送周期中访问数据库。
+        """
+        now = time.time()
+        dropped = []
+        for subscriber in self._subscribers:
+            if subscriber.expires_at is not None and subscriber.expires_at <= now:
+                dropped.append((subscriber, "expired"))
+                continue
+            user_id = subscriber.user.user_id
+            version = token_version_index.get(user_id)
+            if (version is not None and version > subscriber.user.token_version) or (
+                    subscriber.jti is not None and revoked_token_index.is_revoked(subscriber.jti)):
+                dropped.append((subscriber, "revoked"))
+        for subscriber, reason in dropped:
+            logger.info("Closing push connection of %s: token %s", subscriber.user.user_id, reason)
+            self.disconnect(subscriber, reason)
+
+    def stats(self) -> dict:
+        return {"attached": self.attached, "connections": len(self._subscribers), "learners": len(self._by_learner)}
+
+
+push_gateway = PushGateway(
+    settings.PUSH_MAX_CONNECTIONS,
+    settings.PUSH_MAX_LEARNERS_PER_CONNECTION,
+    settings.PUSH_SEND_TIMEOUT,
+)
+
+registry.register(Gauge("push_connections", "Open WebSocket/SSE push connections", lambda: len(push_gateway)))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.modules.push.gateway import push_gateway, Subscriber
+from app.modules.push.services import extract_token, authenticate, resolve_learners
+
+router = APIRouter(prefix="/push")
+
+
+# 网关断开连接的原因 -> WebSocket 关闭码: 令牌失效时客户端应重新登录, 其他情况可稍后重连
+_CLOSE_CODES = {"expired": status.WS_1008_POLICY_VIOLATION, "revoked": status.WS_1008_POLICY_VIOLATION}
+
+
+async def _send_loop(websocket: WebSocket, subscriber: Subscriber):
+    """将合并后的更新发送给客户端, 单次发送超过超时时间视为慢连接"""
+    while not subscriber.closed:
+        message = await subscriber.next_message(settings.PUSH_HEARTBEAT_SECONDS)
+        if subscriber.closed:
+            break
+        if message is None:
+            message = b'{"type":"ping"}'
+        try:
+            await asyncio.wait_for(websocket.send_text(message.decode()), settings.PUSH_SEND_TIMEOUT)
+        except (asyncio.TimeoutError, RuntimeError, WebSocketDisconnect):
+            break
+    push_gateway.disconnect(subscriber)
+    try:
+        await websocket.close(code=_CLOSE_CODES.get(subscriber.close_reason, status.WS_1013_TRY_AGAIN_LATER))
+    except RuntimeError:
+        pass
+
+
+async def _handle_command(subscriber: Subscriber, command: dict):
+    """
+    处理客户端的订阅命令:
+        {"action": "subscribe", "learners": ["..."]}
+        {"action": "subscribe", "class": {"college": "...", "major": "...", "grade": 2024}}
+        {"action": "unsubscribe", "learners": ["..."]}
+    """
+    action = command.get("action")
+    if action not in ("subscribe", "unsubscribe"):
+        subscriber.reply({"type": "error", "detail": f"Unknown action: {action}"})
+        return
+    try:
+        learners = await resolve_learners(subscriber.user, command.get("learners"), command.get("class"))
+    except (HTTPException, ValueError, TypeError, AttributeError) as e:
+        subscriber.reply({"type": "error", "detail": getattr(e, "detail", "Invalid subscription")})
+        return
+    if action == "subscribe":
+        count = push_gateway.subscribe(subscriber, learners)
+    else:
+        count = push_gateway.unsubscribe(subscriber, learners)
+    subscriber.reply({"type": "subscribed", "learners": count})
+
+
+@router.websocket("/ws")
+async def state_websocket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    学习者状态推送(WebSocket)。
+    使用 Authorization 头或 ``?token=`` 传递访问令牌, 连接后发送订阅命令,
+    服务器按状态计算周期推送 ``{"type": "state", "updates": [...]}``, 每个学习者只包含最新状态。
+    令牌过期或被撤销后服务器以 1008 关闭连接。
+    """
+    result = await authenticate(extract_token(websocket.headers.get("authorization"), token))
+    if result is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user, payload = result
+    subscriber = push_gateway.connect(user, payload)
+    if subscriber is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+    sender = asyncio.create_task(_send_loop(websocket, subscriber))
+    try:
+        while not subscriber.closed:
+            try:
+                command = json.loads(await websocket.receive_text())
+            except ValueError:
+                subscriber.reply({"type": "error", "detail": "Invalid JSON"})
+                continue
+            if isinstance(command, dict):
+                await _handle_command(subscriber, command)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        push_gateway.disconnect(subscriber)
+        sender.cancel()
+
+
+@router.get("/sse")
+async def state_events(
+        request: Request,
+        token: Optional[str] = Query(None),
+        learners: Optional[str] = Query(None, description="逗号分隔的学习者 ID"),
+        college: Optional[str] = Query(None),
+        major: Optional[str] = Query(None),
+        grade: Optional[int] = Query(None),
+):
+    """
+    学习者状态推送(Server-Sent Events), 用于不支持 WebSocket 的客户端。
+    订阅在连接时通过查询参数指定: 学习者列表, 或学院/专业/年级确定的班级。
+    令牌过期或被撤销后服务器结束事件流, 客户端需使用新令牌重新连接。
+    """
+    result = await authenticate(extract_token(request.headers.get("authorization"), token))
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    user, payload = result
+    class_filter = {"college": college, "major": major, "grade": grade} \
+        if any(value is not None for value in (college, major, grade)) else None
+    learner_ids = await resolve_learners(user, learners.split(",") if learners else None, class_filter)
+    subscriber = push_gateway.connect(user, payload)
+    if subscriber is None:
+        detail = "Too many push connections" if push_gateway.attached else "Learner state is not enabled"
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
+    push_gateway.subscribe(subscriber, learner_ids)
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while not subscriber.closed:
+                message = await subscriber.next_message(settings.PUSH_HEARTBEAT_SECONDS)
+                if subscriber.closed:
+                    break
+                yield b": ping\n\n" if message is None else b"data: " + message + b"\n\n"
+        finally:
+            push_gateway.disconnect(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # 关闭 NGINX 缓冲
+    })
@@ -0,0 +1,63 @@
+from fastapi import HTTPException, status
+
+from app.common.dao import UserDAO
+from app.common.schemas import Principal
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.modules.auth.services import introspect_token
+
+
+def extract_token(authorization: str | None, token: str | None) -> str | None:
+    """
+    从 Authorization 头或查询参数中取出访问令牌。
+    浏览器的 WebSocket 与 EventSource 无法设置请求头, 因此也接受 ``?token=``。
+    """
+    if authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            return credentials
+    return token or None
+
+
+async def authenticate(token: str | None) -> tuple[Principal, dict] | None:
+    """
+    验证访问令牌。
+    长连接不持有数据库会话, 仅在需要时使用短会话(令牌版本未变化时 introspect_token 不访问数据库)。
+    :return: (Principal, JWT 负载), 令牌无效时返回 None; 负载用于在连接期间检查过期和撤销
+    """
+    if not token:
+        return None
+    async for db in get_read_db():
+        return await introspect_token(token, db)
+
+
+def can_watch_others(user: Principal) -> bool:
+    return user.is_admin or user.has_role("TEACHER")
+
+
+async def resolve_learners(user: Principal, learners: list[str] = None, class_filter: dict = None) -> list[str]:
+    """
+    解析订阅请求中的学习者。
+    :param user: 当前用户, 教师和管理员可以订阅任意学习者, 其他用户只能订阅自己
+    :param learners: 学习者 ID 列表
+    :param class_filter: 班级, 即学院(college)、专业(major)、年级(grade)的组合
+    :return: 学习者 ID 列表
+    """
+    learners = [str(learner_id) for learner_id in learners or []]
+    if not can_watch_others(user):
+        if class_filter or any(learner_id != user.user_id for learner_id in learners):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to watch other learners")
+        return learners
+    if class_filter:
+        if not any(class_filter.get(key) is not None for key in ("college", "major", "grade")):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty class filter")
+        grade = class_filter.get("grade")
+        async for db in get_read_db():
+            learners += await UserDAO.get_student_ids(
+                db,
+                college=class_filter.get("college"),
+                major=class_filter.get("major"),
+                grade=int(grade) if grade is not None else None,
+                limit=settings.PUSH_MAX_LEARNERS_PER_CONNECTION,
+            )
+    return learners
@@ -0,0 +1,220 @@
+import re
+from functools import lru_cache
+
+# RabbitMQ 权限在 permissions.perm_name 中的编码格式:
+#   mq:vhost:<vhost 模式>
+#   mq:<configure|write|read>:<exchange|queue>:<名称模式>              名称模式中 * 匹配任意字符
+#   mq:topic:<write|read>:<exchange 模式>:<routing key 模式>          routing key 中 * 匹配一个单词, # 匹配零或多个单词
+# 所有模式均支持 {username} 占位符, 匹配时替换为当前用户名。
+PERM_PREFIX = "mq:"
+USERNAME_PLACEHOLDER = "{username}"
+_USERNAME_MARK = "\x00"  # 编译后正则中 {username} 的占位标记
+
+RESOURCE_PERMISSIONS = ("configure", "write", "read")
+RESOURCE_TYPES = ("exchange", "queue")
+TOPIC_PERMISSIONS = ("write", "read")
+
+
+def _compile_segments(pattern: str, convert) -> str:
+    """将模式按 {username} 切分, 分别转换为正则后以占位标记拼接"""
+    return _USERNAME_MARK.join(convert(part) for part in pattern.split(USERNAME_PLACEHOLDER))
+
+
+def _glob_to_regex(pattern: str) -> str:
+    return _compile_segments(pattern, lambda part: ".*".join(re.escape(p) for p in part.split("*")))
+
+
+def _topic_to_regex(pattern: str) -> str:
+    """将 AMQP topic 绑定模式转换为正则"""
+    words = pattern.split(".")
+    if words == ["#"]:
+        return ".*"
+    regex = ""
+    for i, word in enumerate(words):
+        if word == "#":
+            regex += r"(?:[^.]*\.)*" if i == 0 else r"(?:\.[^.]*)*"
+            continue
+        if i > 0 and not (i == 1 and words[0] == "#"):
+            regex += r"\."
+        if word == "*":
+            regex += "[^.]*"
+        else:
+            regex += _compile_segments(word, re.escape)
+    return regex
+
+
+@lru_cache(maxsize=65536)
+def _compile_for_user(source: str, username: str) -> re.Pattern:
+    return re.compile(source.replace(_USERNAME_MARK, re.escape(username)))
+
+
+class _RuleSet:
+    """同一角色、同一类操作的一组规则: 不含占位符的规则合并为一个正则, 含占位符的按用户编译"""
+
+    __slots__ = ("_static_sources", "_user_sources", "_static")
+
+    def __init__(self):
+        self._static_sources: list[str] = []
+        self._user_sources: list[str] = []
+        self._static: re.Pattern | None = None
+
+    def add(self, source: str):
+        if _USERNAME_MARK in source:
+            self._user_sources.append(source)
+        else:
+            self._static_sources.append(source)
+
+    def compile(self):
+        if self._static_sources:
+            self._static = re.compile("|".join(f"(?:{source})" for source in self._static_sources))
+
+    def match(self, value: str, username: str) -> bool:
+        if self._static is not None and self._static.fullmatch(value):
+            return True
+        for source in self._user_sources:
+            if _compile_for_user(source, username).fullmatch(value):
+                return True
+        return False
+
+
+class _TopicRuleSet:
+    """topic 规则: 先匹配 exchange, 再匹配 routing key"""
+
+    __slots__ = ("_rules",)
+
+    def __init__(self):
+        self._rules: list[tuple[str, str]] = []
+
+    def add(self, exchange_source: str, routing_key_source: str):
+        self._rules.append((exchange_source, routing_key_source))
+
+    def compile(self):
+        pass
+
+    def match(self, exchange: str, routing_key: str, username: str) -> bool:
+        for exchange_source, routing_key_source in self._rules:
+            if (_compile_for_user(exchange_source, username).fullmatch(exchange)
+                    and _compile_for_user(routing_key_source, username).fullmatch(routing_key)):
+                return True
+        return False
+
+
+class CompiledRole:
+    """单个角色预编译后的 RabbitMQ 权限"""
+
+    __slots__ = ("is_admin", "vhosts", "resources", "topics")
+
+    def __init__(self, role_name: str):
+        # 与认证逻辑保持一致, 名称中包含 ADMIN 的角色拥有全部权限
+        self.is_admin = "ADMIN" in role_name
+        self.vhosts = _RuleSet()
+        self.resources = {
+            (resource, permission): _RuleSet()
+            for resource in RESOURCE_TYPES for permission in RESOURCE_PERMISSIONS
+        }
+        self.topics = {permission: _TopicRuleSet() for permission in TOPIC_PERMISSIONS}
+
+    def add(self, perm_name: str) -> bool:
+        """解析并添加一条权限, 非 RabbitMQ 权限或格式不正确时返回 False"""
+        if not perm_name or not perm_name.startswith(PERM_PREFIX):
+            return False
+        parts = perm_name[len(PERM_PREFIX):].split(":")
+        if len(parts) == 2 and parts[0] == "vhost":
+            self.vhosts.add(_glob_to_regex(parts[1]))
+            return True
+        if len(parts) == 3 and (parts[1], parts[0]) in self.resources:
+            self.resources[(parts[1], parts[0])].add(_glob_to_regex(parts[2]))
+            return True
+        if len(parts) == 4 and parts[0] == "topic" and parts[1] in self.topics:
+            self.topics[parts[1]].add(_glob_to_regex(parts[2]), _topic_to_regex(parts[3]))
+            return True
+        return False
+
+    def compile(self):
+        self.vhosts.compile()
+        for rule_set in self.resources.values():
+            rule_set.compile()
+        for rule_set in self.topics.values():
+            rule_set.compile()
+
+
+class PermissionMatcher:
+    """
+    RabbitMQ 权限匹配器。
+    将 角色 -> 权限 关系预编译为按操作类型索引的正则, 用户角色在首次查询后缓存,
+    使 vhost/resource/topic 授权回调无需每次访问数据库。
+    """
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._roles: dict[str, CompiledRole] = {}
+        self._user_roles: dict[str, tuple[CompiledRole, ...]] = {}
+        self.fingerprint = None  # 当前规则对应的角色权限表指纹
+        self.user_fingerprint = None  # 当前用户角色缓存对应的用户角色表指纹
+
+    @property
+    def loaded(self) -> bool:
+        return self.fingerprint is not None
+
+    def build(self, role_permissions, fingerprint):
+        """
+        根据 (role_name, perm_name) 列表重建规则。
+        :param role_permissions: (role_name, perm_name) 序列
+        :param fingerprint: 对应的角色权限表指纹
+        """
+        roles: dict[str, CompiledRole] = {}
+        for role_name, perm_name in role_permissions:
+            role = roles.get(role_name)
+            if role is None:
+                role = roles[role_name] = CompiledRole(role_name)
+            role.add(perm_name)
+        for role in roles.values():
+            role.compile()
+        self._roles = roles
+        self._user_roles.clear()
+        self.fingerprint = fingerprint
+
+    def get_user_roles(self, username: str) -> tuple[CompiledRole, ...] | None:
+        return self._user_roles.get(username)
+
+    def set_user_roles(self, username: str, role_names) -> tuple[CompiledRole, ...]:
+        if len(self._user_roles) >= self.max_users:
+            self._user_roles.clear()
+        roles = tuple(self._roles[name] for name in role_names if name in self._roles)
+        self._user_roles[username] = roles
+        return roles
+
+    def invalidate_user(self, username: str):
+        self._user_roles.pop(username, None)
+
+    def reset_users(self, user_fingerprint=None):
+        self._user_roles.clear()
+        self.user_fingerprint = user_fingerprint
+
+    @staticmethod
+    def check_vhost(roles, username: str, vhost: str) -> bool:
+        return any(role.is_admin or role.vhosts.match(vhost, username) for role in roles)
+
+    @staticmethod
+    def check_resource(roles, username: str, resource: str, name: str, permission: str) -> bool:
+        key = (resource, permission)
+        for role in roles:
+            if role.is_admin:
+                return True
+            rule_set = role.resources.get(key)
+            if rule_set is not None and rule_set.match(name, username):
+                return True
+        return False
+
+    @staticmethod
+    def check_topic(roles, username: str, exchange: str, routing_key: str, permission: str) -> bool:
+        for role in roles:
+            if role.is_admin:
+                return True
+            rule_set = role.topics.get(permission)
+            if rule_set is not None and rule_set.match(exchange, routing_key, username):
+                return True
+        return False
+
+
+permission_matcher = PermissionMatcher()
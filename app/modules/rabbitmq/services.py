@@ -0,0 +1,102 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.dao import PermissionDAO
+from app.core.cache import broker_credential_cache
+from app.core.database import get_db
+from app.core.singleflight import SingleFlight
+from app.modules.auth.services import authenticate_user, check_login_throttle, record_login_failure, \
+    record_login_success
+from app.modules.rabbitmq.permissions import permission_matcher
+
+
+# 设备批量重连时 broker 会并发发送大量相同的认证回调, 相同凭据的校验只执行一次
+_broker_auth_flights = SingleFlight("rabbitmq_auth_user")
+
+
+async def authenticate_broker_user(username: str, password: str, db: AsyncSession = Depends(get_db)):
+    """
+    RabbitMQ 用户认证。
+    验证成功的结果会在内存中短暂缓存, 设备批量重连时无需重复进行 Argon2 校验和数据库查询;
+    缓存未命中时, 相同凭据的并发回调合并为一次校验(键为用户名和密码的 HMAC, 不同密码不会共享结果)。
+    :param username: 用户名(即 user_id)
+    :param password: 用户密码
+    :param db: 数据库会话
+    :return: "allow management"、"allow" 或 "deny"
+    """
+    decision = broker_credential_cache.get(username, password)
+    if decision:
+        return decision
+
+    # 回调请求来自 broker, 只能按账号限流; 被限流的设备直接拒绝, 不进行密码哈希
+    if check_login_throttle("rabbitmq", None, username) is not None:
+        return "deny"
+    return await _broker_auth_flights.do(
+        broker_credential_cache.key(username, password),
+        lambda: _verify_broker_user(username, password, db),
+    )
+
+
+async def _verify_broker_user(username: str, password: str, db: AsyncSession):
+    """校验凭据并缓存成功的结果; 合并的并发回调只计一次失败"""
+    user = await authenticate_user(user_id=username, password=password, db=db)
+    if not user:
+        await record_login_failure(None, username)
+        return "deny"
+    await record_login_success(username)
+
+    # 认证时已加载用户角色, 顺带写入权限匹配器, 后续授权回调无需再查询
+    if permission_matcher.loaded:
+        permission_matcher.set_user_roles(username, user.roles)
+    if user.is_admin:
+        # 如果是管理员，允许访问和管理
+        decision = "allow management"
+    else:
+        # 普通用户, 允许有限访问
+        decision = "allow"
+    # 版本与密码哈希在同一次查询中读取, 此后的禁用/改密/改角色都会使该条目失效
+    broker_credential_cache.put(username, password, decision, user.token_version)
+    return decision
+
+
+async def refresh_permissions(db: AsyncSession = Depends(get_db), force: bool = False):
+    """
+    检查权限相关表是否发生变化, 如有变化则重建权限匹配器或清空用户角色缓存。
+    :param db: 数据库会话
+    :param force: 是否无条件重建
+    """
+    role_fingerprint, user_fingerprint = await PermissionDAO.get_fingerprint(db)
+    if force or role_fingerprint != permission_matcher.fingerprint:
+        permission_matcher.build(await PermissionDAO.get_role_permissions(db), role_fingerprint)
+        permission_matcher.reset_users(user_fingerprint)
+    elif user_fingerprint != permission_matcher.user_fingerprint:
+        permission_matcher.reset_users(user_fingerprint)
+
+
+async def _get_user_roles(username: str, db: AsyncSession):
+    if not permission_matcher.loaded:
+        await refresh_permissions(db)
+    roles = permission_matcher.get_user_roles(username)
+    if roles is None:
+        roles = permission_matcher.set_user_roles(username, await PermissionDAO.get_role_names_by_user_id(db, username))
+    return roles
+
+
+async def authorize_vhost(username: str, vhost: str, db: AsyncSession = Depends(get_db)):
+    """RabbitMQ vhost 访问授权"""
+    roles = await _get_user_roles(username, db)
+    return permission_matcher.check_vhost(roles, username, vhost)
+
+
+async def authorize_resource(username: str, resource: str, name: str, permission: str,
+                             db: AsyncSession = Depends(get_db)):
+    """RabbitMQ exchange/queue 资源访问授权"""
+    roles = await _get_user_roles(username, db)
+    return permission_matcher.check_resource(roles, username, resource, name, permission)
+
+
+async def authorize_topic(username: str, name: str, routing_key: str, permission: str,
+                          db: AsyncSession = Depends(get_db)):
+    """RabbitMQ topic 访问授权"""
+    roles = await _get_user_roles(username, db)
+    return permission_matcher.check_topic(roles, username, name, routing_key, permission)
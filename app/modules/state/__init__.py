@@ -0,0 +1 @@
+from app.modules.state.engine import state_engine
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModalitySpec:
+    """单个模态的窗口配置"""
+    name: str
+    channels: int  # 保留的通道数, 更多的通道被截断, 更少的通道补 0
+    nominal_rate: float  # 标称采样率(Hz), 用于换算窗口长度和判断信号丢失
+    window_seconds: float  # 滑动窗口长度(秒)
+    # 对滑动窗口均值的阈值: 特征名 -> (下限, 上限), None 表示不检查
+    thresholds: dict[str, tuple[float | None, float | None]] = field(default_factory=dict)
+
+    @property
+    def window(self) -> int:
+        return max(1, int(round(self.nominal_rate * self.window_seconds)))
+
+    @property
+    def rate_horizon(self) -> float:
+        """估计采样率的时间常数(秒): 与滑动窗口一致, 且至少包含几个标称采样周期, 低采样率或成批到达的数据不会误判丢失"""
+        return max(self.window_seconds, 4 / self.nominal_rate)
+
+
+DEFAULT_SPECS = (
+    ModalitySpec("eeg", channels=16, nominal_rate=256, window_seconds=1.0),
+    ModalitySpec("hr", channels=1, nominal_rate=1, window_seconds=30.0, thresholds={"mean": (45.0, 120.0)}),
+    ModalitySpec("eda", channels=1, nominal_rate=4, window_seconds=10.0),
+    ModalitySpec("eye", channels=3, nominal_rate=60, window_seconds=2.0),
+    ModalitySpec("imu", channels=6, nominal_rate=50, window_seconds=2.0),
+)
+
+
+@dataclass
+class WindowFeatures:
+    """一次计算得到的某个模态所有活跃学习者的特征, 各数组的第一维与 user_ids 对应"""
+    modality: str
+    user_ids: list[str]
+    mean: np.ndarray  # (N, C) 滑动窗口均值
+    var: np.ndarray  # (N, C) 滑动窗口方差
+    tumbling_mean: np.ndarray  # (N, C) 本周期内新样本的均值, 无新样本时为 NaN
+    rate: np.ndarray  # (N,) 最近 rate_horizon 秒内的平均采样率(Hz), 指数加权
+    fill: np.ndarray  # (N,) 窗口填充比例
+    low: np.ndarray  # (N,) 均值低于阈值下限
+    high: np.ndarray  # (N,) 均值高于阈值上限
+    signal_loss: np.ndarray  # (N,) 采样率低于标称值的一半
+
+
+class ModalityWindow:
+    """
+    某个模态所有学习者的环形缓冲区。
+    样本保存在预分配的 (slots, window, channels) 数组中, 每个学习者占用一个 slot, 内存占用在创建时确定。
+    写入时同步更新每个窗口的和与平方和(加上新样本、减去被覆盖的旧样本),
+    特征计算只需对 (slots, channels) 的累加值做一次向量化运算, 不需要遍历窗口。
+    """
+
+    def __init__(self, spec: ModalitySpec, slots: int):
+        self.spec = spec
+        self.slots = slots
+        window, channels = spec.window, spec.channels
+        self.buffer = np.zeros((slots, window, channels), dtype=np.float32)
+        self.position = np.zeros(slots, dtype=np.int64)  # 下一个写入位置
+        self.count = np.zeros(slots, dtype=np.int64)  # 窗口中的样本数(不超过 window)
+        self.last_seen = np.zeros(slots, dtype=np.float64)  # 最近一次写入的 monotonic 时间
+        # 滑动窗口内样本的和与平方和, 未写入的位置为 0, 不影响累加
+        self.window_sum = np.zeros((slots, channels), dtype=np.float64)
+        self.window_squares = np.zeros((slots, channels), dtype=np.float64)
+        # 滚动窗口(两次计算之间)的累加值
+        self.tumbling_sum = np.zeros((slots, channels), dtype=np.float64)
+        self.tumbling_count = np.zeros(slots, dtype=np.int64)
+        # 采样率的指数加权平均及其权重(从 0 增长到 1), 两者相除修正学习者刚出现时的偏差
+        self.rate_average = np.zeros(slots, dtype=np.float64)
+        self.rate_weight = np.zeros(slots, dtype=np.float64)
+        self.active = np.zeros(slots, dtype=bool)
+        self.user_ids: list[str | None] = [None] * slots
+        self._slot_of: dict[str, int] = {}
+        self._free = list(range(slots - 1, -1, -1))
+        self.dropped = 0  # slot 用尽时丢弃的帧数
+
+        low = np.full(channels, -np.inf)
+        high = np.full(channels, np.inf)
+        if "mean" in spec.thresholds:
+            lower, upper = spec.thresholds["mean"]
+            low[:] = -np.inf if lower is None else lower
+            high[:] = np.inf if upper is None else upper
+        self._low, self._high = low, high
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def _slot(self, user_id: str, now: float, idle_seconds: float) -> int | None:
+        slot = self._slot_of.get(user_id)
+        if slot is not None:
+            return slot
+        if not self._free and self.evict_idle(now, idle_seconds) == 0:
+            return None
+        slot = self._free.pop()
+        self._slot_of[user_id] = slot
+        self.user_ids[slot] = user_id
+        self.active[slot] = True
+        self.last_seen[slot] = now
+        return slot
+
+    def push(self, frames: list[tuple[str, np.ndarray]], now: float, idle_seconds: float):
+        """
+        批量写入一组数据帧。
+        :param frames: (user_id, 样本数组) 列表, 样本数组形状为 (采样点, 通道)
+        :param now: 当前 monotonic 时间
+        :param idle_seconds: slot 用尽时可驱逐的空闲时间
+        """
+        window, channels = self.spec.window, self.spec.channels
+        slots, blocks = [], []
+        for user_id, samples in frames:
+            slot = self._slot(user_id, now, idle_seconds)
+            if slot is None:
+                self.dropped += 1
+                continue
+            if samples.shape[1] != channels:
+                block = np.zeros((len(samples), channels), dtype=np.float32)
+                width = min(channels, samples.shape[1])
+                block[:, :width] = samples[:, :width]
+                samples = block
+            slots.append(slot)
+            blocks.append(samples)
+        if not blocks:
+            return
+
+        samples = np.concatenate(blocks)
+        lengths = np.fromiter((len(block) for block in blocks), dtype=np.int64, count=len(blocks))
+        sample_slots = np.repeat(np.asarray(slots, dtype=np.int64), lengths)
+
+        # 按 slot 稳定排序, 同一 slot 的样本保持到达顺序并连续排列
+        order = np.argsort(sample_slots, kind="stable")
+        sorted_slots = sample_slots[order]
+        unique_slots, starts, totals = np.unique(sorted_slots, return_index=True, return_counts=True)
+        samples = samples[order].astype(np.float64)
+
+        # 滚动窗口累加所有新样本
+        self.tumbling_sum[unique_slots] += np.add.reduceat(samples, starts, axis=0)
+        self.tumbling_count[unique_slots] += totals
+
+        # 每个 slot 只需写入最后 window 个样本, 避免同一位置被重复赋值
+        rank = np.arange(len(order)) - np.repeat(starts, totals)
+        keep = rank >= np.repeat(totals, totals) - window
+        if not keep.all():
+            sorted_slots, rank, samples = sorted_slots[keep], rank[keep], samples[keep]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+        offsets = (self.position[sorted_slots] + rank) % window
+        old = self.buffer[sorted_slots, offsets].astype(np.float64)
+        self.window_sum[unique_slots] += np.add.reduceat(samples - old, starts, axis=0)
+        self.window_squares[unique_slots] += np.add.reduceat(np.square(samples) - np.square(old), starts, axis=0)
+        self.buffer[sorted_slots, offsets] = samples
+
+        self.position[unique_slots] = (self.position[unique_slots] + totals) % window
+        self.count[unique_slots] = np.minimum(self.count[unique_slots] + totals, window)
+        self.last_seen[unique_slots] = now
+
+    def evict_idle(self, now: float, idle_seconds: float) -> int:
+        """释放空闲超过 idle_seconds 的 slot, 返回释放数量"""
+        idle = np.flatnonzero(self.active & (now - self.last_seen > idle_seconds))
+        for slot in idle.tolist():
+            del self._slot_of[self.user_ids[slot]]
+            self.user_ids[slot] = None
+            self._free.append(slot)
+        if len(idle):
+            self.active[idle] = False
+            self.position[idle] = 0
+            self.count[idle] = 0
+            self.buffer[idle] = 0
+            self.window_sum[idle] = 0
+            self.window_squares[idle] = 0
+            self.tumbling_sum[idle] = 0
+            self.tumbling_count[idle] = 0
+            self.rate_average[idle] = 0
+            self.rate_weight[idle] = 0
+        return len(idle)
+
+    def compute(self, elapsed: float) -> WindowFeatures | None:
+        """
+        计算所有活跃学习者的特征并重置滚动窗口。
+        :param elapsed: 距上次计算的时间(秒), 用于更新采样率的加权平均
+        """
+        active = np.flatnonzero(self.active & (self.count > 0))
+        if not len(active):
+            return None
+        count = self.count[active]
+        n = count[:, None].astype(np.float64)
+        mean = self.window_sum[active] / n
+        var = np.maximum(self.window_squares[active] / n - np.square(mean), 0)
+
+        tumbling_count = self.tumbling_count[active]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tumbling_mean = self.tumbling_sum[active] / tumbling_count[:, None]
+        # 单个计算周期(100 ms)通常短于低采样率模态的采样间隔, 按周期计算的采样率会在 0 和突发值之间跳动,
+        # 因此对每个周期的采样率做时间常数为 rate_horizon 的指数加权平均
+        if elapsed > 0:
+            alpha = -np.expm1(-elapsed / self.spec.rate_horizon)
+            self.rate_average[active] += alpha * (tumbling_count / elapsed - self.rate_average[active])
+            self.rate_weight[active] += alpha * (1 - self.rate_weight[active])
+        weight = self.rate_weight[active]
+        rate = np.divide(self.rate_average[active], weight, out=np.zeros(len(active)), where=weight > 0)
+        self.tumbling_sum[active] = 0
+        self.tumbling_count[active] = 0
+
+        return WindowFeatures(
+            modality=self.spec.name,
+            user_ids=[self.user_ids[slot] for slot in active.tolist()],
+            mean=mean,
+            var=var,
+            tumbling_mean=tumbling_mean,
+            rate=rate,
+            fill=count / self.spec.window,
+            low=(mean < self._low).any(axis=1),
+            high=(mean > self._high).any(axis=1),
+            signal_loss=rate < self.spec.nominal_rate / 2,
+        )
+
+
+class LearnerStateEngine:
+    """
+    学习者状态计算引擎。
+    接收 RabbitMQ 消费者解码后的数据帧, 按模态写入环形缓冲区,
+    并以固定周期对所有活跃学习者批量计算窗口特征, 将结果交给订阅者(如推送网关)。
+    """
+
+    def __init__(self, specs=DEFAULT_SPECS, max_learners: int = 2048, idle_seconds: float = 30.0):
+        self.idle_seconds = idle_seconds
+        self.windows = {spec.name: ModalityWindow(spec, max_learners) for spec in specs}
+        self._subscribers: list[Callable[[dict[str, WindowFeatures]], None]] = []
+        self._last_tick = time.monotonic()
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, callback: Callable[[dict[str, WindowFeatures]], None]):
+        """注册特征计算结果的回调, 回调在事件循环中同步执行, 不应阻塞"""
+        self._subscribers.append(callback)
+
+    def feed(self, frames):
+        """
+        写入一批已校验的数据帧。
+        :param frames: (user_id, modality, SensorFrame) 序列
+        """
+        grouped: dict[str, list[tuple[str, np.ndarray]]] = {}
+        for user_id, modality, frame in frames:
+            if modality in self.windows:
+                grouped.setdefault(modality, []).append((user_id, np.asarray(frame.data, dtype=np.float32)))
+        now = time.monotonic()
+        for modality, items in grouped.items():
+            self.windows[modality].push(items, now, self.idle_seconds)
+
+    def tick(self) -> dict[str, WindowFeatures]:
+        """计算所有模态的特征, 驱逐空闲的学习者"""
+        now = time.monotonic()
+        elapsed, self._last_tick = now - self._last_tick, now
+        results = {}
+        for modality, window in self.windows.items():
+            window.evict_idle(now, self.idle_seconds)
+            features = window.compute(elapsed)
+            if features is not None:
+                results[modality] = features
+        return results
+
+    def stats(self) -> dict:
+        return {
+            modality: {
+                "learners": len(window),
+                "slots": window.slots,
+                "window": window.spec.window,
+                "dropped_frames": window.dropped,
+                "memory_bytes": window.buffer.nbytes,
+            }
+            for modality, window in self.windows.items()
+        }
+
+    def start(self, interval: float):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                results = self.tick()
+                for callback in self._subscribers:
+                    callback(results)
+            except Exception:
+                logger.exception("Learner state tick failed")
+
+
+state_engine = LearnerStateEngine(
+    max_learners=settings.STATE_MAX_LEARNERS,
+    idle_seconds=settings.STATE_IDLE_SECONDS,
+)
@@ -0,0 +1 @@
+from app.modules.stream.routes import router as stream_router
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.schemas import StreamCallback
+from app.core.database import get_read_db
+from app.modules.stream.services import authorize_stream
+
+router = APIRouter()
+
+
+# https://ossrs.io/lts/en-us/docs/v5/doc/http-callback
+# 返回 HTTP 200 且 code 为 0 时允许, 其他 code 时流媒体服务器断开客户端
+
+def _decision(allowed: bool) -> dict:
+    return {"code": 0} if allowed else {"code": 403, "msg": "forbidden"}
+
+
+@router.post("/on_connect")
+async def on_connect(callback: StreamCallback, db: AsyncSession = Depends(get_read_db)):
+    """流媒体客户端连接认证"""
+    return _decision(await authorize_stream("on_connect", callback, db=db))
+
+
+@router.post("/on_publish")
+async def on_publish(callback: StreamCallback, db: AsyncSession = Depends(get_read_db)):
+    """推流授权, 学习者设备只能推送自己的流"""
+    return _decision(await authorize_stream("on_publish", callback, db=db))
+
+
+@router.post("/on_play")
+async def on_play(callback: StreamCallback, db: AsyncSession = Depends(get_read_db)):
+    """播放授权, 学习者只能播放自己的流, 教师和管理员可以播放学习者的流"""
+    return _decision(await authorize_stream("on_play", callback, db=db))
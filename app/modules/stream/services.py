@@ -0,0 +1,89 @@
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.schemas import Principal, StreamCallback
+from app.core.cache import stream_decision_cache
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.core.metrics import stream_auth_decisions
+from app.modules.auth.services import introspect_token
+from app.modules.push.services import can_watch_others
+
+_decision_outcomes = {
+    (action, decision, source): stream_auth_decisions.labels(action, decision, source)
+    for action in ("on_connect", "on_publish", "on_play") for decision in ("allow", "deny")
+    for source in ("cache", "token")
+}
+
+def extract_stream_token(callback: StreamCallback) -> str | None:
+    """
+    从回调中取出访问令牌。
+    推流/播放地址形如 rtmp://host/live/<user_id>?token=<访问令牌>, 令牌在 param 中;
+    on_connect 回调的 param 可能为空, 此时从 tcUrl 的查询参数中读取。
+    """
+    for query in (callback.param, urlsplit(callback.tc_url).query):
+        tokens = parse_qs(query.lstrip("?")).get("token")
+        if tokens and tokens[0]:
+            return tokens[0]
+    return None
+
+
+def stream_owner(stream: str) -> str:
+    """流的所属用户, 流名为 <user_id> 或 <user_id>.<轨道>(同一设备的多路流, 如 camera、screen)"""
+    return stream.split(".", 1)[0]
+
+
+def is_stream_allowed(user: Principal, action: str, app: str, stream: str) -> bool:
+    """
+    推流/播放授权。
+    - on_connect: 令牌有效即可连接, 具体的流在 on_publish/on_play 中检查;
+    - on_publish: 只能向学习者应用中自己的流推流;
+    - on_play: 可以播放自己的流, 教师和管理员可以播放任意学习者的流(与学习者状态订阅的规则一致)。
+    """
+    if action == "on_connect":
+        return True
+    if app != settings.STREAM_APP or not stream:
+        return False
+    if action == "on_publish":
+        return stream_owner(stream) == user.user_id
+    if action == "on_play":
+        return stream_owner(stream) == user.user_id or can_watch_others(user)
+    return False
+
+
+async def authorize_stream(action: str, callback: StreamCallback, db: AsyncSession = Depends(get_read_db)):
+    """
+    流媒体服务器回调授权。
+    结果按 (令牌, 动作, 流地址) 缓存, 断线重连和同一会话的多路流不再重复解码令牌或访问数据库;
+    允许的结果缓存时间不超过令牌的剩余有效期, 用户被禁用或角色变更时随用户失效。
+    :param action: 回调动作, on_connect / on_publish / on_play
+    :param callback: 回调请求体
+    :param db: 数据库会话
+    :return: 是否允许
+    """
+    token = extract_stream_token(callback)
+    if not token:
+        _decision_outcomes[(action, "deny", "token")].inc()
+        return False
+
+    key = stream_decision_cache.key(token, action, callback.vhost, callback.app, callback.stream)
+    decision = stream_decision_cache.lookup(key)
+    if decision is not None:
+        _decision_outcomes[(action, decision, "cache")].inc()
+        return decision == "allow"
+
+    result = await introspect_token(token, db)
+    if result is None:
+        # 无效令牌的重连同样缓存, 不再重复解码
+        decision, user_id, ttl, version = "deny", None, None, None
+    else:
+        user, payload = result
+        allowed = is_stream_allowed(user, action, callback.app, callback.stream)
+        decision, user_id, ttl = "allow" if allowed else "deny", user.user_id, payload["exp"] - time.time()
+        version = payload.get("ver", 0)
+    stream_decision_cache.store(key, user_id, decision, ttl=ttl, version=version)
+    _decision_outcomes[(action, decision, "token")].inc()
+    return decision == "allow"
@@ -0,0 +1 @@
+from app.modules.system.routes import router as system_router
\ No newline at end of file
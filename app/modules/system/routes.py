@@ -0,0 +1,66 @@
+import hashlib
+import json
+
+from fastapi import APIRouter, Depends, Request, Response, status
+
+from app.common.schemas import Principal
+from app.core.config import settings
+from app.core.database.base import engine, pool_stats
+from app.core.database.replica import read_router
+from app.core.hasher import password_hasher
+from app.core.metrics import registry
+from app.core.security import token_keys
+from app.core.throttle import login_throttle
+from app.modules.auth.services import require_admin
+from app.modules.state import state_engine
+
+router = APIRouter()
+
+
+@router.get("/api/system/hasher")
+async def hasher_stats(admin: Principal = Depends(require_admin)):
+    """密码哈希执行器状态(队列深度、哈希耗时等), 仅管理员"""
+    return password_hasher.stats()
+
+
+@router.get("/api/system/throttle")
+async def login_throttle_stats(admin: Principal = Depends(require_admin)):
+    """登录限流状态(跟踪的 IP/账号数、封禁中的数量), 仅管理员"""
+    return login_throttle.stats()
+
+
+@router.get("/api/system/state")
+async def state_engine_stats(admin: Principal = Depends(require_admin)):
+    """学习者状态引擎状态(各模态的活跃学习者数、缓冲区大小等), 仅管理员"""
+    return state_engine.stats()
+
+
+@router.get("/api/system/database")
+async def database_stats(admin: Principal = Depends(require_admin)):
+    """
+    数据库连接池状态(当前 worker), 仅管理员。
+    连接获取等待时间见 /metrics 中的 db_pool_checkout_wait_seconds,
+    所有 worker 的 size + max_overflow 之和应小于 MySQL max_connections。
+    """
+    return {"workers": settings.WORKERS, "primary": pool_stats(engine), "replicas": read_router.stats()}
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 文本格式的运行指标(每个 worker 独立统计)"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """
+    令牌验证公钥(JWKS)。
+    边缘服务(流媒体服务器、NGINX、设备网关)缓存该文档后即可在本地验证令牌, 不需要回调本服务。
+    """
+    document = token_keys.jwks()
+    content = json.dumps(document, separators=(",", ":"))
+    etag = f'"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.JWKS_CACHE_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/jwk-set+json", headers=headers)
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.schemas import UserCreate
-from app.core.database import get_db
-from app.modules.users.services import create_student
+from app.common.schemas import UserCreate, UserPage, Principal, UserStatusUpdate, PasswordChange, RoleChange
+from app.common.schemas.user import StudentTypeEnum
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.responses import NegotiatedRoute
+from app.core.utils import get_client_ip
+from app.modules.auth.services import require_admin, get_current_user
+from app.modules.users.services import create_student, import_students, require_directory_access, list_students, \
+    export_students, set_user_status, verify_current_password, change_password, change_role
 
-router = APIRouter(prefix="/users")
+router = APIRouter(prefix="/users", route_class=NegotiatedRoute)
 
 
 @router.post("/student", response_model=dict, status_code=status.HTTP_201_CREATED)
@@ -16,3 +25,94 @@ async def create_student_endpoint(new_user: UserCreate, db: AsyncSession = Depen
         return {"message": "User created successfully", "user_id": created_user.user_id}
     except HTTPException as e:
         raise e
+
+
+@router.post("/students/import", response_model=dict)
+async def import_students_endpoint(request: Request, admin: Principal = Depends(require_admin),
+                                   db: AsyncSession = Depends(get_db)):
+    """
+    批量导入学生(仅管理员)。
+    请求体为 CSV(Content-Type: text/csv, 首行为表头) 或 NDJSON(Content-Type: application/x-ndjson),
+    每行一个学生, 字段与创建学生接口一致。
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "text/csv":
+        file_format = "csv"
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        file_format = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be text/csv or application/x-ndjson"
+        )
+    return await import_students(request.stream(), file_format, db, create_by=admin.user_id)
+
+
+def directory_filters(college: str | None = None, major: str | None = None, grade: int | None = None,
+                      stu_type: StudentTypeEnum | None = None):
+    """学生目录的筛选条件"""
+    return {"college": college, "major": major, "grade": grade, "stu_type": stu_type.value if stu_type else None}
+
+
+@router.get("/students", response_model=UserPage)
+async def list_students_endpoint(filters: dict = Depends(directory_filters), cursor: str | None = None,
+                                 limit: int = Query(50, ge=1, le=settings.USER_LIST_MAX_LIMIT),
+                                 user: Principal = Depends(require_directory_access),
+                                 db: AsyncSession = Depends(get_read_db)):
+    """
+    查询学生目录, 可按学院、专业、年级、学生类型筛选。
+    按 user_id 排序分页, 将响应中的 next_cursor 作为 cursor 参数获取下一页。
+    """
+    return await list_students(filters, cursor, limit, db)
+
+
+@router.get("/students/export")
+async def export_students_endpoint(filters: dict = Depends(directory_filters),
+                                   file_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                                   user: Principal = Depends(require_directory_access)):
+    """导出学生目录(NDJSON 或 CSV), 筛选条件同查询接口, 边查询边发送"""
+    media_type = "text/csv; charset=utf-8" if file_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_students(filters, file_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="students.{file_format}"'},
+    )
+
+
+def _user_not_found():
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+
+@router.put("/{user_id}/status", response_model=dict)
+async def set_user_status_endpoint(user_id: str, body: UserStatusUpdate, admin: Principal = Depends(require_admin),
+                                   db: AsyncSession = Depends(get_db)):
+    """启用或禁用用户(仅管理员), 禁用后该用户已签发的令牌和已缓存的凭据全部失效"""
+    if await set_user_status(user_id, body.status, db, update_by=admin.user_id) is None:
+        raise _user_not_found()
+    return {"message": "User status updated", "user_id": user_id, "status": body.status.value}
+
+
+@router.put("/{user_id}/password", response_model=dict)
+async def change_password_endpoint(request: Request, user_id: str, body: PasswordChange,
+                                   user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    修改密码。
+    修改自己的密码时需提供原密码(与登录共用限流); 管理员可以直接重置其他用户的密码。
+    修改后该用户已签发的令牌全部失效, 需要重新登录。
+    """
+    if user_id == user.user_id:
+        await verify_current_password(user_id, body.old_password, get_client_ip(request), db)
+    elif not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator role required")
+    if await change_password(user_id, body.new_password, db, update_by=user.user_id) is None:
+        raise _user_not_found()
+    return {"message": "Password changed", "user_id": user_id}
+
+
+@router.put("/{user_id}/role", response_model=dict)
+async def change_role_endpoint(user_id: str, body: RoleChange, admin: Principal = Depends(require_admin),
+                               db: AsyncSession = Depends(get_db)):
+    """修改用户角色(仅管理员), 携带旧角色的令牌全部失效"""
+    if await change_role(user_id, body.role_id, db, update_by=admin.user_id) is None:
+        raise _user_not_found()
+    return {"message": "User role updated", "user_id": user_id, "role_id": body.role_id}
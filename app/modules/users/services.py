@@ -1,9 +1,34 @@
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterator
+
+import orjson
 from fastapi import Depends, HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.common.schemas import UserCreate
-from app.core.database import get_db
+from app.common.schemas import UserCreate, UserResponse, Principal
+from app.common.schemas.user import StatusEnum
+from app.core.cache import broker_credential_cache, stream_decision_cache
+from app.core.config import settings
+from app.core.hasher import password_hasher
+from app.core.database import get_db, get_read_db
+from app.core.revocation import token_version_index
 from app.common.dao import UserDAO
+from app.core.throttle import retry_after
+from app.modules.auth.services import get_current_user, authenticate_user, check_login_throttle, \
+    record_login_failure, record_login_success
+from app.modules.push.services import can_watch_others
+from app.modules.rabbitmq.permissions import permission_matcher
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_FIELDS = list(UserResponse.model_fields)
+MAX_CSV_RECORD_LINES = 100  # 单条 CSV 记录最多跨越的行数, 防止未闭合的引号使整个文件成为一条记录
 
 
 async def create_student(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
@@ -18,3 +43,267 @@ async def create_student(user_data: UserCreate, db: AsyncSession = Depends(get_d
     new_user = await UserDAO.create_user(db, user_data, 3)
     return new_user
 
+
+async def _iter_lines(stream: AsyncIterator[bytes]):
+    """将字节流按行切分, 每行一条记录"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def _iter_csv_rows(stream: AsyncIterator[bytes]):
+    """
+    逐条解析 CSV 记录。
+    引号内的字段可以包含换行: 按行累积, 引号成对后才将完整的记录交给 csv 解析。
+    :return: 异步生成 (记录的起始行号, 字段列表或错误信息)
+    """
+    line_no = start = quotes = 0
+    pending: list[str] = []
+    async for line in _iter_lines(stream):
+        line_no += 1
+        if not pending:
+            start = line_no
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2 and len(pending) < MAX_CSV_RECORD_LINES:
+            continue
+        record, pending, quotes = "\n".join(pending), [], 0
+        if not record.strip():
+            continue
+        try:
+            yield start, next(csv.reader([record], strict=True))
+        except csv.Error:
+            yield start, "Invalid CSV record"
+    if pending:
+        yield start, "Invalid CSV record"
+
+
+async def _iter_records(stream: AsyncIterator[bytes], file_format: str):
+    """
+    逐条解析 CSV(首行为表头) 或 NDJSON 数据。
+    :return: 异步生成 (行号, 字段字典或错误信息)
+    """
+    if file_format == "csv":
+        header = None
+        async for line_no, values in _iter_csv_rows(stream):
+            if isinstance(values, str):
+                yield line_no, values
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            # CSV 中的空值视为未填写
+            yield line_no, {name: value for name, value in zip(header, values) if value != ""}
+        return
+
+    line_no = 0
+    async for line in _iter_lines(stream):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        yield line_no, record
+
+
+async def _import_chunk(chunk: list[tuple[int, UserCreate]], seen_user_ids: set[str], role_id: int,
+                        create_by: str, db: AsyncSession):
+    """导入一批用户: 一次 IN 查询检查是否存在, 并行计算哈希, 多行插入"""
+    results = []
+    existing = await UserDAO.get_existing_user_ids(db, [user.user_id for _, user in chunk])
+    accepted = []
+    for line_no, user in chunk:
+        if user.user_id in existing or user.user_id in seen_user_ids:
+            results.append({"line": line_no, "user_id": user.user_id, "status": "error",
+                            "detail": "Username already exists"})
+            continue
+        seen_user_ids.add(user.user_id)
+        accepted.append((line_no, user))
+
+    hashed_passwords = await password_hasher.hash_many([user.password for _, user in accepted])
+    users = [
+        {**user.model_dump(exclude={"password"}), "hashed_password": hashed_password}
+        for (_, user), hashed_password in zip(accepted, hashed_passwords)
+    ]
+    try:
+        await UserDAO.bulk_create_users(db, users, role_id, create_by)
+        results.extend({"line": line_no, "user_id": user.user_id, "status": "created"} for line_no, user in accepted)
+    except Exception as e:
+        # 数据库的错误信息不返回给客户端
+        logger.warning("Failed to import %d users: %s", len(accepted), e)
+        detail = "Duplicate user" if isinstance(e, IntegrityError) else "Invalid user data"
+        results.extend({"line": line_no, "user_id": user.user_id, "status": "error", "detail": detail}
+                       for line_no, user in accepted)
+    return results
+
+
+async def import_students(stream: AsyncIterator[bytes], file_format: str, db: AsyncSession = Depends(get_db),
+                          create_by: str = "sys_service"):
+    """
+    批量导入学生。
+    边读取边解析上传的 CSV/NDJSON 数据, 按批导入, 返回逐行结果。
+    :param stream: 请求体字节流
+    :param file_format: "csv" 或 "ndjson"
+    :param db: 数据库会话
+    :param create_by: 创建者(执行导入的管理员)
+    :return: 导入报告
+    """
+    results = []
+    chunk: list[tuple[int, UserCreate]] = []
+    seen_user_ids: set[str] = set()
+    async for line_no, record in _iter_records(stream, file_format):
+        if isinstance(record, str):
+            results.append({"line": line_no, "user_id": None, "status": "error", "detail": record})
+            continue
+        try:
+            chunk.append((line_no, UserCreate.model_validate(record)))
+        except ValidationError as e:
+            error = e.errors()[0]
+            detail = f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            results.append({"line": line_no, "user_id": record.get("user_id"), "status": "error", "detail": detail})
+            continue
+        if len(chunk) >= settings.USER_IMPORT_CHUNK_SIZE:
+            results.extend(await _import_chunk(chunk, seen_user_ids, 3, create_by, db))
+            chunk = []
+    if chunk:
+        results.extend(await _import_chunk(chunk, seen_user_ids, 3, create_by, db))
+
+    results.sort(key=lambda item: item["line"])
+    created = sum(1 for item in results if item["status"] == "created")
+    return {"total": len(results), "created": created, "failed": len(results) - created, "results": results}
+
+
+async def require_directory_access(user: Principal = Depends(get_current_user)):
+    """学生目录仅对教师和管理员开放"""
+    if not can_watch_others(user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to list learners")
+    return user
+
+
+async def list_students(filters: dict, cursor: str | None, limit: int, db: AsyncSession = Depends(get_read_db)):
+    """
+    分页查询学生目录。
+    :param filters: 筛选条件, 学院(college)、专业(major)、年级(grade)、学生类型(stu_type)
+    :param cursor: 上一页返回的 next_cursor, None 表示第一页
+    :param limit: 每页条数
+    :param db: 数据库会话
+    :return: {"items": [...], "next_cursor": ...}
+    """
+    # 多取一行判断是否还有下一页
+    rows = await UserDAO.list_students(db, **filters, after=cursor, limit=limit + 1)
+    next_cursor = rows[limit - 1]["user_id"] if len(rows) > limit else None
+    return {"items": [dict(row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+
+def _encode_rows(rows, file_format: str) -> bytes:
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row.values()])
+        return buffer.getvalue().encode("utf-8")
+    return b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+
+
+async def export_students(filters: dict, file_format: str):
+    """
+    导出学生目录。
+    响应开始发送后才执行查询, 因此使用独立的数据库会话; 通过服务端游标逐批读取并写出,
+    导出全部学生时内存占用也只与每批的行数有关。
+    :param filters: 筛选条件, 同 list_students
+    :param file_format: "csv"(首行为表头) 或 "ndjson"
+    :return: 异步生成响应体分块
+    """
+    if file_format == "csv":
+        yield (",".join(DIRECTORY_FIELDS) + "\n").encode("utf-8")
+    async for db in get_read_db():
+        async for rows in UserDAO.stream_students(db, **filters, batch_size=settings.USER_EXPORT_BATCH_SIZE):
+            yield _encode_rows(rows, file_format)
+
+
+async def set_user_status(user_id: str, user_status: StatusEnum, db: AsyncSession = Depends(get_db),
+                          update_by: str = "sys_service"):
+    """
+    启用或禁用用户, 并使该用户已缓存的凭据和已签发的令牌失效。
+    其他 worker 通过同步的令牌版本在一个同步间隔内使各自的缓存失效。
+    :return: 新的令牌版本, 用户不存在时返回 None
+    """
+    version = await UserDAO.update_status(db, user_id, user_status.value, update_by)
+    if version is not None:
+        _invalidate_user(user_id, version)
+    return version
+
+
+async def verify_current_password(user_id: str, password: str | None, ip: str, db: AsyncSession = Depends(get_db)):
+    """
+    修改自己的密码前校验原密码。
+    与 /auth/token 使用相同的登录限流(按账号和客户端 IP), 不能借此绕过限流猜测密码。
+    :param user_id: 用户 ID
+    :param password: 原密码
+    :param ip: 客户端 IP
+    :param db: 数据库会话
+    """
+    wait = check_login_throttle("password", ip, user_id)
+    if wait is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password attempts",
+            headers={"Retry-After": retry_after(wait)},
+        )
+    if not password or not await authenticate_user(user_id, password, db):
+        await record_login_failure(ip, user_id)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Incorrect password")
+    await record_login_success(user_id)
+
+
+async def change_password(user_id: str, new_password: str, db: AsyncSession = Depends(get_db),
+                          update_by: str = "sys_service"):
+    """
+    修改用户密码, 并使该用户已缓存的凭据和已签发的令牌失效。
+    :return: 新的令牌版本, 用户不存在时返回 None
+    """
+    version = await UserDAO.update_password(db, user_id, new_password, update_by)
+    if version is not None:
+        _invalidate_user(user_id, version)
+    return version
+
+
+async def change_role(user_id: str, role_id: int, db: AsyncSession = Depends(get_db),
+                      update_by: str = "sys_service"):
+    """
+    修改用户角色, 并使该用户已缓存的凭据、RabbitMQ 权限和已签发的令牌失效。
+    :return: 新的令牌版本, 用户不存在时返回 None
+    """
+    if not await UserDAO.get_user_by_user_id(db, user_id):
+        return None
+    try:
+        version = await UserDAO.update_role(db, user_id, role_id, update_by)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Role does not exist")
+    if version is not None:
+        _invalidate_user(user_id, version)
+        permission_matcher.invalidate_user(user_id)
+    return version
+
+
+def _invalidate_user(user_id: str, version: int):
+    token_version_index.set(user_id, version)
+    broker_credential_cache.invalidate_user(user_id)
+    stream_decision_cache.invalidate_user(user_id)
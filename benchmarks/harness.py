@@ -0,0 +1,145 @@
+"""
+基准测试公共组件: 进程内启动 FastAPI 应用、准备测试数据、并发驱动请求并统计延迟。
+"""
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+
+def configure_database(database_url: str | None, workdir: str) -> str:
+    """
+    在导入 app 之前设置数据库连接字符串。
+    未指定时使用临时目录下的 SQLite 数据库作为 MySQL 的替身。
+    """
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["WEBSERVICE_DATABASE_URI"] = database_url
+    return database_url
+
+
+def configure_throttle(enabled: bool):
+    """
+    在导入 app 之前设置是否启用登录限流。
+    所有请求都来自同一个客户端 IP, 启用时登录和 RabbitMQ 用户认证很快会被限流, 测到的是 429 而不是密码校验,
+    因此默认关闭, 仅在专门测试限流开销时启用。
+    """
+    os.environ["WEBSERVICE_LOGIN_THROTTLE_ENABLED"] = "true" if enabled else "false"
+
+
+async def prepare_database(users: int, password: str, reset: bool):
+    """
+    建表并写入基准测试数据: 角色、RabbitMQ 权限以及 users 个学生账户(共享同一个密码哈希)。
+    :param users: 学生账户数量
+    :param password: 所有学生账户的密码
+    :param reset: 是否删除并重建所有表(仅用于专用的测试数据库)
+    """
+    from sqlalchemy import insert, delete
+
+    from app.common.entity import UserModel, RoleModel, UserRole, Permission, RolePermission, TokenBlocklist
+    from app.core.database.base import Base, engine
+    from app.core.security import get_password_hash
+
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        else:
+            await conn.execute(delete(TokenBlocklist).where(TokenBlocklist.user_id.like("bench_%")))
+            await conn.execute(delete(UserModel).where(UserModel.user_id.like("bench_%")))
+            await conn.execute(delete(RoleModel).where(RoleModel.role_name == "BENCH_STUDENT"))
+            await conn.execute(delete(Permission).where(Permission.perm_name.like("mq:%bench%")))
+
+        audit = {"created_by": "bench", "updated_by": "bench"}
+        role_id = (await conn.execute(
+            insert(RoleModel).values(role_name="BENCH_STUDENT", description="benchmark", **audit)
+        )).inserted_primary_key[0]
+        perm_names = [
+            "mq:vhost:/",
+            "mq:read:queue:bench-*",
+            "mq:topic:write:amq.topic:bench.{username}.#",
+        ]
+        for perm_name in perm_names:
+            perm_id = (await conn.execute(
+                insert(Permission).values(perm_name=perm_name, **audit)
+            )).inserted_primary_key[0]
+            await conn.execute(insert(RolePermission).values(role_id=role_id, perm_id=perm_id, **audit))
+
+        hashed_password = get_password_hash(password)
+        user_ids = [f"bench_{i:06d}" for i in range(users)]
+        for i in range(0, len(user_ids), 1000):
+            chunk = user_ids[i:i + 1000]
+            await conn.execute(insert(UserModel), [
+                {"user_id": user_id, "name": user_id, "hashed_password": hashed_password, **audit}
+                for user_id in chunk
+            ])
+            await conn.execute(insert(UserRole), [
+                {"user_id": user_id, "role_id": role_id, **audit} for user_id in chunk
+            ])
+    return user_ids
+
+
+@asynccontextmanager
+async def running_app():
+    """进程内启动应用(执行 lifespan), 返回绑定到应用的 httpx 客户端"""
+    import httpx
+
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float, statuses: dict[str, int]) -> dict:
+    """根据单次请求延迟(秒)计算 p50/p90/p99 和吞吐量, 并列出每种响应状态的请求数"""
+    result = {
+        "requests": len(latencies) + errors, "errors": errors, "elapsed_s": round(elapsed, 4),
+        "statuses": dict(sorted(statuses.items())),
+    }
+    if latencies:
+        ordered = sorted(latencies)
+        quantiles = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+        result.update({
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "p50_ms": round(quantiles[49] * 1000, 3),
+            "p90_ms": round(quantiles[89] * 1000, 3),
+            "p99_ms": round(quantiles[98] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        })
+    return result
+
+
+async def drive(operations, concurrency: int) -> tuple[list[float], int, float, dict[str, int]]:
+    """
+    以固定并发度执行一组请求。
+    :param operations: 协程工厂列表, 每个返回 (是否成功, 响应状态), 响应状态通常为 HTTP 状态码
+    :param concurrency: 同时执行的请求数
+    :return: (成功请求的延迟列表, 失败数, 总耗时, 每种响应状态的请求数)
+    """
+    latencies: list[float] = []
+    errors = 0
+    statuses: Counter[str] = Counter()
+    queue = iter(operations)
+
+    async def worker():
+        nonlocal errors
+        for operation in queue:
+            started_at = time.perf_counter()
+            try:
+                ok, status = await operation()
+            except Exception as e:
+                ok, status = False, type(e).__name__
+            statuses[str(status)] += 1
+            if ok:
+                latencies.append(time.perf_counter() - started_at)
+            else:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started_at, dict(statuses)
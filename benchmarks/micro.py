@@ -0,0 +1,36 @@
+"""
+热点函数的微基准: create_token、令牌解码和 verify_password。
+"""
+import time
+from datetime import timedelta
+
+
+def _measure(func, min_time: float = 1.0, max_iterations: int = 1_000_000) -> dict:
+    """重复执行 func 至少 min_time 秒, 返回单次耗时统计(微秒)"""
+    func()  # 预热
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline and len(samples) < max_iterations:
+        started_at = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started_at)
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 3),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 3),
+        "ops_per_s": round(len(samples) / sum(samples), 1),
+    }
+
+
+def run_micro(min_time: float = 1.0) -> dict:
+    from app.core.security import create_token, get_password_hash, verify_password, token_keys
+
+    token = create_token({"sub": "bench_000000"}, "access", timedelta(minutes=15))
+    hashed_password = get_password_hash("bench-password")
+    return {
+        "create_token": _measure(lambda: create_token({"sub": "bench_000000"}, "access", timedelta(minutes=15)),
+                                 min_time),
+        "jwt_decode": _measure(lambda: token_keys.decode(token), min_time),
+        "verify_password": _measure(lambda: verify_password("bench-password", hashed_password), min_time),
+    }
@@ -0,0 +1,240 @@
+"""
+认证与 RabbitMQ 回调热路径的基准测试。
+
+用法(在仓库根目录执行):
+    python -m benchmarks.run                                  # 使用临时 SQLite 数据库
+    python -m benchmarks.run --database-url mysql+asyncmy://... # 使用本地 MySQL(需已执行 scripts/create_db.sql)
+    python -m benchmarks.run --compare benchmarks/results/<旧提交>.json
+
+结果以 JSON 保存到 benchmarks/results/<git 提交>.json, 便于在提交之间比较。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.harness import configure_database, configure_throttle, prepare_database, running_app, drive, summarize
+
+PASSWORD = "bench-password"
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _login(client, user_id: str):
+    return await client.post("/auth/token", data={"username": user_id, "password": PASSWORD})
+
+
+async def _open_sessions(client, user_ids) -> dict:
+    """
+    为每个用户登录一次, 作为刷新/注销场景的初始会话。
+    任何一次登录失败都会中止运行, 否则场景实际执行的请求数少于参数指定的数量, 结果无法与其他提交比较。
+    """
+    tokens, failures = {}, Counter()
+    for user_id in user_ids:
+        response = await _login(client, user_id)
+        if response.status_code == 200:
+            tokens[user_id] = response.json()
+        else:
+            failures[response.status_code] += 1
+    if failures:
+        raise RuntimeError(f"Setup login failed for {sum(failures.values())}/{len(user_ids)} sessions: {dict(failures)}")
+    return tokens
+
+
+async def scenario_login_storm(client, user_ids, args) -> dict:
+    """大量用户同时登录 /auth/token"""
+
+    def operation(user_id):
+        async def run():
+            response = await _login(client, user_id)
+            return response.status_code == 200, response.status_code
+
+        return run
+
+    targets = [random.choice(user_ids) for _ in range(args.requests)]
+    return summarize(*await drive([operation(user_id) for user_id in targets], args.concurrency))
+
+
+async def scenario_refresh_rotation(client, user_ids, args) -> dict:
+    """每个会话连续轮换刷新令牌 /auth/refresh"""
+    sessions = user_ids[:args.sessions]
+    tokens = await _open_sessions(client, sessions)
+    locks = {user_id: asyncio.Lock() for user_id in sessions}
+
+    def operation(user_id):
+        async def run():
+            async with locks[user_id]:
+                response = await client.post("/auth/refresh", data={"refresh_token": tokens[user_id]["refresh_token"]})
+                if response.status_code == 200:
+                    tokens[user_id] = response.json()
+                return response.status_code == 200, response.status_code
+
+        return run
+
+    rounds = max(1, args.requests // len(sessions))
+    operations = [operation(user_id) for _ in range(rounds) for user_id in sessions]
+    return summarize(*await drive(operations, args.concurrency))
+
+
+async def scenario_logout(client, user_ids, args) -> dict:
+    """注销 /auth/logout(同时撤销访问令牌和刷新令牌)"""
+    sessions = await _open_sessions(client, user_ids[:args.sessions])
+
+    def operation(tokens):
+        async def run():
+            response = await client.post(
+                "/auth/logout", data={"refresh_token": tokens["refresh_token"]},
+                headers={"Authorization": f"Bearer {tokens['access_token']}"}
+            )
+            return response.status_code == 200, response.status_code
+
+        return run
+
+    return summarize(*await drive([operation(tokens) for tokens in sessions.values()], args.concurrency))
+
+
+async def scenario_mq_reconnect(client, user_ids, args) -> dict:
+    """
+    模拟 MQTT 设备断线重连风暴: 每一波所有设备同时重连,
+    依次触发 RabbitMQ 的 user、vhost、resource、topic 认证回调。
+    """
+    devices = user_ids[:args.devices]
+    results = {name: ([], 0, 0.0, Counter()) for name in ("user", "vhost", "resource", "topic")}
+
+    def call(path, data, expected="allow"):
+        async def run():
+            response = await client.post(f"/api/rabbitmq/auth/{path}", data=data)
+            if response.status_code != 200:
+                return False, response.status_code
+            # 回调以 200 返回 allow/deny, 按决定区分状态
+            decision = response.text.split(" ", 1)[0]
+            return decision == expected, f"200 {decision}"
+
+        return run
+
+    phases = {
+        "user": lambda device: call("user", {"username": device, "password": PASSWORD}),
+        "vhost": lambda device: call("vhost", {"username": device, "vhost": "/", "ip": "127.0.0.1"}),
+        "resource": lambda device: call("resource", {
+            "username": device, "vhost": "/", "resource": "queue", "name": f"bench-{device}", "permission": "read"
+        }),
+        "topic": lambda device: call("topic", {
+            "username": device, "vhost": "/", "resource": "topic", "name": "amq.topic", "permission": "write",
+            "routing_key": f"bench.{device}.eeg"
+        }),
+    }
+    for _ in range(args.waves):
+        for name, factory in phases.items():
+            latencies, errors, elapsed, statuses = await drive([factory(device) for device in devices], args.concurrency)
+            total_latencies, total_errors, total_elapsed, total_statuses = results[name]
+            total_statuses.update(statuses)
+            results[name] = (total_latencies + latencies, total_errors + errors, total_elapsed + elapsed, total_statuses)
+    return {name: summarize(*result) for name, result in results.items()}
+
+
+SCENARIOS = {
+    "login_storm": scenario_login_storm,
+    "refresh_rotation": scenario_refresh_rotation,
+    "logout": scenario_logout,
+    "mq_reconnect": scenario_mq_reconnect,
+}
+
+
+def compare(current: dict, baseline: dict):
+    """打印与基线结果之间 p50/p99/吞吐量的变化"""
+    print(f"\nCompared with {baseline['meta']['revision']}:")
+
+    def walk(prefix, new, old):
+        if "p50_ms" in new and "p50_ms" in old:
+            changes = []
+            for key in ("p50_ms", "p99_ms", "throughput_rps"):
+                if old.get(key):
+                    changes.append(f"{key} {old[key]} -> {new[key]} ({(new[key] - old[key]) / old[key] * 100:+.1f}%)")
+            print(f"  {prefix}: {', '.join(changes)}")
+            return
+        for key, value in new.items():
+            if isinstance(value, dict) and isinstance(old.get(key), dict):
+                walk(f"{prefix}.{key}" if prefix else key, value, old[key])
+
+    walk("", current["scenarios"], baseline.get("scenarios", {}))
+    walk("micro", current.get("micro", {}), baseline.get("micro", {}))
+
+
+async def run_scenarios(args) -> dict:
+    user_ids = await prepare_database(args.users, PASSWORD, reset=args.reset)
+    results = {}
+    async with running_app() as client:
+        for name in args.scenarios:
+            print(f"Running {name} ...", file=sys.stderr)
+            results[name] = await SCENARIOS[name](client, user_ids, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the auth and RabbitMQ callback hot paths")
+    parser.add_argument("--database-url", help="数据库连接字符串, 默认使用临时 SQLite 数据库")
+    parser.add_argument("--reset", action="store_true", help="删除并重建所有表(临时 SQLite 数据库总是重建)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--users", type=int, default=2000, help="生成的学生账户数")
+    parser.add_argument("--requests", type=int, default=500, help="登录/刷新场景的请求数")
+    parser.add_argument("--sessions", type=int, default=100, help="刷新/注销场景的会话数")
+    parser.add_argument("--devices", type=int, default=200, help="重连风暴中的设备数")
+    parser.add_argument("--waves", type=int, default=3, help="重连风暴的波数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--login-throttle", action="store_true", help="启用登录限流(所有请求来自同一 IP, 默认关闭)")
+    parser.add_argument("--micro-time", type=float, default=1.0, help="每个微基准的运行时间(秒), 0 表示跳过")
+    parser.add_argument("--output", help="结果文件路径, 默认 benchmarks/results/<git 提交>.json")
+    parser.add_argument("--compare", help="用于比较的历史结果文件")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix="platform-bench-")
+    database_url = configure_database(args.database_url, workdir)
+    configure_throttle(args.login_throttle)
+    if not args.database_url:
+        args.reset = True
+
+    revision = _git_revision()
+    report = {
+        "meta": {
+            "revision": revision,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": database_url.split("://")[0],
+            "args": {key: value for key, value in vars(args).items() if key not in ("database_url", "output", "compare")},
+        },
+        "scenarios": asyncio.run(run_scenarios(args)),
+    }
+    if args.micro_time > 0:
+        from benchmarks.micro import run_micro
+        report["micro"] = run_micro(args.micro_time)
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"\nSaved to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
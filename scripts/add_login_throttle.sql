@@ -0,0 +1,16 @@
+-- 创建登录失败计数表。
+-- 仅在 LOGIN_THROTTLE_SHARED 模式下使用: 各 worker 将登录失败计数写入该表, 并定期同步封禁中的 IP/账号,
+-- 使多个 worker 的登录限流保持一致。
+
+CREATE TABLE IF NOT EXISTS login_throttle
+(
+    throttle_key      VARCHAR(64) PRIMARY KEY COMMENT '限流键(ip:<IP> 或 user:<账号>)',
+    window_index      BIGINT      NOT NULL DEFAULT 0 COMMENT '当前计数窗口的序号',
+    previous_failures INT         NOT NULL DEFAULT 0 COMMENT '上一个窗口的失败次数',
+    current_failures  INT         NOT NULL DEFAULT 0 COMMENT '当前窗口的失败次数',
+    blocked_until     DATETIME COMMENT '封禁截止时间',
+
+    created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    INDEX idx_login_throttle_blocked_until (blocked_until)
+);
@@ -0,0 +1,5 @@
+-- 为 token_blocklist 添加创建时间索引。
+-- 各 worker 按 created_at 增量同步撤销记录(WHERE created_at >= ?), 没有索引时每次同步都会扫描整张表。
+
+ALTER TABLE token_blocklist
+    ADD INDEX idx_token_blocklist_created_at (created_at);
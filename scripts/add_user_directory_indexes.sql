@@ -0,0 +1,6 @@
+-- 为用户目录添加筛选索引。
+-- 按学院/专业/年级(班级)或年级/学生类型筛选学生, 并按 user_id 翻页(WHERE user_id > ? ORDER BY user_id)。
+
+ALTER TABLE users
+    ADD INDEX idx_users_class (college, major, grade, user_id),
+    ADD INDEX idx_users_grade_type (grade, stu_type, user_id);
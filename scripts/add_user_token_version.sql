@@ -0,0 +1,7 @@
+-- 为 users 表添加令牌版本列。
+-- 访问令牌与刷新令牌携带签发时的版本(ver 声明), 版本递增后此前签发的令牌全部失效;
+-- 各 worker 按 updated_at 增量同步版本号, 因此同时为 updated_at 添加索引。
+
+ALTER TABLE users
+    ADD COLUMN token_version INT NOT NULL DEFAULT 0 COMMENT '令牌版本' AFTER last_login_ip,
+    ADD INDEX idx_users_updated_at (updated_at);
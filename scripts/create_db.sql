@@ -13,11 +13,15 @@ CREATE TABLE users
     major           VARCHAR(50) COMMENT '专业',
     last_login_at   TIMESTAMP                    NULL COMMENT '最后登录时间',
     last_login_ip   VARCHAR(45) COMMENT '最后登录IP',
+    token_version   INT                          NOT NULL DEFAULT 0 COMMENT '令牌版本',
 
     created_at      TIMESTAMP                             DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     created_by      VARCHAR(20)                  NOT NULL COMMENT '创建者',
     updated_at      TIMESTAMP                             DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
-    updated_by      VARCHAR(20)                  NOT NULL COMMENT '更新者'
+    updated_by      VARCHAR(20)                  NOT NULL COMMENT '更新者',
+    INDEX idx_users_updated_at (updated_at),
+    INDEX idx_users_class (college, major, grade, user_id),
+    INDEX idx_users_grade_type (grade, stu_type, user_id)
 );
 
 -- 角色表
@@ -116,6 +120,66 @@ VALUES ('STUDENT', '学生角色', 'SYSTEM_INIT', 'SYSTEM_INIT');
 INSERT INTO roles (role_name, description, created_by, updated_by)
 VALUES ('TEACHER', '教师角色', 'SYSTEM_INIT', 'SYSTEM_INIT');
 
+-- RabbitMQ 权限
+-- 格式: mq:vhost:<vhost>
+--       mq:<configure|write|read>:<exchange|queue>:<名称, * 为通配符>
+--       mq:topic:<write|read>:<exchange>:<routing key, * 匹配一个单词, # 匹配零或多个单词>
+-- 以上模式均支持 {username} 占位符
+INSERT INTO permissions (perm_name, description, created_by, updated_by)
+VALUES ('mq:vhost:/', '访问默认 vhost', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:write:exchange:amq.topic', '向 MQTT 默认交换机发布消息', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:read:exchange:amq.topic', '从 MQTT 默认交换机订阅消息', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:configure:queue:mqtt-subscription-*', '声明 MQTT 订阅队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:write:queue:mqtt-subscription-*', '绑定 MQTT 订阅队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:read:queue:mqtt-subscription-*', '消费 MQTT 订阅队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:topic:write:amq.topic:sensor.{username}.#', '发布本人的传感器数据', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:topic:read:amq.topic:state.{username}.#', '订阅本人的学习状态', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:topic:read:amq.topic:sensor.#', '订阅所有传感器数据', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:topic:read:amq.topic:state.#', '订阅所有学习状态', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:configure:queue:*', '声明任意队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:read:queue:*', '消费任意队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:write:queue:*', '绑定任意队列', 'SYSTEM_INIT', 'SYSTEM_INIT'),
+       ('mq:topic:write:amq.topic:state.#', '发布学习状态', 'SYSTEM_INIT', 'SYSTEM_INIT');
+
+-- 学生: 发布本人传感器数据, 订阅本人学习状态
+INSERT INTO role_permission (role_id, perm_id, created_by, updated_by)
+SELECT r.role_id, p.perm_id, 'SYSTEM_INIT', 'SYSTEM_INIT'
+FROM roles r
+         JOIN permissions p ON p.perm_name IN (
+                                               'mq:vhost:/', 'mq:write:exchange:amq.topic',
+                                               'mq:read:exchange:amq.topic',
+                                               'mq:configure:queue:mqtt-subscription-*',
+                                               'mq:write:queue:mqtt-subscription-*',
+                                               'mq:read:queue:mqtt-subscription-*',
+                                               'mq:topic:write:amq.topic:sensor.{username}.#',
+                                               'mq:topic:read:amq.topic:state.{username}.#')
+WHERE r.role_name = 'STUDENT';
+
+-- 教师: 订阅所有传感器数据和学习状态
+INSERT INTO role_permission (role_id, perm_id, created_by, updated_by)
+SELECT r.role_id, p.perm_id, 'SYSTEM_INIT', 'SYSTEM_INIT'
+FROM roles r
+         JOIN permissions p ON p.perm_name IN (
+                                               'mq:vhost:/', 'mq:read:exchange:amq.topic',
+                                               'mq:configure:queue:mqtt-subscription-*',
+                                               'mq:write:queue:mqtt-subscription-*',
+                                               'mq:read:queue:mqtt-subscription-*',
+                                               'mq:topic:read:amq.topic:sensor.#',
+                                               'mq:topic:read:amq.topic:state.#')
+WHERE r.role_name = 'TEACHER';
+
+-- 系统服务账户: 消费传感器数据并发布学习状态
+INSERT INTO role_permission (role_id, perm_id, created_by, updated_by)
+SELECT r.role_id, p.perm_id, 'SYSTEM_INIT', 'SYSTEM_INIT'
+FROM roles r
+         JOIN permissions p ON p.perm_name IN (
+                                               'mq:vhost:/', 'mq:write:exchange:amq.topic',
+                                               'mq:read:exchange:amq.topic',
+                                               'mq:configure:queue:*', 'mq:read:queue:*', 'mq:write:queue:*',
+                                               'mq:topic:read:amq.topic:sensor.#',
+                                               'mq:topic:write:amq.topic:state.#')
+WHERE r.role_name = 'SYSTEM_SERVICE';
+
 -- Token黑名单表
 CREATE TABLE token_blocklist
 (
@@ -128,5 +192,36 @@ CREATE TABLE token_blocklist
         ON DELETE CASCADE ON UPDATE CASCADE,
 
     created_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
-    updated_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
-);
\ No newline at end of file
+    updated_at     TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    INDEX idx_token_blocklist_created_at (created_at)
+);
+-- 传感器数据帧表(由 RabbitMQ 接入服务批量写入, 不设外键以降低写入开销)
+CREATE TABLE sensor_frames
+(
+    frame_id      BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '帧ID',
+    user_id       VARCHAR(20) NOT NULL COMMENT '学习者ID',
+    modality      VARCHAR(16) NOT NULL COMMENT '模态',
+    seq           BIGINT COMMENT '设备端序号',
+    captured_at   DATETIME(6) NOT NULL COMMENT '首个采样点的采集时间',
+    sample_rate   FLOAT       NOT NULL COMMENT '采样率(Hz)',
+    sample_count  INT         NOT NULL COMMENT '采样点数',
+    channel_count INT         NOT NULL COMMENT '通道数',
+    payload       MEDIUMBLOB  NOT NULL COMMENT '原始 msgpack 消息',
+
+    created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    INDEX idx_sensor_frames_user_modality_time (user_id, modality, captured_at)
+);
+-- 登录失败计数表(LOGIN_THROTTLE_SHARED 模式下由各 worker 共享)
+CREATE TABLE login_throttle
+(
+    throttle_key      VARCHAR(64) PRIMARY KEY COMMENT '限流键(ip:<IP> 或 user:<账号>)',
+    window_index      BIGINT      NOT NULL DEFAULT 0 COMMENT '当前计数窗口的序号',
+    previous_failures INT         NOT NULL DEFAULT 0 COMMENT '上一个窗口的失败次数',
+    current_failures  INT         NOT NULL DEFAULT 0 COMMENT '当前窗口的失败次数',
+    blocked_until     DATETIME COMMENT '封禁截止时间',
+
+    created_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    updated_at        TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    INDEX idx_login_throttle_blocked_until (blocked_until)
+);
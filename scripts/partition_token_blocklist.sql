@@ -0,0 +1,43 @@
+-- 将 token_blocklist 改为按 expires_at 分区(按天), 过期清理改为直接删除整个分区。
+-- 执行后设置环境变量 WEBSERVICE_TOKEN_BLOCKLIST_PARTITIONED=true, 服务会在每次清理时
+-- 删除已整体过期的分区, 并从 pmax 中拆分出未来 TOKEN_BLOCKLIST_PARTITION_DAYS_AHEAD 天的分区。
+--
+-- 注意:
+-- 1. InnoDB 分区表不支持外键, 需先删除 user_id 外键(用户删除时不再级联删除撤销记录, 记录会随过期自动清理);
+-- 2. 分区键必须包含在主键中, 主键改为 (jti, expires_at), 按 jti 查询仍可使用主键前缀;
+-- 3. 分区边界使用 UNIX_TIMESTAMP, 数据库与服务的时区需保持一致(docker-compose 中为 Asia/Shanghai)。
+
+SET @fk_name = (SELECT CONSTRAINT_NAME
+                FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE()
+                  AND TABLE_NAME = 'token_blocklist'
+                  AND REFERENCED_TABLE_NAME = 'users'
+                LIMIT 1);
+SET @drop_fk = IF(@fk_name IS NULL, 'SELECT 1',
+                  CONCAT('ALTER TABLE token_blocklist DROP FOREIGN KEY ', @fk_name));
+PREPARE stmt FROM @drop_fk;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+ALTER TABLE token_blocklist
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (jti, expires_at),
+    ADD INDEX idx_token_blocklist_user_id (user_id);
+
+-- 增量同步撤销记录使用的创建时间索引, 尚未执行 add_token_blocklist_created_at_index.sql 时在此添加
+SET @has_created_at_index = (SELECT COUNT(*)
+                             FROM information_schema.STATISTICS
+                             WHERE TABLE_SCHEMA = DATABASE()
+                               AND TABLE_NAME = 'token_blocklist'
+                               AND INDEX_NAME = 'idx_token_blocklist_created_at');
+SET @add_index = IF(@has_created_at_index > 0, 'SELECT 1',
+                    'ALTER TABLE token_blocklist ADD INDEX idx_token_blocklist_created_at (created_at)');
+PREPARE stmt FROM @add_index;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- 初始只创建一个 MAXVALUE 分区, 服务首次清理时会自动拆分出按天分区
+ALTER TABLE token_blocklist
+    PARTITION BY RANGE (UNIX_TIMESTAMP(expires_at)) (
+        PARTITION pmax VALUES LESS THAN MAXVALUE
+        );
@@ -0,0 +1,47 @@
+import math
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.common.schemas.sensor import HeartRateFrame
+from app.modules.state.engine import ModalitySpec, ModalityWindow
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_frame_rejects_non_finite_samples(value):
+    with pytest.raises(ValidationError):
+        HeartRateFrame.model_validate({"timestamp": 1.7e9, "sample_rate": 1, "data": [[70.0], [value]]})
+
+
+def test_window_mean_after_overwrite():
+    window = ModalityWindow(ModalitySpec("hr", channels=1, nominal_rate=1, window_seconds=4), slots=2)
+    for value in (60.0, 62.0, 64.0, 66.0, 68.0, 70.0):
+        frame = HeartRateFrame.model_validate({"timestamp": 1.7e9, "sample_rate": 1, "data": [[value]]})
+        window.push([("s1", np.asarray(frame.data, dtype=np.float32))], now=0.0, idle_seconds=30)
+    features = window.compute(elapsed=1.0)
+    assert np.isfinite(features.mean).all()
+    assert features.mean[0, 0] == pytest.approx(67.0)
+
+
+def test_low_rate_modality_is_not_flagged_between_samples():
+    # 1 Hz 的心率以 0.1 秒的周期计算, 大多数周期没有新样本
+    window = ModalityWindow(ModalitySpec("hr", channels=1, nominal_rate=1, window_seconds=30), slots=2)
+    flags, rates = [], []
+    for tick in range(300):
+        if tick % 10 == 0:
+            window.push([("s1", np.array([[70.0]], dtype=np.float32))], now=tick * 0.1, idle_seconds=30)
+        features = window.compute(elapsed=0.1)
+        flags.append(bool(features.signal_loss[0]))
+        rates.append(features.rate[0])
+    assert not any(flags)
+    assert rates[-1] == pytest.approx(1.0, rel=0.1)
+
+
+def test_signal_loss_after_samples_stop():
+    window = ModalityWindow(ModalitySpec("hr", channels=1, nominal_rate=1, window_seconds=10), slots=2)
+    for tick in range(200):
+        if tick % 10 == 0 and tick < 100:
+            window.push([("s1", np.array([[70.0]], dtype=np.float32))], now=tick * 0.1, idle_seconds=30)
+        features = window.compute(elapsed=0.1)
+    assert features.signal_loss[0]